@@ -1,23 +1,12 @@
-from fastapi import FastAPI
-import logging
-import sys
+"""PaddleOCR API
 
-# 统一配置日志输出到控制台
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - [APP] %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
-
-# 确保应用自定义日志器输出 INFO 级别并向上冒泡
-paddle_logger = logging.getLogger("paddleocr_app")
-paddle_logger.setLevel(logging.INFO)
-paddle_logger.propagate = True
-
-app = FastAPI(title="PaddleOCR API", description="OCR service using PaddleOCR", version="1.0.0")
-
-# 挂载控制器路由
-from app.controllers.ocr_controller import router as ocr_router
-app.include_router(ocr_router)
+FastAPI 应用在 app.application 中组装，首次访问 app.app 时才导入；
+bulk_ocr 与 spawn 出的工作进程只导入用到的子模块，不会连带配置日志、加载控制器或创建推理进程池
+"""
 
 
+def __getattr__(name):
+    if name == "app":
+        from app.application import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
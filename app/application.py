@@ -0,0 +1,56 @@
+"""组装 FastAPI 应用：配置日志、挂载中间件与路由，注册推理进程池的启动 / 停止
+
+由 app 包按需导入（uvicorn 的 "app:app"），只用到 app.utils / app.services 的脚本与子进程不会执行这里
+"""
+from fastapi import FastAPI
+
+from app.config import OCR_LOG_LEVEL, OCR_LOG_FORMAT, OCR_LOG_SAMPLE_RATE, OCR_LOG_QUEUE_SIZE
+from app.utils.log_utils import setup_logging
+
+# 应用与 uvicorn 的日志经有界队列由后台线程输出到控制台，写日志不阻塞事件循环
+setup_logging(level=OCR_LOG_LEVEL, fmt=OCR_LOG_FORMAT, sample_rate=OCR_LOG_SAMPLE_RATE, queue_size=OCR_LOG_QUEUE_SIZE)
+
+app = FastAPI(title="PaddleOCR API", description="OCR service using PaddleOCR", version="1.0.0")
+
+from app.config import OCR_COMPRESSION_ENABLED
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.load_report import LoadReportMiddleware
+from app.middleware.request_context import RequestContextMiddleware
+
+# 响应压缩（gzip / brotli / zstd 按 Accept-Encoding 协商）
+if OCR_COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# 响应头附带排队与执行中请求数，供网关按负载路由
+app.add_middleware(LoadReportMiddleware)
+
+# 最外层：请求 ID 与访问日志（耗时包含压缩）
+app.add_middleware(RequestContextMiddleware)
+
+# 挂载控制器路由
+from app.controllers.ocr_controller import router as ocr_router
+from app.controllers.admin_controller import router as admin_router
+app.include_router(ocr_router)
+app.include_router(admin_router)
+
+from app.services.inference_workers import inference_pool, start_inference_pool, shutdown_inference_pool
+from app.services.ocr_service import get_simple_ocr
+from app.services.hot_reload import install_sighup_handler
+
+
+@app.on_event("startup")
+def _start_inference():
+    # 启用推理工作进程时由进程池加载模型，否则在启动时加载，避免首个请求承担加载耗时
+    if inference_pool is not None:
+        start_inference_pool()
+    else:
+        get_simple_ocr()
+    # SIGHUP 热替换引擎（重新读取 OCR_ENGINE_PARAMS_FILE）
+    install_sighup_handler()
+
+
+@app.on_event("shutdown")
+def _stop_inference():
+    shutdown_inference_pool()
+
+
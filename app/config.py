@@ -0,0 +1,147 @@
+"""服务配置：统一从环境变量读取，未设置时使用默认值"""
+import os
+
+
+def _env_str(name, default):
+    value = os.environ.get(name)
+    return value if value not in (None, "") else default
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    try:
+        return int(value) if value not in (None, "") else default
+    except ValueError:
+        return default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    try:
+        return float(value) if value not in (None, "") else default
+    except ValueError:
+        return default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# 推理工作进程数：0 表示在 API 进程内推理；大于 0 时由受监管的进程池推理（可回收、可超时终止）
+OCR_PROCESS_WORKERS = _env_int("OCR_PROCESS_WORKERS", 0)
+# 预热好的备用进程数，回收或终止工作进程时立即接替
+OCR_WORKER_SPARES = _env_int("OCR_WORKER_SPARES", 1)
+# 工作进程处理满该数量的请求后回收，0 表示不限制
+OCR_WORKER_MAX_REQUESTS = _env_int("OCR_WORKER_MAX_REQUESTS", 2000)
+# 工作进程 RSS 超过该值（MB）后回收，0 表示不限制
+OCR_WORKER_MAX_RSS_MB = _env_int("OCR_WORKER_MAX_RSS_MB", 0)
+# 单次推理的硬超时（秒），超时的工作进程被终止
+OCR_INFERENCE_TIMEOUT_S = _env_float("OCR_INFERENCE_TIMEOUT_S", 120.0)
+OCR_WORKER_START_TIMEOUT_S = _env_float("OCR_WORKER_START_TIMEOUT_S", 600.0)
+# 向推理工作进程传递图像的共享内存槽：每槽大小（MB，需容纳解码后的最大图像，默认 48MB 约为 4096x4096 BGR），
+# 槽数默认等于工作进程数加备用进程数；放不下或槽已用完的图像退回 Pipe 传输。0 表示不使用共享内存
+# 容器内 /dev/shm 需大于 槽数 x 每槽大小（docker-compose 中 shm_size）
+OCR_SHM_SLOT_MB = _env_int("OCR_SHM_SLOT_MB", 48)
+OCR_SHM_SLOTS = _env_int("OCR_SHM_SLOTS", OCR_PROCESS_WORKERS + OCR_WORKER_SPARES)
+
+# 工作线程数：解码、旋转、编码在线程池中并行；进程内推理时 predict 本身串行
+OCR_WORKER_THREADS = _env_int("OCR_WORKER_THREADS", max(4, OCR_PROCESS_WORKERS * 2))
+
+# needImg=true 时返回图片的默认编码参数
+OCR_IMG_FORMAT = _env_str("OCR_IMG_FORMAT", "jpeg")
+OCR_IMG_QUALITY = _env_int("OCR_IMG_QUALITY", 90)
+# 返回图片最长边上限，0 表示不限制
+OCR_IMG_MAX_SIDE = _env_int("OCR_IMG_MAX_SIDE", 0)
+
+# 响应压缩：小于 MIN_SIZE 字节不压缩，大于 OFFLOAD_SIZE 字节在线程池中压缩
+OCR_COMPRESSION_ENABLED = _env_bool("OCR_COMPRESSION_ENABLED", True)
+OCR_COMPRESS_MIN_SIZE = _env_int("OCR_COMPRESS_MIN_SIZE", 1024)
+OCR_COMPRESS_OFFLOAD_SIZE = _env_int("OCR_COMPRESS_OFFLOAD_SIZE", 64 * 1024)
+
+# 调度器初始（或关闭自适应时固定）的并发 OCR 任务数
+OCR_SCHED_CONCURRENCY = _env_int("OCR_SCHED_CONCURRENCY", 2)
+
+# 自适应并发限制：上限不超过工作线程数
+OCR_ADAPTIVE_LIMIT = _env_bool("OCR_ADAPTIVE_LIMIT", True)
+OCR_LIMIT_INITIAL = _env_int("OCR_LIMIT_INITIAL", OCR_SCHED_CONCURRENCY)
+OCR_LIMIT_MIN = _env_int("OCR_LIMIT_MIN", 1)
+OCR_LIMIT_MAX = _env_int("OCR_LIMIT_MAX", OCR_WORKER_THREADS)
+# 短期延迟超过基线的该倍数视为延迟膨胀
+OCR_LIMIT_TOLERANCE = _env_float("OCR_LIMIT_TOLERANCE", 1.5)
+OCR_LIMIT_BACKOFF = _env_float("OCR_LIMIT_BACKOFF", 0.9)
+# 排队上限 = limit × QUEUE_FACTOR（不少于 QUEUE_MIN），超出的请求立即返回 503
+OCR_QUEUE_FACTOR = _env_float("OCR_QUEUE_FACTOR", 8.0)
+OCR_QUEUE_MIN = _env_int("OCR_QUEUE_MIN", 16)
+
+# 全局内存预算（MB）：按图片头部宽高估算每个请求的峰值内存，预算内才开始处理；0 表示不限制
+OCR_MEMORY_BUDGET_MB = _env_int("OCR_MEMORY_BUDGET_MB", 4096)
+# 旋转画布、缩放输出等临时数组的复用池上限（MB）；0 表示关闭
+OCR_BUFFER_POOL_MB = _env_int("OCR_BUFFER_POOL_MB", 256)
+
+# 近重复图片复用结果：按解码后缩略图的感知哈希（dHash）查找之前的识别结果，默认关闭
+OCR_DEDUP_ENABLED = _env_bool("OCR_DEDUP_ENABLED", False)
+# 索引保留的图片数上限（LRU）
+OCR_DEDUP_MAX_ENTRIES = _env_int("OCR_DEDUP_MAX_ENTRIES", 10000)
+# 哈希边长：缩略图 (N+1)×N 灰度，共 N×N 位
+OCR_DEDUP_HASH_SIZE = _env_int("OCR_DEDUP_HASH_SIZE", 16)
+# 汉明距离不超过该值（且宽高比一致）视为同一张图
+OCR_DEDUP_MAX_DISTANCE = _env_int("OCR_DEDUP_MAX_DISTANCE", 10)
+# 哈希候选还需逐像素确认：N×N 灰度缩略图按 4×4 像素分块，任一块的平均灰度差超过该值即不是同一张图
+OCR_DEDUP_VERIFY_SIZE = _env_int("OCR_DEDUP_VERIFY_SIZE", 64)
+OCR_DEDUP_MAX_TILE_DIFF = _env_float("OCR_DEDUP_MAX_TILE_DIFF", 4.0)
+
+# 日志：经有界队列由后台线程写出；json 为单行 JSON，text 为原来的文本格式
+OCR_LOG_LEVEL = _env_str("OCR_LOG_LEVEL", "INFO").upper()
+OCR_LOG_FORMAT = _env_str("OCR_LOG_FORMAT", "json").lower()
+# INFO 及以下日志的采样比例（0-1），同一请求的日志一起保留或丢弃；WARNING 及以上总是输出
+OCR_LOG_SAMPLE_RATE = _env_float("OCR_LOG_SAMPLE_RATE", 1.0)
+# 日志队列长度上限，队列满时丢弃新日志（ocr_log_dropped_total）
+OCR_LOG_QUEUE_SIZE = _env_int("OCR_LOG_QUEUE_SIZE", 10000)
+
+# 慢请求录制（供 replay_traffic.py 重放）：保存目录，为空时关闭
+OCR_RECORD_DIR = _env_str("OCR_RECORD_DIR", "")
+# 总耗时超过该值（毫秒）的请求被保存；0 表示不按耗时保存
+OCR_RECORD_SLOW_MS = _env_int("OCR_RECORD_SLOW_MS", 0)
+# 另外按该比例（0-1）随机保存请求
+OCR_RECORD_SAMPLE_RATE = _env_float("OCR_RECORD_SAMPLE_RATE", 0.0)
+# 保存目录的总大小上限（MB），超出时删除最早的记录
+OCR_RECORD_MAX_MB = _env_int("OCR_RECORD_MAX_MB", 1024)
+
+# 本地路径输入（/ocr_simple/path）：只允许读取该目录内的文件（docker-compose 中为挂载的 /app/data）；为空时接口关闭
+OCR_DATA_ROOT = _env_str("OCR_DATA_ROOT", "")
+# 单个请求最多处理的文件数
+OCR_PATH_MAX_FILES = _env_int("OCR_PATH_MAX_FILES", 1000)
+
+# 多语言模型：默认语言、允许请求的语言，以及共用同一套模型的语言别名
+# PP-OCRv5 的识别模型同时覆盖简体、繁体、英文与日文，这些语言默认共用 ch 模型
+OCR_DEFAULT_LANG = _env_str("OCR_DEFAULT_LANG", "ch")
+OCR_MODEL_LANGS = [lang.strip() for lang in _env_str("OCR_MODEL_LANGS", "ch,en,japan,chinese_cht,korean").split(",") if lang.strip()]
+OCR_MODEL_ALIASES = dict(
+    pair.split(":", 1) for pair in _env_str("OCR_MODEL_ALIASES", "en:ch,japan:ch,chinese_cht:ch").split(",") if ":" in pair
+)
+# 已加载模型的内存上限（MB，按构建前后的 RSS 增量计），超出时淘汰最久未使用的空闲模型；0 表示不限制
+OCR_MODEL_CACHE_MB = _env_int("OCR_MODEL_CACHE_MB", 8192)
+# 同时加载的模型数上限，0 表示不限制
+OCR_MODEL_MAX_LOADED = _env_int("OCR_MODEL_MAX_LOADED", 3)
+
+# PaddleOCR 引擎参数（JSON 文件，键值原样传给 PaddleOCR，如模型目录、检测阈值）；热替换时重新读取
+OCR_ENGINE_PARAMS_FILE = _env_str("OCR_ENGINE_PARAMS_FILE", "")
+# 管理接口（/admin/*）的访问令牌，请求头 X-Admin-Token；为空时管理接口关闭
+OCR_ADMIN_TOKEN = _env_str("OCR_ADMIN_TOKEN", "")
+
+# 版面 / 表格解析（PPStructureV3）：首次请求时加载，使用独立的线程池、并发上限、排队与内存预算，不影响 /ocr_simple/*
+OCR_STRUCTURE_WORKER_THREADS = _env_int("OCR_STRUCTURE_WORKER_THREADS", 1)
+OCR_STRUCTURE_CONCURRENCY = _env_int("OCR_STRUCTURE_CONCURRENCY", 1)
+OCR_STRUCTURE_QUEUE_MIN = _env_int("OCR_STRUCTURE_QUEUE_MIN", 4)
+OCR_STRUCTURE_MEMORY_BUDGET_MB = _env_int("OCR_STRUCTURE_MEMORY_BUDGET_MB", 2048)
+
+# WebSocket 流式识别（/ocr_simple/ws）：帧间在灰度缩略图上比较，只对变化区域重新识别
+# 缩略图最长边（像素）
+OCR_STREAM_THUMB_SIDE = _env_int("OCR_STREAM_THUMB_SIDE", 96)
+# 缩略图像素灰度变化超过该值视为变化（已扣除整体亮度变化）
+OCR_STREAM_DIFF_THRESHOLD = _env_int("OCR_STREAM_DIFF_THRESHOLD", 24)
+# 变化区域超过整帧面积的该比例时整帧重新识别
+OCR_STREAM_MAX_REGION_RATIO = _env_float("OCR_STREAM_MAX_REGION_RATIO", 0.4)
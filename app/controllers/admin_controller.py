@@ -0,0 +1,177 @@
+import hmac
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel
+
+from app.config import OCR_ADMIN_TOKEN
+from app.services import inference_workers
+from app.services.hot_reload import engine_reloader, ReloadInProgress
+from app.services.ocr_service import model_registry
+from app.services.profiling import MAX_SECONDS, MODE_CPROFILE, MODE_NONE, MODE_SAMPLE, ProfileInProgress, STATE_RUNNING, profiler
+
+
+router = APIRouter(prefix="/admin")
+logger = logging.getLogger("paddleocr_app")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None, description='管理令牌，与 OCR_ADMIN_TOKEN 一致')):
+    """未配置 OCR_ADMIN_TOKEN 时管理接口不可用"""
+    if not OCR_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, OCR_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+class ReloadRequest(BaseModel):
+    params: Optional[Dict[str, Any]] = None
+    langs: Optional[List[str]] = None
+
+
+@router.post('/engine/reload', dependencies=[Depends(require_admin)])
+async def reload_engine(request: Optional[ReloadRequest] = None):
+    """后台加载并预热新引擎，就绪后原子切换；进行中的请求在旧引擎上完成后旧引擎才释放。
+
+    - body.params: 可选，传给 PaddleOCR 的参数；不传时重新读取 OCR_ENGINE_PARAMS_FILE
+    - body.langs: 可选，只重建这些语言（仅进程内推理时生效）；不传时重建全部已加载的语言
+    """
+    request = request or ReloadRequest()
+    for lang in request.langs or []:
+        if lang not in model_registry.langs:
+            raise HTTPException(status_code=400, detail=f"Unsupported lang: {lang}")
+    try:
+        status = engine_reloader.start(request.params, request.langs)
+    except ReloadInProgress:
+        raise HTTPException(status_code=409, detail="Reload already in progress")
+    logger.info(f"/admin/engine/reload 已开始 (langs={request.langs}, params={'custom' if request.params is not None else 'file'})")
+    return JSONResponse(status_code=202, content=status)
+
+
+@router.get('/engine', dependencies=[Depends(require_admin)])
+async def engine_status():
+    """当前热替换状态与已加载的引擎"""
+    pool = inference_workers.inference_pool
+    content = {"reload": engine_reloader.status, "models": model_registry.describe(), "generation": model_registry.generation}
+    if pool is not None:
+        content["generation"] = pool.generation
+        content["readyWorkers"] = pool.ready
+    return content
+
+
+class ProfileRequest(BaseModel):
+    mode: str = MODE_SAMPLE
+    requests: int = 0
+    seconds: float = 30.0
+    interval_ms: float = 10.0
+    include_idle: bool = False
+    tracemalloc: bool = False
+    top: int = 30
+
+
+def _finished_session():
+    session = profiler.session
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    if session.state == STATE_RUNNING:
+        raise HTTPException(status_code=409, detail="Profiling still running")
+    return session
+
+
+@router.post('/profile', dependencies=[Depends(require_admin)])
+async def start_profile(request: Optional[ProfileRequest] = None,
+                        wait: bool = Query(False, description='是否等待剖析结束后再返回')):
+    """开启性能剖析，覆盖之后的 N 个 OCR 请求或 T 秒（先到为准），结束后通过下方接口取结果。
+
+    - body.mode: sample（采样调用栈，输出折叠栈）、cprofile（确定性剖析，输出 pstats）或 none（只做 tracemalloc）
+    - body.requests: 完成多少个 OCR 请求后结束，0 表示只按时间结束
+    - body.seconds: 最长剖析时间（秒）
+    - body.interval_ms: sample 模式的采样间隔（毫秒）
+    - body.include_idle: sample 模式是否保留空闲等待中的线程
+    - body.tracemalloc: 是否同时统计内存分配，结束时输出按代码行汇总的前 top 项
+    """
+    request = request or ProfileRequest()
+    if request.mode not in (MODE_SAMPLE, MODE_CPROFILE, MODE_NONE):
+        raise HTTPException(status_code=400, detail=f"Unsupported mode: {request.mode}")
+    if request.mode == MODE_NONE and not request.tracemalloc:
+        raise HTTPException(status_code=400, detail="Mode none requires tracemalloc")
+    if request.requests < 0 or not 0 < request.seconds <= MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"requests must be >= 0 and seconds in (0, {MAX_SECONDS}]")
+    if not 1 <= request.interval_ms <= 1000 or request.top < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be in [1, 1000] and top >= 1")
+    try:
+        status = profiler.start(
+            request.mode,
+            max_requests=request.requests,
+            seconds=request.seconds,
+            interval=request.interval_ms / 1000,
+            include_idle=request.include_idle,
+            trace_malloc=request.tracemalloc,
+            top=request.top,
+        )
+    except ProfileInProgress:
+        raise HTTPException(status_code=409, detail="Profiling already in progress")
+    if wait:
+        await profiler.wait()
+        return profiler.session.status()
+    return JSONResponse(status_code=202, content=status)
+
+
+@router.get('/profile', dependencies=[Depends(require_admin)])
+async def profile_status():
+    """当前或最近一次剖析的状态"""
+    if profiler.session is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    return profiler.session.status()
+
+
+@router.delete('/profile', dependencies=[Depends(require_admin)])
+async def stop_profile():
+    """提前结束剖析；结果保留到下一次开启"""
+    if profiler.session is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    profiler.stop()
+    return profiler.session.status()
+
+
+@router.get('/profile/stacks', dependencies=[Depends(require_admin)])
+async def profile_stacks():
+    """sample 模式的折叠栈，可直接交给 flamegraph.pl 或 speedscope"""
+    _finished_session()
+    stacks = profiler.collapsed_stacks()
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Session was not in sample mode")
+    return PlainTextResponse(stacks)
+
+
+@router.get('/profile/pstats', dependencies=[Depends(require_admin)])
+async def profile_pstats(format: str = Query('text', description='text：按 sort 排序的文本报告；binary：pstats 文件（可用 snakeviz 打开）'),
+                         sort: str = Query('cumulative', description='文本报告的排序键，如 cumulative、tottime、calls'),
+                         limit: int = Query(80, ge=1, description='文本报告列出的函数数')):
+    """cprofile 模式的结果：事件循环线程与工作线程中各任务的剖析合并而成"""
+    _finished_session()
+    if format == 'binary':
+        data = profiler.pstats_binary()
+        if data is None:
+            raise HTTPException(status_code=404, detail="Session was not in cprofile mode")
+        return Response(data, media_type="application/octet-stream",
+                        headers={"Content-Disposition": 'attachment; filename="ocr.pstats"'})
+    if format != 'text':
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    try:
+        text = profiler.pstats_text(sort=sort, limit=limit)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unsupported sort key: {sort}")
+    if text is None:
+        raise HTTPException(status_code=404, detail="Session was not in cprofile mode")
+    return PlainTextResponse(text)
+
+
+@router.get('/profile/allocations', dependencies=[Depends(require_admin)])
+async def profile_allocations():
+    """tracemalloc 统计：剖析结束时仍存活的分配按代码行汇总的前 N 项，以及期间的当前 / 峰值追踪内存"""
+    session = _finished_session()
+    if session.allocations is None:
+        raise HTTPException(status_code=404, detail="Session did not enable tracemalloc")
+    return session.allocations
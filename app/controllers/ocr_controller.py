@@ -1,14 +1,32 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Request, Query
-from fastapi.responses import JSONResponse
-import cv2
-import numpy as np
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Request, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+import asyncio
+import base64
+import binascii
+import json
+import math
 import time
 import logging
 
 from pydantic import BaseModel
 
-from app.services.ocr_service import process_simple
-from app.utils.image_utils import base64_to_image
+from app.config import OCR_WORKER_THREADS
+from app.services.detection_service import process_detection_bytes
+from app.services.ocr_service import model_registry, process_simple_bytes, InvalidImageError, RESPONSE_FORMAT_DETAIL
+from app.services import inference_workers
+from app.services.request_recorder import request_recorder
+from app.services.memory import estimate_file_bytes, estimate_request_bytes, memory_budget, RequestTooLarge
+from app.services.cancellation import CancelToken, RequestCancelled, record_wasted, watch_disconnect
+from app.services.inference_workers import InferenceTimeout, WorkerCrashed
+from app.services.path_input import PathNotAllowed, TooManyFiles, path_resolver, process_simple_path
+from app.services.structure_service import estimate_structure_bytes, process_structure_bytes, structure_scheduler
+from app.services.executor import run_in_worker
+from app.services.scheduler import ocr_scheduler, DeadlineExceeded, Overloaded, DEFAULT_TENANT, PRIORITY_INTERACTIVE, PRIORITY_NORMAL
+from app.services.stream_service import LatestFrame, StreamSession, STATUS_UNCHANGED, record_frame
+from app.utils.image_utils import bytes_to_image, decode_image_bytes
+from app.utils.metrics import REGISTRY
 from app.utils.response_utils import convert_numpy_to_list
 
 
@@ -20,35 +38,46 @@ class Base64ImageRequest(BaseModel):
     image_base64: str
 
 
+class PathOcrRequest(BaseModel):
+    paths: List[str] = []
+    pattern: Optional[str] = None
+    manifest: Optional[str] = None
+    write_results: bool = False
+
+
 @router.get('/health')
 async def health_check():
     return {"status": "healthy", "service": "PaddleOCR"}
 
 
-# @router.post('/ocr_structure/file')
-# async def perform_ocr_structure_file(file: UploadFile = File(...)):
-#     """Perform OCR (structure).
+@router.get('/capacity')
+async def capacity():
+    """节点负载：排队长度、执行中请求数、单图耗时 EWMA、预计积压秒数，以及当前是否接收新请求。
 
-#     - file: form-data 上传的图片文件
-#     - 无额外查询参数
-#     """
-#     start_time = time.time()
-#     try:
-#         contents = await file.read()
-#         image = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
-#         if image is None:
-#             raise HTTPException(status_code=400, detail="Invalid image file")
-#         structured = process_structure(image)
-#         elapsed = time.time() - start_time
-#         logger.info(f"/ocr_structure/file 耗时: {elapsed:.3f}s")
-#         return JSONResponse(content=convert_numpy_to_list(structured))
-#     except Exception as e:
-#         raise HTTPException(status_code=500, detail=str(e))
+    accepting 为 false 时新的 normal 优先级请求会被立即以 503 拒绝，自动扩缩容与上游负载均衡可据此决策。
+    """
+    snapshot = ocr_scheduler.capacity()
+    accepting = snapshot["acceptingByPriority"][PRIORITY_NORMAL]
+    if inference_workers.inference_pool is not None:
+        snapshot["readyWorkers"] = inference_workers.inference_pool.ready
+        # 推理工作进程全部在重启时，排队的请求只会超时
+        accepting = accepting and snapshot["readyWorkers"] > 0
+    snapshot["secondsPerMegapixel"] = getattr(ocr_scheduler.limiter, "short_latency", None)
+    snapshot["memoryBudgetUsedBytes"] = memory_budget.used
+    snapshot["memoryBudgetTotalBytes"] = memory_budget.total_bytes
+    snapshot["accepting"] = accepting
+    # 版面解析使用独立的排队与并发上限
+    snapshot["structure"] = structure_scheduler.capacity()
+    return snapshot
 
 
-@router.post('/ocr_simple/file')
-async def perform_ocr_file(
-    file: UploadFile = File(...),
+@router.get('/metrics')
+async def metrics():
+    """Prometheus 文本格式的运行指标"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+def simple_ocr_params(
     directionCorrection: bool = Query(
         False,
         description='为 true 时进行方向矫正并同步旋转 polys'
@@ -57,58 +86,498 @@ async def perform_ocr_file(
         False,
         description='为 true 或 1 时，在结果中附带 ImageBase64'
     ),
+    responseFormat: str = Query(
+        RESPONSE_FORMAT_DETAIL,
+        alias='format',
+        pattern='^(detail|columnar)$',
+        description='detail（默认）返回 Detail 列表；columnar 返回列式 Columns（平行数组 + 拍平的 int32 四边形）'
+    ),
+    packBoxes: bool = Query(
+        False,
+        description='仅 format=columnar 时生效；为 true 时 Positions 以小端 int32 字节的 base64 字符串返回'
+    ),
+    imgFormat: Optional[str] = Query(
+        None,
+        pattern='^(jpeg|webp|png)$',
+        description='needImg=true 时返回图片的编码格式；不传且未旋转时直接返回原始上传图片'
+    ),
+    imgQuality: Optional[int] = Query(
+        None,
+        ge=1,
+        le=100,
+        description='返回图片的编码质量（jpeg/webp 为质量，png 映射为压缩级别）'
+    ),
+    imgMaxSide: Optional[int] = Query(
+        None,
+        ge=0,
+        description='返回图片最长边上限（像素），超出时等比缩小；0 表示不限制'
+    ),
+    lang: Optional[str] = Query(
+        None,
+        description='识别语言（如 ch、en、japan、chinese_cht、korean），不传时使用 OCR_DEFAULT_LANG'
+    ),
+    layout: bool = Query(
+        False,
+        description='为 true 时 Detail 每项附带 Line（行序号）与 Block（块序号）；format=columnar 时为平行数组 Lines/Blocks'
+    ),
+):
+    """/ocr_simple/* 共用的查询参数，转换为 process_simple 的关键字参数"""
+    if lang is not None and lang not in model_registry.langs:
+        raise HTTPException(status_code=400, detail=f"Unsupported lang: {lang}, expected one of {', '.join(sorted(model_registry.langs))}")
+    return {
+        "direction_correction": directionCorrection,
+        "include_image_info": bool(needImg),
+        "response_format": responseFormat,
+        "pack_boxes": packBoxes,
+        "img_format": imgFormat,
+        "img_quality": imgQuality,
+        "img_max_side": imgMaxSide,
+        "lang": lang,
+        "include_layout": layout,
+    }
+
+
+def scheduling_params(
+    request: Request,
+    priority: Optional[str] = Query(
+        None,
+        pattern='^(interactive|normal|bulk)$',
+        description='调度优先级：interactive > normal > bulk；也可通过请求头 X-Priority 传入，默认 normal'
+    ),
+    deadlineMs: Optional[int] = Query(
+        None,
+        ge=1,
+        description='从请求到达起算的截止时间（毫秒），超时未开始推理的请求直接返回 504；也可通过请求头 X-Deadline-Ms 传入'
+    ),
+):
+    """调度相关参数：优先级、截止时间与租户（请求头 X-Tenant-Id）"""
+    priority = priority or request.headers.get('x-priority', PRIORITY_NORMAL).strip().lower()
+    if deadlineMs is None:
+        try:
+            deadlineMs = int(request.headers.get('x-deadline-ms', ''))
+        except ValueError:
+            deadlineMs = None
+    deadline = time.monotonic() + deadlineMs / 1000.0 if deadlineMs and deadlineMs > 0 else None
+    return {
+        "priority": priority,
+        "tenant": request.headers.get('x-tenant-id') or DEFAULT_TENANT,
+        "deadline": deadline,
+    }
+
+
+async def _submit_until_disconnect(http_request, func, *args, scheduler=ocr_scheduler, **kwargs):
+    """通过调度器执行任务，同时监听客户端断开：断开后排队中的任务被丢弃、执行中的任务在阶段边界放弃。
+
+    任务完成但客户端已断开时返回 None，调用方不必再序列化响应。
+    """
+    cancel_token = CancelToken()
+    watcher = asyncio.ensure_future(watch_disconnect(http_request, cancel_token))
+    try:
+        result = await scheduler.submit(func, *args, cancel_token=cancel_token, **kwargs)
+    finally:
+        watcher.cancel()
+    if cancel_token.cancelled or await http_request.is_disconnected():
+        # 结果已交付但无人接收：按平均任务耗时计入浪费
+        record_wasted(scheduler.job_seconds or 0.0)
+        return None
+    return result
+
+
+def _service_error(e):
+    """服务层异常 -> (状态码, 错误信息, 响应头)；不是已知的服务层异常时返回 None"""
+    if isinstance(e, InvalidImageError):
+        return 400, "Invalid image file", None
+    if isinstance(e, RequestTooLarge):
+        return 413, "Image too large", None
+    if isinstance(e, DeadlineExceeded):
+        return 504, "Deadline exceeded", None
+    if isinstance(e, Overloaded):
+        return 503, "Server overloaded", {"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    if isinstance(e, InferenceTimeout):
+        # 推理卡住、工作进程已被终止：不带 Retry-After，客户端不应重试同一张图
+        return 504, "Inference timed out", None
+    if isinstance(e, WorkerCrashed):
+        return 503, "Inference worker crashed", {"Retry-After": "1"}
+    return None
+
+
+def _handle_service_error(endpoint, e, start_time, scheduling):
+    """HTTP 端点的统一异常处理：记录日志后返回 499（客户端已断开）或抛出对应状态码的 HTTPException"""
+    if isinstance(e, HTTPException):
+        raise e
+    if isinstance(e, RequestCancelled):
+        logger.info(f"{endpoint} 客户端已断开，已取消处理 ({time.time() - start_time:.3f}s)")
+        return Response(status_code=499)
+    mapped = _service_error(e)
+    if mapped is None:
+        logger.error(f"{endpoint} 处理失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+    status_code, detail, headers = mapped
+    if isinstance(e, DeadlineExceeded):
+        logger.warning(f"{endpoint} 超过截止时间，已放弃 (priority={scheduling['priority']}, tenant={scheduling['tenant']})")
+    elif isinstance(e, RequestTooLarge):
+        logger.warning(f"{endpoint} 预估内存 {e.estimated_bytes} 字节超过预算 {e.budget_bytes} 字节，拒绝请求")
+    elif isinstance(e, Overloaded):
+        logger.warning(f"{endpoint} 排队已满，拒绝请求 (priority={scheduling['priority']}, tenant={scheduling['tenant']})")
+    elif isinstance(e, (InferenceTimeout, WorkerCrashed)):
+        logger.error(f"{endpoint} 推理失败: {e}")
+    raise HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+
+def _describe_params(params):
+    return (
+        f"directionCorrection={params['direction_correction']}, needImg={params['include_image_info']}, "
+        f"format={params['response_format']}, lang={params['lang'] or model_registry.default_lang}"
+    )
+
+
+@router.post('/ocr_simple/file')
+async def perform_ocr_file(
+    http_request: Request,
+    file: UploadFile = File(...),
+    params: dict = Depends(simple_ocr_params),
+    scheduling: dict = Depends(scheduling_params),
 ):
     """Perform OCR (simple).
 
     - file: form-data 上传的图片文件
     - directionCorrection (query): 可选，"true"/"false"；为 true 时进行方向矫正并同步旋转 polys
     - needImg (query): 可选，"true"/"1" 返回结果中附带 ImageBase64；否则仅返回 Angle/Height/Width
+    - format (query): 可选，detail/columnar；columnar 适合高框数文档，体积与序列化开销更小
+    - packBoxes (query): 可选，format=columnar 时将 Positions 打包为 base64
+    - imgFormat/imgQuality/imgMaxSide (query): 可选，needImg=true 时返回图片的格式、质量与最长边
+    - layout (query): 可选，Detail 附带 Line/Block；Detail 与 Text 总是按阅读顺序排列，Text 每行以换行结尾
+    - priority/deadlineMs (query) 或 X-Priority/X-Deadline-Ms/X-Tenant-Id (header): 可选，调度优先级、截止时间与租户
     """
-    include_image = bool(needImg)
     start_time = time.time()
     try:
         contents = await file.read()
-        image = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image file")
-        structured = process_simple(image, direction_correction=directionCorrection, include_image_info=include_image)
+        request_recorder.attach("ocr_simple", contents, params)
+        cost = estimate_request_bytes(contents, params['include_image_info'], params['direction_correction'])
+        structured = await _submit_until_disconnect(http_request, process_simple_bytes, contents, decoder=decode_image_bytes, cost=cost,
+                                                   dedup_scope=scheduling['tenant'], **params, **scheduling)
+        if structured is None:
+            logger.info(f"/ocr_simple/file 客户端已断开，丢弃结果 ({time.time() - start_time:.3f}s)")
+            return Response(status_code=499)
         elapsed = time.time() - start_time
-        logger.info(f"/ocr_simple/file 耗时: {elapsed:.3f}s (directionCorrection={directionCorrection}, needImg={include_image})")
+        logger.info(f"/ocr_simple/file 耗时: {elapsed:.3f}s ({_describe_params(params)})")
         return JSONResponse(content=convert_numpy_to_list(structured))
     except Exception as e:
-        logger.error(f"/ocr_simple/file 处理失败: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error")
+        return _handle_service_error('/ocr_simple/file', e, start_time, scheduling)
 
 
 @router.post('/ocr_simple/base64')
 async def perform_ocr_base64(
+    http_request: Request,
     request: Base64ImageRequest,
+    params: dict = Depends(simple_ocr_params),
+    scheduling: dict = Depends(scheduling_params),
+):
+    """Perform OCR (simple) with base64 body.
+
+    - body.image_base64: 必填，图片的 base64 字符串（不带 data URI 前缀）
+    - 查询参数同 /ocr_simple/file
+    """
+    start_time = time.time()
+    try:
+        contents = base64.b64decode(request.image_base64)
+        request_recorder.attach("ocr_simple", contents, params)
+        cost = estimate_request_bytes(contents, params['include_image_info'], params['direction_correction'])
+        structured = await _submit_until_disconnect(http_request, process_simple_bytes, contents, decoder=bytes_to_image, cost=cost,
+                                                   dedup_scope=scheduling['tenant'], **params, **scheduling)
+        if structured is None:
+            logger.info(f"/ocr_simple/base64 客户端已断开，丢弃结果 ({time.time() - start_time:.3f}s)")
+            return Response(status_code=499)
+        elapsed = time.time() - start_time
+        logger.info(f"/ocr_simple/base64 耗时: {elapsed:.3f}s ({_describe_params(params)})")
+        return JSONResponse(content=convert_numpy_to_list(structured))
+    except Exception as e:
+        return _handle_service_error('/ocr_simple/base64', e, start_time, scheduling)
+
+
+async def _ocr_one_path(path, write_results, params, scheduling, cancel_token, limit):
+    """处理单个文件，返回结果项；客户端断开时返回 None"""
+    entry = {"Path": path_resolver.relative(path)}
+    async with limit:
+        try:
+            cost = await run_in_worker(estimate_file_bytes, path, params['include_image_info'], params['direction_correction'])
+            structured, result_path = await ocr_scheduler.submit(process_simple_path, path, write_result=write_results,
+                                                                 cancel_token=cancel_token, cost=cost, dedup_scope=scheduling['tenant'],
+                                                                 **params, **scheduling)
+        except RequestCancelled:
+            return None
+        except FileNotFoundError:
+            entry["Error"] = "File not found"
+        except Exception as e:
+            mapped = _service_error(e)
+            if mapped is not None:
+                entry["Error"] = mapped[1]
+            elif isinstance(e, ValueError):
+                # 空文件无法映射
+                entry["Error"] = "Invalid image file"
+            elif isinstance(e, OSError):
+                entry["Error"] = f"Cannot read file: {e.strerror or e}"
+            else:
+                logger.error(f"/ocr_simple/path 处理 {entry['Path']} 失败: {str(e)}", exc_info=True)
+                entry["Error"] = "Internal server error"
+        else:
+            if result_path is not None:
+                entry["ResultPath"] = path_resolver.relative(result_path)
+            else:
+                entry.update(convert_numpy_to_list(structured))
+    return entry
+
+
+@router.post('/ocr_simple/path')
+async def perform_ocr_path(
+    http_request: Request,
+    request: PathOcrRequest,
+    params: dict = Depends(simple_ocr_params),
+    scheduling: dict = Depends(scheduling_params),
+):
+    """Perform OCR (simple) on files under OCR_DATA_ROOT: 同机生产者只传路径，服务端映射读取，免去上传。
+
+    - body.paths: 可选，文件路径列表（相对 OCR_DATA_ROOT）
+    - body.pattern: 可选，glob 模式（相对 OCR_DATA_ROOT，支持 **），只匹配常见图片扩展名
+    - body.manifest: 可选，清单文件路径（相对 OCR_DATA_ROOT），每行一个文件路径
+    - body.write_results: 可选，为 true 时结果写到图片旁边的 <文件名>.ocr.json，响应中只返回 ResultPath
+    - 查询参数同 /ocr_simple/file；每个文件作为一个任务调度
+    - Results 与输入顺序一致，每项带 Path；单个文件失败时该项为 Error，不影响其他文件
+    """
+    if not path_resolver.enabled:
+        raise HTTPException(status_code=404, detail="Path input is disabled (OCR_DATA_ROOT is not set)")
+    if not (request.paths or request.pattern or request.manifest):
+        raise HTTPException(status_code=400, detail="One of paths, pattern or manifest is required")
+    start_time = time.time()
+    try:
+        files = await run_in_worker(path_resolver.resolve, request.paths, request.pattern, request.manifest)
+    except PathNotAllowed as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except TooManyFiles as e:
+        raise HTTPException(status_code=413, detail=f"Too many files: more than {e.limit}")
+    except OSError:
+        raise HTTPException(status_code=400, detail="Cannot read manifest")
+
+    # 同一请求内同时在途的文件数与工作线程数一致，其余文件在请求内排队，不占满调度器队列
+    limit = asyncio.Semaphore(OCR_WORKER_THREADS)
+    cancel_token = CancelToken()
+    watcher = asyncio.ensure_future(watch_disconnect(http_request, cancel_token))
+    try:
+        results = await asyncio.gather(*(_ocr_one_path(path, request.write_results, params, scheduling, cancel_token, limit) for path in files))
+    finally:
+        watcher.cancel()
+    if cancel_token.cancelled or None in results:
+        logger.info(f"/ocr_simple/path 客户端已断开，已取消剩余文件 ({time.time() - start_time:.3f}s)")
+        return Response(status_code=499)
+    failed = sum(1 for entry in results if "Error" in entry)
+    logger.info(f"/ocr_simple/path 耗时: {time.time() - start_time:.3f}s (files={len(results)}, failed={failed}, {_describe_params(params)})")
+    return JSONResponse(content={"Count": len(results), "Failed": failed, "Results": results})
+
+
+def detection_params(
     directionCorrection: bool = Query(
         False,
         description='为 true 时进行方向矫正并同步旋转 polys'
     ),
+    orientation: bool = Query(
+        False,
+        description='为 true 时先做整图方向分类（0/90/180/270），转正后再检测'
+    ),
     needImg: bool = Query(
         False,
         description='为 true 或 1 时，在结果中附带 ImageBase64'
     ),
+    imgFormat: Optional[str] = Query(
+        None,
+        pattern='^(jpeg|webp|png)$',
+        description='needImg=true 时返回图片的编码格式；不传且未旋转时直接返回原始上传图片'
+    ),
+    imgQuality: Optional[int] = Query(
+        None,
+        ge=1,
+        le=100,
+        description='返回图片的编码质量（jpeg/webp 为质量，png 映射为压缩级别）'
+    ),
+    imgMaxSide: Optional[int] = Query(
+        None,
+        ge=0,
+        description='返回图片最长边上限（像素），超出时等比缩小；0 表示不限制'
+    ),
 ):
-    """Perform OCR (simple) with base64 body.
+    """/ocr_detect/file 的查询参数，转换为 process_detection 的关键字参数"""
+    return {
+        "direction_correction": directionCorrection,
+        "orientation": orientation,
+        "include_image_info": bool(needImg),
+        "img_format": imgFormat,
+        "img_quality": imgQuality,
+        "img_max_side": imgMaxSide,
+    }
 
-    - body.image_base64: 必填，图片的 base64 字符串（不带 data URI 前缀）
-    - 无额外查询参数
+
+@router.post('/ocr_detect/file')
+async def perform_detect_file(
+    http_request: Request,
+    file: UploadFile = File(...),
+    params: dict = Depends(detection_params),
+    scheduling: dict = Depends(scheduling_params),
+):
+    """Text detection only: 只返回文本框，不做识别。
+
+    - file: form-data 上传的图片文件
+    - directionCorrection/needImg/imgFormat/imgQuality/imgMaxSide (query): 同 /ocr_simple/file
+    - orientation (query): 可选，先做整图方向分类并转正
+    - priority/deadlineMs (query) 或 X-Priority/X-Deadline-Ms/X-Tenant-Id (header): 可选，调度优先级、截止时间与租户
+    - DetectionInfo[0].Detail 中每项为 Confidence（检测分数）与 Position（与 /ocr_simple/* 相同的四点坐标）
     """
     start_time = time.time()
     try:
-        image = base64_to_image(request.image_base64)
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image file")
-        include_image = bool(needImg)
-        structured = process_simple(image, direction_correction=directionCorrection, include_image_info=include_image)
+        contents = await file.read()
+        request_recorder.attach("ocr_detect", contents, params)
+        cost = estimate_request_bytes(contents, params['include_image_info'], params['direction_correction'] or params['orientation'])
+        structured = await _submit_until_disconnect(http_request, process_detection_bytes, contents, decoder=decode_image_bytes, cost=cost, **params, **scheduling)
+        if structured is None:
+            logger.info(f"/ocr_detect/file 客户端已断开，丢弃结果 ({time.time() - start_time:.3f}s)")
+            return Response(status_code=499)
         elapsed = time.time() - start_time
-        logger.info(f"/ocr_simple/base64 耗时: {elapsed:.3f}s (directionCorrection={directionCorrection}, needImg={include_image})")
+        logger.info(
+            f"/ocr_detect/file 耗时: {elapsed:.3f}s (boxes={structured['DetectionInfo'][0]['Count']}, "
+            f"directionCorrection={params['direction_correction']}, orientation={params['orientation']}, needImg={params['include_image_info']})"
+        )
         return JSONResponse(content=convert_numpy_to_list(structured))
     except Exception as e:
-        logger.error(f"/ocr_simple/base64 处理失败: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error")
+        return _handle_service_error('/ocr_detect/file', e, start_time, scheduling)
+
+
+def _frame_bytes(message):
+    """二进制消息为图片字节；文本消息为 {"image_base64": "..."}"""
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    payload = json.loads(message.get("text") or "")
+    return base64.b64decode(payload["image_base64"])
+
+
+async def _process_stream(websocket, session, frames, priority, tenant):
+    """逐帧处理：每次取最新的一帧，处理期间到达的帧只保留最后一帧"""
+    last_seq = 0
+    while True:
+        frame = await frames.take()
+        if frame is None:
+            return
+        seq, message = frame
+        cancel_token = session.new_token()
+        try:
+            contents = _frame_bytes(message)
+            plan = await run_in_worker(session.analyze, contents, cancel_token=cancel_token)
+            if plan.status == STATUS_UNCHANGED:
+                record_frame(STATUS_UNCHANGED)
+                payload = {"Status": STATUS_UNCHANGED}
+            else:
+                cost = estimate_request_bytes(contents)
+                payload = await ocr_scheduler.submit(session.recognize, plan, priority=priority, tenant=tenant, cancel_token=cancel_token, cost=cost)
+        except RequestCancelled:
+            return
+        except Exception as e:
+            record_frame("error")
+            mapped = _service_error(e)
+            if mapped is not None:
+                _, detail, headers = mapped
+                payload = {"Error": detail}
+                if headers and "Retry-After" in headers:
+                    payload["RetryAfter"] = int(headers["Retry-After"])
+                if isinstance(e, (InferenceTimeout, WorkerCrashed)):
+                    logger.error(f"/ocr_simple/ws 推理失败: {e}")
+            elif isinstance(e, (binascii.Error, KeyError, TypeError, ValueError)):
+                payload = {"Error": "Invalid image file"}
+            else:
+                logger.error(f"/ocr_simple/ws 处理失败: {str(e)}", exc_info=True)
+                payload = {"Error": "Internal server error"}
+        payload["Frame"] = seq
+        payload["Skipped"] = seq - last_seq - 1
+        last_seq = seq
+        await websocket.send_json(convert_numpy_to_list(payload))
 
 
+@router.websocket('/ocr_simple/ws')
+async def perform_ocr_stream(
+    websocket: WebSocket,
+    lang: Optional[str] = Query(
+        None,
+        description='识别语言，同 /ocr_simple/file'
+    ),
+    priority: str = Query(
+        PRIORITY_INTERACTIVE,
+        pattern='^(interactive|normal|bulk)$',
+        description='调度优先级，默认 interactive'
+    ),
+):
+    """流式 OCR：同一文档的连续帧（摄像头 / 视频）。
+
+    - 每条消息一帧：二进制消息为图片字节，文本消息为 {"image_base64": "..."}
+    - 每处理一帧返回一条 JSON：Frame（帧序号，从 1 开始）、Skipped（与上一个处理的帧之间被合并丢弃的帧数）、Status：
+      unchanged（与上一次识别的帧相比没有变化，不附带结果）、partial（只重新识别了 Regions 中的区域并合并）、full（整帧重新识别）；
+      partial/full 附带与 /ocr_simple/file 相同的 OcrInfo 与 ImageInfo；单帧失败时返回 Error，会话继续
+    - 请求头 X-Tenant-Id: 可选，租户
+    """
+    if lang is not None and lang not in model_registry.langs:
+        await websocket.close(code=1008, reason=f"Unsupported lang: {lang}")
+        return
+    await websocket.accept()
+    tenant = websocket.headers.get('x-tenant-id') or DEFAULT_TENANT
+    session = StreamSession(lang=lang)
+    frames = LatestFrame()
+    start_time = time.time()
+    processor = asyncio.ensure_future(_process_stream(websocket, session, frames, priority, tenant))
+    try:
+        while not processor.done():
+            receiver = asyncio.ensure_future(websocket.receive())
+            await asyncio.wait({receiver, processor}, return_when=asyncio.FIRST_COMPLETED)
+            if not receiver.done():
+                receiver.cancel()
+                break
+            message = receiver.result()
+            if message["type"] == "websocket.disconnect":
+                break
+            frames.put(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        frames.close()
+        session.close()
+        processor.cancel()
+        try:
+            await processor
+        except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+            pass
+        except Exception as e:
+            logger.error(f"/ocr_simple/ws 会话异常结束: {str(e)}", exc_info=True)
+    logger.info(f"/ocr_simple/ws 会话结束: 收到 {frames.received} 帧，合并丢弃 {frames.coalesced} 帧，持续 {time.time() - start_time:.1f}s")
+
+
+@router.post('/ocr_structure/file')
+async def perform_ocr_structure_file(
+    http_request: Request,
+    file: UploadFile = File(...),
+    markdown: bool = Query(False, description='为 true 时附带整页的 Markdown 文本'),
+    scheduling: dict = Depends(scheduling_params),
+):
+    """Perform OCR (structure): 版面、表格解析（PPStructureV3）。
+
+    - file: form-data 上传的图片文件
+    - markdown (query): 可选，附带 Markdown
+    - 使用独立的线程池与排队，首次请求时加载模型；响应中 Timings 为各阶段耗时（毫秒）
+    """
+    start_time = time.time()
+    try:
+        contents = await file.read()
+        request_recorder.attach("ocr_structure", contents, {"include_markdown": markdown})
+        cost = estimate_structure_bytes(contents)
+        structured = await _submit_until_disconnect(http_request, process_structure_bytes, contents, include_markdown=markdown,
+                                                    submitted_at=time.monotonic(), scheduler=structure_scheduler, cost=cost, **scheduling)
+        if structured is None:
+            logger.info(f"/ocr_structure/file 客户端已断开，丢弃结果 ({time.time() - start_time:.3f}s)")
+            return Response(status_code=499)
+        logger.info(f"/ocr_structure/file 耗时: {time.time() - start_time:.3f}s (阶段耗时 ms: {structured['Timings']})")
+        return JSONResponse(content=structured)
+    except Exception as e:
+        return _handle_service_error('/ocr_structure/file', e, start_time, scheduling)
@@ -0,0 +1,202 @@
+"""按 Accept-Encoding 协商的响应压缩中间件（gzip / brotli / zstd）
+
+- 小于阈值的响应不压缩
+- 按 Content-Type 选择压缩级别（JSON 与文本可压缩性不同）
+- 已带 Content-Encoding、本身即压缩格式、或抽样压缩率很差的响应直接透传，避免二次压缩
+- 较大的响应在线程池中压缩，不阻塞事件循环
+"""
+import gzip
+import zlib
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，缺失时不提供 br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，缺失时不提供 zstd
+    zstandard = None
+
+from app.config import OCR_COMPRESS_MIN_SIZE, OCR_COMPRESS_OFFLOAD_SIZE
+
+
+ENCODING_BROTLI = "br"
+ENCODING_ZSTD = "zstd"
+ENCODING_GZIP = "gzip"
+
+# 服务端偏好顺序：q 值相同时优先选择压缩率更高的算法
+_PREFERENCE = (ENCODING_BROTLI, ENCODING_ZSTD, ENCODING_GZIP)
+
+# 各 Content-Type 的压缩级别；OCR JSON 体积大且重复度高，brotli/zstd 取中等级别兼顾速度
+DEFAULT_LEVELS = {
+    "application/json": {ENCODING_BROTLI: 5, ENCODING_ZSTD: 6, ENCODING_GZIP: 6},
+    "text/": {ENCODING_BROTLI: 6, ENCODING_ZSTD: 9, ENCODING_GZIP: 6},
+    "*": {ENCODING_BROTLI: 4, ENCODING_ZSTD: 3, ENCODING_GZIP: 5},
+}
+
+# 本身已压缩的内容类型，不再压缩
+_INCOMPRESSIBLE_PREFIXES = (
+    "image/",
+    "video/",
+    "audio/",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zstd",
+    "application/x-brotli",
+    "application/pdf",
+)
+
+# 抽样检测：对开头一段数据做快速压缩，压缩率高于该比例视为已压缩数据
+_SAMPLE_SIZE = 64 * 1024
+_SAMPLE_MAX_RATIO = 0.9
+
+
+def _available_encodings():
+    encodings = []
+    if brotli is not None:
+        encodings.append(ENCODING_BROTLI)
+    if zstandard is not None:
+        encodings.append(ENCODING_ZSTD)
+    encodings.append(ENCODING_GZIP)
+    return encodings
+
+
+def negotiate_encoding(accept_encoding, available=None):
+    """解析 Accept-Encoding（含 q 值），返回选中的编码，无可用编码时返回 None"""
+    available = available if available is not None else _available_encodings()
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in _PREFERENCE:
+        if encoding not in available:
+            continue
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def levels_for_content_type(content_type, levels=None):
+    levels = levels or DEFAULT_LEVELS
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in levels:
+        return levels[media_type]
+    for prefix, value in levels.items():
+        if prefix.endswith("/") and media_type.startswith(prefix):
+            return value
+    return levels.get("*", DEFAULT_LEVELS["*"])
+
+
+def looks_compressed(body):
+    """抽样判断数据是否已压缩（或随机性很高），用于跳过无效压缩"""
+    sample = body[:_SAMPLE_SIZE]
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) > len(sample) * _SAMPLE_MAX_RATIO
+
+
+def compress_body(body, encoding, level):
+    if encoding == ENCODING_BROTLI:
+        return brotli.compress(body, quality=level)
+    if encoding == ENCODING_ZSTD:
+        # ZstdCompressor 非线程安全，每次调用单独创建
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=OCR_COMPRESS_MIN_SIZE, offload_size=OCR_COMPRESS_OFFLOAD_SIZE, levels=None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.levels = levels or DEFAULT_LEVELS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware, encoding, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        if self.start_message is None:
+            await self.send(message)
+            return
+
+        start_message, self.start_message = self.start_message, None
+        body = message.get("body", b"")
+        # 流式响应（多段 body）直接透传
+        if message.get("more_body", False):
+            self.passthrough = True
+            await self.send(start_message)
+            await self.send(message)
+            return
+
+        headers = MutableHeaders(raw=start_message["headers"])
+        compressed = await self._maybe_compress(headers, body)
+        if compressed is not None:
+            body = compressed
+            headers["Content-Encoding"] = self.encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            start_message["headers"] = headers.raw
+        await self.send(start_message)
+        await self.send({"type": "http.response.body", "body": body})
+
+    async def _maybe_compress(self, headers, body):
+        if len(body) < self.middleware.minimum_size or "content-encoding" in headers:
+            return None
+        content_type = headers.get("content-type", "")
+        if content_type.lower().startswith(_INCOMPRESSIBLE_PREFIXES):
+            return None
+        level = levels_for_content_type(content_type, self.middleware.levels)[self.encoding]
+        if len(body) >= self.middleware.offload_size:
+            compressed = await anyio.to_thread.run_sync(self._compress_if_useful, body, level)
+        else:
+            compressed = self._compress_if_useful(body, level)
+        return compressed
+
+    def _compress_if_useful(self, body, level):
+        if looks_compressed(body):
+            return None
+        compressed = compress_body(body, self.encoding, level)
+        if len(compressed) >= len(body):
+            return None
+        return compressed
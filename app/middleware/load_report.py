@@ -0,0 +1,36 @@
+"""在每个响应头中附带本节点的当前负载，供上游网关按负载路由
+
+- X-Queue-Depth: 调度器中排队等待的请求数
+- X-In-Flight: 正在执行的请求数
+- X-Concurrency-Limit: 当前并发上限
+"""
+from starlette.datastructures import MutableHeaders
+
+from app.services.scheduler import ocr_scheduler
+
+
+HEADER_QUEUE_DEPTH = "X-Queue-Depth"
+HEADER_IN_FLIGHT = "X-In-Flight"
+HEADER_CONCURRENCY_LIMIT = "X-Concurrency-Limit"
+
+
+class LoadReportMiddleware:
+    def __init__(self, app, scheduler=ocr_scheduler):
+        self.app = app
+        self.scheduler = scheduler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_load(message):
+            if message["type"] == "http.response.start":
+                # 在响应开始时取值，反映的是请求完成时刻的负载
+                headers = MutableHeaders(scope=message)
+                headers[HEADER_QUEUE_DEPTH] = str(self.scheduler.queue_depth)
+                headers[HEADER_IN_FLIGHT] = str(self.scheduler.in_flight)
+                headers[HEADER_CONCURRENCY_LIMIT] = str(self.scheduler.limiter.limit)
+            await send(message)
+
+        await self.app(scope, receive, send_with_load)
@@ -0,0 +1,75 @@
+"""请求上下文与访问日志
+
+- 请求 ID 取自请求头 X-Request-Id（没有时生成），写入日志上下文并在响应头中返回
+- 请求结束时输出一条结构化访问日志：方法、路径、状态码、总耗时与各阶段耗时；
+  状态码 >= 400 的访问日志为 WARNING，不参与采样
+- 启用慢请求录制时，请求结束后交给 request_recorder 决定是否保存
+- 性能剖析进行中时，请求结束后通知 profiler 计数（达到请求数后结束剖析）
+"""
+import logging
+import time
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.services.profiling import profiler
+from app.services.request_recorder import request_recorder
+from app.utils.log_utils import request_id_var, stage_timings_var, stage_timings_ms
+
+
+HEADER_REQUEST_ID = "X-Request-Id"
+
+# 请求头中的请求 ID 过长时截断，避免日志被撑大
+_MAX_REQUEST_ID_LENGTH = 64
+
+logger = logging.getLogger("paddleocr_app.access")
+
+
+class RequestContextMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(HEADER_REQUEST_ID) or uuid.uuid4().hex[:16]
+        request_id = request_id[:_MAX_REQUEST_ID_LENGTH]
+        request_token = request_id_var.set(request_id)
+        stages_token = stage_timings_var.set({})
+        capture_token = request_recorder.begin()
+        started = time.perf_counter()
+        status = None
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)[HEADER_REQUEST_ID] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if scope["type"] == "http":
+                # 未发出响应就抛出异常时由 ServerErrorMiddleware 返回 500
+                status = status or 500
+                duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                stages_ms = stage_timings_ms()
+                logger.log(
+                    logging.WARNING if status >= 400 else logging.INFO,
+                    f"{scope['method']} {scope['path']} {status}",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": duration_ms,
+                        "stages_ms": stages_ms,
+                    },
+                )
+                request_recorder.finish(request_id, scope["path"], scope.get("query_string", b"").decode("latin-1"), status, duration_ms, stages_ms)
+                profiler.request_finished(scope["path"])
+            request_recorder.end(capture_token)
+            request_id_var.reset(request_token)
+            stage_timings_var.reset(stages_token)
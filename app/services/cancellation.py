@@ -0,0 +1,84 @@
+"""请求取消：客户端断开或超过截止时间后，排队中的任务直接丢弃，执行中的任务在下一个阶段边界放弃"""
+import asyncio
+import threading
+
+from app.utils.metrics import REGISTRY
+
+
+CANCEL_DISCONNECT = "disconnect"
+CANCEL_DEADLINE = "deadline"
+
+# 断开检测的轮询间隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.2
+
+_cancelled = REGISTRY.counter("ocr_cancelled_total", "Requests cancelled after submission, by reason and the stage they were in")
+_wasted_seconds = REGISTRY.counter("ocr_wasted_seconds_total", "Worker seconds spent on requests whose result was discarded")
+_saved_seconds = REGISTRY.counter("ocr_saved_seconds_total", "Estimated worker seconds saved by dropping or abandoning cancelled requests")
+
+
+class RequestCancelled(Exception):
+    """请求已被取消（客户端断开或超过截止时间）"""
+
+    def __init__(self, reason=CANCEL_DISCONNECT, stage=None):
+        super().__init__(f"request cancelled ({reason}) at {stage or 'unknown stage'}")
+        self.reason = reason
+        self.stage = stage
+
+
+class CancelToken:
+    """跨线程的取消标记：事件循环侧调用 cancel，工作线程侧在阶段边界调用 raise_if_cancelled"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason=CANCEL_DISCONNECT):
+        if self._event.is_set():
+            return
+        self.reason = reason
+        self._event.set()
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """注册取消回调（在调用 cancel 的线程中执行）；已取消时立即执行"""
+        if self._event.is_set():
+            callback()
+        else:
+            self._callbacks.append(callback)
+
+    def raise_if_cancelled(self, stage):
+        if self._event.is_set():
+            raise RequestCancelled(self.reason, stage)
+
+
+def raise_if_cancelled(cancel_token, stage):
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled(stage)
+
+
+def record_cancelled(reason, stage):
+    _cancelled.inc(reason=reason or CANCEL_DISCONNECT, stage=stage)
+
+
+def record_wasted(seconds):
+    _wasted_seconds.inc(max(0.0, seconds))
+
+
+def record_saved(seconds):
+    _saved_seconds.inc(max(0.0, seconds))
+
+
+async def watch_disconnect(request, cancel_token, interval=DISCONNECT_POLL_INTERVAL):
+    """轮询客户端连接状态，断开时取消 token；调用方在请求结束时取消该协程"""
+    while not cancel_token.cancelled:
+        if await request.is_disconnected():
+            cancel_token.cancel(CANCEL_DISCONNECT)
+            return
+        await asyncio.sleep(interval)
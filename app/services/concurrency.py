@@ -0,0 +1,117 @@
+"""基于推理延迟的自适应并发限制（AIMD + 延迟梯度，思路参考 Netflix concurrency-limits）
+
+- 延迟以「每百万像素推理耗时」衡量，避免大图被误判为过载
+- 长期基线跟踪无排队时的延迟：样本低于基线时快速下调，高于时缓慢上调
+- 短期延迟未超过 基线 × tolerance 且并发名额被充分使用时，limit 加 1（加性增）
+- 短期延迟超过 基线 × tolerance 时，limit 乘以 backoff（乘性减）
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import (
+    OCR_ADAPTIVE_LIMIT,
+    OCR_SCHED_CONCURRENCY,
+    OCR_LIMIT_INITIAL,
+    OCR_LIMIT_MIN,
+    OCR_LIMIT_MAX,
+    OCR_LIMIT_TOLERANCE,
+    OCR_LIMIT_BACKOFF,
+)
+from app.utils.metrics import REGISTRY
+
+# 小图按该像素数计，避免每像素延迟被固定开销放大
+_MIN_MEGAPIXELS = 0.25
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial=OCR_LIMIT_INITIAL, min_limit=OCR_LIMIT_MIN, max_limit=OCR_LIMIT_MAX,
+                 tolerance=OCR_LIMIT_TOLERANCE, backoff=OCR_LIMIT_BACKOFF, short_alpha=0.3, long_alpha=0.02):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.short_alpha = short_alpha
+        self.long_alpha = long_alpha
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self._baseline = None
+        self._short = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def baseline(self):
+        return self._baseline
+
+    @property
+    def short_latency(self):
+        return self._short
+
+    @contextmanager
+    def measure(self, pixels):
+        """包裹推理路径（含等待推理锁的时间），成功完成时记录一次样本"""
+        with self._lock:
+            self._in_flight += 1
+            in_flight = self._in_flight
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+            if succeeded:
+                self.on_sample(elapsed, pixels, in_flight)
+
+    def on_sample(self, seconds, pixels, in_flight):
+        """记录一次推理样本；in_flight 为样本产生时正在执行的任务数"""
+        sample = seconds / max(pixels / 1e6, _MIN_MEGAPIXELS)
+        with self._lock:
+            if self._baseline is None:
+                self._baseline = self._short = sample
+                return
+            self._short += self.short_alpha * (sample - self._short)
+            if sample < self._baseline:
+                # 出现更快的样本说明基线偏高，快速跟随
+                self._baseline += 0.5 * (sample - self._baseline)
+            else:
+                self._baseline += self.long_alpha * (sample - self._baseline)
+
+            if self._short > self._baseline * self.tolerance:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+            elif in_flight * 2 >= self._limit:
+                # 名额使用率较高时才增长（约每 limit 个样本加 1），空闲时不会无意义地抬高上限
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+
+class FixedLimiter:
+    """固定并发上限，用于关闭自适应时"""
+
+    def __init__(self, limit):
+        self._limit = max(1, limit)
+
+    @property
+    def limit(self):
+        return self._limit
+
+    @contextmanager
+    def measure(self, pixels):
+        yield
+
+    def on_sample(self, seconds, pixels, in_flight):
+        pass
+
+
+inference_limiter = AdaptiveLimiter() if OCR_ADAPTIVE_LIMIT else FixedLimiter(OCR_SCHED_CONCURRENCY)
+
+REGISTRY.gauge("ocr_concurrency_limit", "Current concurrency limit for OCR inference").set_function(lambda: inference_limiter.limit)
+if isinstance(inference_limiter, AdaptiveLimiter):
+    _latency = REGISTRY.gauge("ocr_inference_seconds_per_megapixel", "Inference latency per megapixel seen by the limiter")
+    _latency.set_function(lambda: inference_limiter.baseline or 0.0, window="baseline")
+    _latency.set_function(lambda: inference_limiter.short_latency or 0.0, window="short")
@@ -0,0 +1,213 @@
+"""仅文本检测（不识别）
+
+- 只运行文本检测模型（可选整图方向分类），返回文本框，供打码、裁剪建议、版面检查等只关心文字位置的场景使用
+- 框的格式、方向矫正与角度计算与 /ocr_simple/* 一致（复用 build_items_from_predict_results）
+- 检测与方向分类模型在首次请求时加载，始终在 API 进程内推理（不经过推理工作进程）
+- 引擎参数取自 OCR_ENGINE_PARAMS_FILE 中检测 / 方向分类相关的 PaddleOCR 参数；引擎热替换时随 OCR 引擎一起用新参数重建
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+from paddleocr import DocImgOrientationClassification, TextDetection
+
+from app.services.cancellation import raise_if_cancelled
+from app.services.memory import RssTracker
+from app.services.model_registry import load_engine_params
+from app.services.ocr_service import InvalidImageError, _encode_result_image
+from app.utils.buffer_pool import buffer_pool
+from app.utils.image_utils import _rotate_image_keep_size, _rotate_image_resize, decode_image_bytes
+from app.utils.log_utils import log_stage
+from app.utils.predict_utils import _build_image_info, _result_data, build_items_from_predict_results
+
+
+logger = logging.getLogger("paddleocr_app")
+
+# PaddleOCR 产线参数 -> 单模型参数
+_DETECTION_PARAMS = {
+    "text_detection_model_name": "model_name",
+    "text_detection_model_dir": "model_dir",
+    "text_det_limit_side_len": "limit_side_len",
+    "text_det_limit_type": "limit_type",
+    "text_det_thresh": "thresh",
+    "text_det_box_thresh": "box_thresh",
+    "text_det_unclip_ratio": "unclip_ratio",
+}
+_ORIENTATION_PARAMS = {
+    "doc_orientation_classify_model_name": "model_name",
+    "doc_orientation_classify_model_dir": "model_dir",
+}
+
+text_detector = None
+orientation_classifier = None
+# 热替换传入的引擎参数；None 时读取 OCR_ENGINE_PARAMS_FILE
+_engine_params = None
+_engine_lock = threading.Lock()
+# 单模型实例非线程安全
+_detect_lock = threading.Lock()
+_orientation_lock = threading.Lock()
+
+
+def _module_kwargs(mapping, engine_params=None):
+    if engine_params is None:
+        engine_params = load_engine_params()
+    kwargs = {"device": engine_params.get("device", "gpu")}
+    for pipeline_key, module_key in mapping.items():
+        if engine_params.get(pipeline_key) is not None:
+            kwargs[module_key] = engine_params[pipeline_key]
+    return kwargs
+
+
+def _warm_up(engine):
+    # 预热一次，首个真实请求不承担初始化开销
+    list(engine.predict(np.full((64, 64, 3), 255, dtype=np.uint8)))
+    return engine
+
+
+def get_text_detector():
+    """首次使用时构建文本检测模型"""
+    global text_detector
+    if text_detector is None:
+        with _engine_lock:
+            if text_detector is None:
+                logger.info("加载文本检测模型 ...")
+                started = time.monotonic()
+                text_detector = _warm_up(TextDetection(**_module_kwargs(_DETECTION_PARAMS, _engine_params)))
+                logger.info(f"文本检测模型已就绪，耗时 {time.monotonic() - started:.1f}s")
+    return text_detector
+
+
+def get_orientation_classifier():
+    """首次使用时构建整图方向分类模型"""
+    global orientation_classifier
+    if orientation_classifier is None:
+        with _engine_lock:
+            if orientation_classifier is None:
+                logger.info("加载方向分类模型 ...")
+                started = time.monotonic()
+                orientation_classifier = _warm_up(DocImgOrientationClassification(**_module_kwargs(_ORIENTATION_PARAMS, _engine_params)))
+                logger.info(f"方向分类模型已就绪，耗时 {time.monotonic() - started:.1f}s")
+    return orientation_classifier
+
+
+def rebuild_engines(engine_params):
+    """热替换第一步：用新参数构建并预热当前已加载的模型，不切换；返回交给 swap_engines 的 (检测, 方向分类)，未加载的为 None"""
+    detector, classifier = text_detector, orientation_classifier
+    if detector is not None:
+        detector = _warm_up(TextDetection(**_module_kwargs(_DETECTION_PARAMS, engine_params)))
+    if classifier is not None:
+        classifier = _warm_up(DocImgOrientationClassification(**_module_kwargs(_ORIENTATION_PARAMS, engine_params)))
+    return detector, classifier
+
+
+def swap_engines(engines, engine_params):
+    """热替换第二步：切换到 rebuild_engines 构建的模型；之后按需构建的模型也使用新参数。
+
+    进行中的请求持有旧模型的引用，完成后旧模型随之释放；重建期间按旧参数新加载的模型一并丢弃
+    """
+    global text_detector, orientation_classifier, _engine_params
+    with _engine_lock:
+        text_detector, orientation_classifier = engines
+        _engine_params = engine_params
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value.tolist() if hasattr(value, "tolist") else list(value)
+
+
+def classify_orientation(image):
+    """返回整图需要旋转的角度（0/90/180/270）"""
+    engine = get_orientation_classifier()
+    with _orientation_lock:
+        results = list(engine.predict(image))
+    for result in results:
+        labels = _as_list(_result_data(result).get("label_names"))
+        if labels:
+            try:
+                return int(labels[0]) % 360
+            except (TypeError, ValueError):
+                return 0
+    return 0
+
+
+def detect_text(image):
+    """返回 (dt_polys, dt_scores)"""
+    engine = get_text_detector()
+    with _detect_lock:
+        results = list(engine.predict(image))
+    polys, scores = [], []
+    for result in results:
+        data = _result_data(result)
+        polys.extend(_as_list(data.get("dt_polys")))
+        scores.extend(_as_list(data.get("dt_scores")))
+    return polys, scores
+
+
+def build_detection_response(items, image_width, image_height, angle=0, include_image_info=False, image_base64=None):
+    details = [{"Confidence": item.get("confidence", 0.0), "Position": item.get("bbox", [])} for item in items]
+    return {
+        "DetectionInfo": [
+            {
+                "Count": len(details),
+                "Detail": details,
+            }
+        ],
+        "ImageInfo": [
+            _build_image_info(image_width, image_height, angle=angle, include_image_info=include_image_info, image_base64=image_base64)
+        ]
+    }
+
+
+def process_detection(image, direction_correction=False, orientation=False, include_image_info=False,
+                      source_bytes=None, img_format=None, img_quality=None, img_max_side=None, cancel_token=None):
+    rss = RssTracker()
+    pre_angle = 0
+    with buffer_pool.lease() as lease:
+        if orientation:
+            raise_if_cancelled(cancel_token, "orientation")
+            with log_stage("orientation"):
+                pre_angle = classify_orientation(image)
+            if pre_angle != 0:
+                # 与完整 OCR 的文档预处理一致：先转正整图，再在转正后的图上检测
+                image = _rotate_image_resize(image, pre_angle, alloc=lease.empty)
+        raise_if_cancelled(cancel_token, "predict")
+        with log_stage("predict"):
+            polys, scores = detect_text(image)
+        rss.sample()
+        raise_if_cancelled(cancel_token, "postprocess")
+
+        h, w = image.shape[:2]
+        # 组装成与完整 OCR 相同结构的预测结果，框的矫正与角度计算保持一致；检测分数作为 Confidence
+        predict_results = [{"res": {"dt_polys": polys, "rec_scores": scores, "doc_preprocessor_res": {"angle": pre_angle}}}]
+        items, rotation_angle, pre_angle = build_items_from_predict_results(predict_results, directionCorrection=direction_correction, image_size=(w, h))
+        rotated = pre_angle != 0 or (direction_correction and abs(rotation_angle) > 1.0)
+        img_b64, img_fmt = None, None
+        if include_image_info:
+            if pre_angle == 0 and rotated:
+                image = _rotate_image_keep_size(image, rotation_angle, alloc=lease.empty)
+            raise_if_cancelled(cancel_token, "encode")
+            img_b64, img_fmt = _encode_result_image(image, rotated, source_bytes=source_bytes, img_format=img_format, img_quality=img_quality,
+                                                    img_max_side=img_max_side, alloc=lease.empty)
+        del image
+    angle = pre_angle if pre_angle != 0 else rotation_angle
+    structured = build_detection_response(items, image_width=w, image_height=h, angle=angle, include_image_info=include_image_info, image_base64=img_b64)
+    if img_b64 is not None:
+        structured["ImageInfo"][0]["ImageFormat"] = img_fmt
+    rss.finish()
+    return structured
+
+
+def process_detection_bytes(contents, decoder=decode_image_bytes, cancel_token=None, **kwargs):
+    """解码 + process_detection，作为一个整体调度"""
+    raise_if_cancelled(cancel_token, "decode")
+    try:
+        with log_stage("decode"):
+            decoded = [decoder(contents)]
+    except Exception as e:
+        raise InvalidImageError("Invalid image file") from e
+    if decoded[0] is None:
+        raise InvalidImageError("Invalid image file")
+    return process_detection(decoded.pop(), source_bytes=contents, cancel_token=cancel_token, **kwargs)
@@ -0,0 +1,29 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import OCR_WORKER_THREADS, OCR_STRUCTURE_WORKER_THREADS
+from app.services.profiling import profiler
+
+
+# 所有 CPU 密集的步骤（解码、推理、旋转、编码）都提交到该线程池，避免阻塞事件循环
+_executor = ThreadPoolExecutor(max_workers=OCR_WORKER_THREADS, thread_name_prefix="ocr-worker")
+# 版面解析单独一个线程池：耗时长的结构化任务不会占满 OCR 工作线程
+_structure_executor = ThreadPoolExecutor(max_workers=OCR_STRUCTURE_WORKER_THREADS, thread_name_prefix="ocr-structure")
+
+
+def _bind_context(func, *args, **kwargs):
+    # run_in_executor 不传递 contextvars：复制当前上下文，工作线程中的日志仍带请求 ID 并记录阶段耗时；
+    # cProfile 剖析进行中时由 profiler.run 记录该任务
+    return functools.partial(contextvars.copy_context().run, profiler.run, func, *args, **kwargs)
+
+
+async def run_in_worker(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _bind_context(func, *args, **kwargs))
+
+
+async def run_in_structure_worker(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_structure_executor, _bind_context(func, *args, **kwargs))
@@ -0,0 +1,105 @@
+"""引擎热替换：在后台用新参数构建并预热引擎，就绪后原子切换，旧引擎排空后释放
+
+- 进程内推理：按语言逐个重建 model_registry 中的引擎
+- 推理工作进程：启动一整套新进程，全部就绪后切换，旧进程处理完当前请求后回收
+- 仅检测接口（detection_service）已加载的检测 / 方向分类模型同样先用新参数重建，OCR 引擎切换成功后一起切换
+- 通过管理接口或 SIGHUP 触发；未指定参数时重新读取 OCR_ENGINE_PARAMS_FILE
+- 同一时间只允许一次热替换；构建失败时继续使用旧引擎
+"""
+import asyncio
+import logging
+import signal
+import threading
+import time
+
+from app.services import detection_service, inference_workers
+from app.services.model_registry import load_engine_params
+from app.services.near_duplicates import near_duplicates
+from app.services.ocr_service import model_registry
+from app.utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("paddleocr_app")
+
+STATE_IDLE = "idle"
+STATE_LOADING = "loading"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+_reloads = REGISTRY.counter("ocr_engine_reloads_total", "Engine hot swaps, by result")
+
+
+class ReloadInProgress(Exception):
+    """已有热替换在进行中"""
+
+
+class EngineReloader:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.status = {"state": STATE_IDLE}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, engine_params=None, langs=None, source="admin"):
+        """在后台开始热替换；engine_params 为 None 时重新读取参数文件"""
+        with self._lock:
+            if self.running:
+                raise ReloadInProgress()
+            self.status = {"state": STATE_LOADING, "source": source, "langs": langs, "startedAt": time.time()}
+            self._thread = threading.Thread(target=self._run, args=(engine_params, langs), daemon=True, name="ocr-reload")
+            self._thread.start()
+        return dict(self.status)
+
+    def _run(self, engine_params, langs):
+        started = time.monotonic()
+        logger.info(f"开始热替换 OCR 引擎（来源: {self.status['source']}）")
+        try:
+            if engine_params is None:
+                engine_params = load_engine_params()
+            detection_engines = detection_service.rebuild_engines(engine_params)
+            pool = inference_workers.inference_pool
+            if pool is not None:
+                # 工作进程整体替换；非默认语言在新进程中按需构建
+                pool.reload(engine_params)
+                generation = pool.generation
+            else:
+                model_registry.reload(engine_params, langs)
+                generation = model_registry.generation
+            detection_service.swap_engines(detection_engines, engine_params)
+        except Exception as e:
+            _reloads.inc(result="failed")
+            logger.error(f"热替换失败，继续使用旧引擎: {type(e).__name__}: {e}", exc_info=True)
+            self.status.update(state=STATE_FAILED, error=f"{type(e).__name__}: {e}", finishedAt=time.time())
+            return
+        # 之前的结果来自旧引擎（模型或阈值可能已变化），不再复用
+        near_duplicates.clear()
+        _reloads.inc(result="done")
+        elapsed = time.monotonic() - started
+        logger.info(f"热替换完成，耗时 {elapsed:.1f}s，当前第 {generation} 代")
+        self.status.update(state=STATE_DONE, generation=generation, seconds=elapsed, finishedAt=time.time())
+
+
+engine_reloader = EngineReloader()
+
+
+def _on_sighup():
+    try:
+        engine_reloader.start(source="SIGHUP")
+    except ReloadInProgress:
+        logger.warning("收到 SIGHUP，但已有热替换在进行中，忽略")
+
+
+def install_sighup_handler():
+    """SIGHUP 触发热替换（重新读取 OCR_ENGINE_PARAMS_FILE）；需在事件循环线程中调用，不支持 SIGHUP 的平台忽略。
+
+    经 loop.add_signal_handler 注册，回调作为普通回调在事件循环中执行：不会打断正持有 engine_reloader 锁的管理接口而死锁
+    """
+    if not hasattr(signal, "SIGHUP"):
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _on_sighup)
+    except (RuntimeError, NotImplementedError, ValueError):
+        logger.warning("当前事件循环不支持信号处理，SIGHUP 热替换不可用")
@@ -0,0 +1,436 @@
+"""受监管的推理工作进程池
+
+- 每个工作进程各自持有一个 PaddleOCR 实例；图像经共享内存槽传递（放不下或槽已用完时经 Pipe），
+  Pipe 中只有槽号与精简后的预测结果（数值部分为 NumPy 数组）
+- 工作进程处理满 N 个请求或 RSS 超过上限后被回收
+- 单次推理超过硬超时时直接杀掉该进程，当前请求收到明确的错误
+- 始终保持预热好的备用进程：回收或杀掉进程时由备用进程立即接替，容量不会降为零
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.reduction import ForkingPickler
+
+import numpy as np
+
+from app.config import (
+    OCR_PROCESS_WORKERS,
+    OCR_WORKER_SPARES,
+    OCR_WORKER_MAX_REQUESTS,
+    OCR_WORKER_MAX_RSS_MB,
+    OCR_INFERENCE_TIMEOUT_S,
+    OCR_WORKER_START_TIMEOUT_S,
+    OCR_SHM_SLOT_MB,
+    OCR_SHM_SLOTS,
+    OCR_LOG_LEVEL,
+    OCR_LOG_FORMAT,
+    OCR_LOG_SAMPLE_RATE,
+    OCR_LOG_QUEUE_SIZE,
+)
+from app.services.model_registry import load_engine_params
+from app.services.shared_slots import SlotReader, SlotRing, shm_available_bytes
+from app.utils.log_utils import setup_logging
+from app.utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("paddleocr_app")
+
+RECYCLE_REQUESTS = "requests"
+RECYCLE_RSS = "rss"
+RECYCLE_TIMEOUT = "timeout"
+RECYCLE_CRASH = "crash"
+RECYCLE_ERROR = "error"
+RECYCLE_RELOAD = "reload"
+
+_recycled = REGISTRY.counter("ocr_worker_recycled_total", "Inference worker processes replaced, by reason")
+_ready_workers = REGISTRY.gauge("ocr_workers_ready", "Inference worker processes that are warm and idle or busy")
+_transport = REGISTRY.counter("ocr_worker_image_transport_total", "Images handed to inference workers, by transport (shm or pipe)")
+_shm_fallback = REGISTRY.counter("ocr_shm_fallback_total", "Images sent over the pipe instead of shared memory, by reason")
+
+# 精简结果中的数值字段，跨进程时以 NumPy 数组传输
+_NUMERIC_RESULT_KEYS = ("rec_scores", "rec_polys", "rec_boxes", "dt_polys")
+
+
+class InferenceFailed(Exception):
+    """工作进程推理失败"""
+
+
+class InferenceTimeout(InferenceFailed):
+    """推理超过硬超时，工作进程已被终止"""
+
+
+class WorkerCrashed(InferenceFailed):
+    """工作进程在推理过程中退出"""
+
+
+def _current_rss():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _pack_result(compact):
+    """数值列表转为 NumPy 数组，pickle 时为连续字节而不是逐个 Python 对象；不规则的列表保持原样"""
+    res = dict(compact[0]["res"])
+    for key in _NUMERIC_RESULT_KEYS:
+        values = res.get(key)
+        if not values:
+            continue
+        try:
+            array = np.asarray(values)
+        except ValueError:
+            continue
+        if array.dtype.kind in "iuf":
+            res[key] = array
+    return [{"res": res}]
+
+
+def _unpack_result(packed):
+    res = dict(packed[0]["res"])
+    for key in _NUMERIC_RESULT_KEYS:
+        if isinstance(res.get(key), np.ndarray):
+            res[key] = res[key].tolist()
+    return [{"res": res}]
+
+
+def _worker_main(conn, engine_params, slots=None):
+    """工作进程入口：构建引擎并预热，然后循环处理推理请求；slots 为共享内存槽的 (名称, 每槽字节数)"""
+    from app.services.ocr_service import compact_predict_results, get_simple_ocr, model_registry, predict_local
+
+    # spawn 出的进程只导入所需模块（不组装 FastAPI 应用），日志在这里配置
+    setup_logging(level=OCR_LOG_LEVEL, fmt=OCR_LOG_FORMAT, sample_rate=OCR_LOG_SAMPLE_RATE, queue_size=OCR_LOG_QUEUE_SIZE)
+    model_registry.engine_params = dict(engine_params)
+    reader = SlotReader(*slots) if slots else None
+    # 默认语言的引擎在就绪前构建并预热，其他语言在首次请求时构建
+    get_simple_ocr()
+    conn.send(("ready", os.getpid(), _current_rss()))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        command = message[0]
+        if command == "stop":
+            break
+        if command in ("predict", "predict_shm"):
+            try:
+                if command == "predict_shm":
+                    # 直接在共享内存上推理，不拷贝
+                    _, index, shape, dtype, lang = message
+                    image = reader.view(index, shape, dtype)
+                else:
+                    _, image, lang = message
+                if not model_registry.loaded(lang):
+                    # 告知主进程正在构建该语言的引擎，构建时间不计入推理超时
+                    conn.send(("loading", None, _current_rss()))
+                result = _pack_result(compact_predict_results(predict_local(image, lang)))
+                # 回复前释放视图：回复后槽即被主进程复用
+                del image
+                conn.send(("ok", result, _current_rss()))
+            except Exception as e:
+                image = None
+                conn.send(("error", f"{type(e).__name__}: {e}", _current_rss()))
+    if reader is not None:
+        reader.close()
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, process, conn, generation):
+        self.process = process
+        self.conn = conn
+        self.pid = process.pid
+        self.generation = generation
+        self.served = 0
+        self.rss = 0
+
+    def stop(self, graceful=True):
+        if graceful and self.process.is_alive():
+            try:
+                self.conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+            self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(5)
+        self.conn.close()
+
+
+class InferenceWorkerPool:
+    def __init__(self, size=OCR_PROCESS_WORKERS, spares=OCR_WORKER_SPARES, max_requests=OCR_WORKER_MAX_REQUESTS,
+                 max_rss_mb=OCR_WORKER_MAX_RSS_MB, timeout=OCR_INFERENCE_TIMEOUT_S, start_timeout=OCR_WORKER_START_TIMEOUT_S,
+                 engine_params=None, shm_slots=OCR_SHM_SLOTS, shm_slot_mb=OCR_SHM_SLOT_MB):
+        self.size = size
+        self.spares = spares
+        self.max_requests = max_requests
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        # spawn：避免 fork 继承 CUDA/Paddle 状态
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._spares = queue.Queue()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._closed = False
+        # 引擎参数与代次：热替换后旧代进程处理完当前请求即被回收
+        self.engine_params = dict(engine_params or {})
+        self.generation = 0
+        self.shm_slots = shm_slots
+        self.shm_slot_bytes = shm_slot_mb * 1024 * 1024
+        # 共享内存槽在 start 中创建（工作进程导入本模块时不创建）
+        self.slots = None
+        _ready_workers.set_function(lambda: self._active)
+
+    @property
+    def ready(self):
+        """已预热、可接收推理的工作进程数（含备用进程）"""
+        return self._active
+
+    def start(self):
+        self.slots = self._create_slots()
+        for _ in range(self.size):
+            self._spawn_async(self._idle)
+        for _ in range(self.spares):
+            self._spawn_async(self._spares)
+
+    def shutdown(self):
+        self._closed = True
+        for q in (self._idle, self._spares):
+            while True:
+                try:
+                    q.get_nowait().stop()
+                except queue.Empty:
+                    break
+        if self.slots is not None:
+            self.slots.close()
+            self.slots = None
+
+    def _create_slots(self):
+        if self.shm_slots <= 0 or self.shm_slot_bytes <= 0:
+            return None
+        total = self.shm_slots * self.shm_slot_bytes
+        available = shm_available_bytes()
+        if available is not None and available < total:
+            # tmpfs 空间不足时写入共享内存会触发 SIGBUS，宁可退回 Pipe
+            logger.warning(f"/dev/shm 剩余 {available // (1024 * 1024)}MB，不足共享内存槽所需的 {total // (1024 * 1024)}MB，图像改经 Pipe 传输")
+            return None
+        try:
+            slots = SlotRing(self.shm_slots, self.shm_slot_bytes, leak_after=self.start_timeout + self.timeout + 30)
+        except OSError as e:
+            logger.warning(f"创建共享内存槽失败，图像改经 Pipe 传输: {e}")
+            return None
+        logger.info(f"共享内存图像槽: {self.shm_slots} x {self.shm_slot_bytes // (1024 * 1024)}MB ({slots.name})")
+        return slots
+
+    def _lease_slot(self, image):
+        if self.slots is None:
+            return None
+        lease = self.slots.acquire(image.nbytes)
+        if lease is None:
+            _shm_fallback.inc(reason="oversize" if image.nbytes > self.slots.slot_bytes else "exhausted")
+        return lease
+
+    def reload(self, engine_params):
+        """用新参数启动一整套工作进程，全部就绪后原子切换；旧进程处理完当前请求后回收"""
+        generation = self.generation + 1
+        workers = []
+        try:
+            for _ in range(self.size + self.spares):
+                workers.append(self._start_worker(engine_params, generation))
+        except Exception:
+            for worker in workers:
+                worker.stop(graceful=False)
+            raise
+        with self._lock:
+            self.engine_params = dict(engine_params)
+            self.generation = generation
+            self._active += len(workers)
+        for worker in workers[:self.size]:
+            self._idle.put(worker)
+        for worker in workers[self.size:]:
+            self._spares.put(worker)
+        # 空闲的旧进程立即回收，执行中的旧进程在 predict 返回时回收
+        for q in (self._idle, self._spares):
+            current = []
+            while True:
+                try:
+                    worker = q.get_nowait()
+                except queue.Empty:
+                    break
+                if worker.generation == generation:
+                    current.append(worker)
+                else:
+                    self._retire(worker, RECYCLE_RELOAD, replace=False)
+            for worker in current:
+                q.put(worker)
+        logger.info(f"推理工作进程已切换到第 {generation} 代")
+
+    def _take_idle(self):
+        """取一个当前代的空闲工作进程；等不到时抛出 WorkerCrashed，不会无限阻塞。
+
+        有就绪进程时它们最迟在推理超时后空出（或被杀掉重启），最多等 timeout 秒；
+        没有就绪进程（启动中或全部在重启）时再加上启动超时。超过仍没有说明进程反复启动失败
+        """
+        wait = self.timeout if self._active > 0 else self.start_timeout + self.timeout
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise WorkerCrashed(f"no inference worker became available within {wait:.0f}s") from None
+            if worker.generation == self.generation:
+                return worker
+            self._retire(worker, RECYCLE_RELOAD, replace=False)
+
+    def _await_reply(self, worker):
+        """等待工作进程回复 (状态, 结果, RSS)；超时返回 None。构建新语言引擎的时间另计"""
+        timeout = self.timeout
+        while True:
+            if not worker.conn.poll(timeout):
+                return None
+            reply = worker.conn.recv()
+            if reply[0] != "loading":
+                return reply
+            timeout = self.start_timeout + self.timeout
+
+    def predict(self, image, lang=None):
+        """阻塞调用：取一个空闲工作进程执行推理，返回精简后的预测结果"""
+        worker = self._take_idle()
+        # 槽在工作进程回复后归还；超时或崩溃时等进程结束后才归还
+        lease, sent = None, False
+        try:
+            lease = self._lease_slot(image)
+            if lease is not None:
+                message, transport = ("predict_shm", *lease.write(image), lang), "shm"
+            else:
+                message, transport = ("predict", image, lang), "pipe"
+            # 先序列化再发送（与 conn.send 相同）：序列化失败时工作进程尚未收到任何内容
+            data = ForkingPickler.dumps(message)
+            sent = True
+            worker.conn.send_bytes(data)
+            del data
+            _transport.inc(transport=transport)
+            reply = self._await_reply(worker)
+        except BaseException as e:
+            if not sent:
+                # 请求未发出（如写槽失败、图像无法序列化）：进程仍可用，归还槽后放回空闲队列
+                if lease is not None:
+                    lease.release()
+                self._idle.put(worker)
+                raise
+            if isinstance(e, (EOFError, OSError)):
+                self._retire(worker, RECYCLE_CRASH, lease=lease)
+                raise WorkerCrashed(f"worker {worker.pid} exited during inference") from e
+            # 请求已发出、回复状态未知（如等待中被中断）：该进程不能再复用，回收后归还槽
+            self._retire(worker, RECYCLE_ERROR, lease=lease)
+            raise
+        if reply is None:
+            self._retire(worker, RECYCLE_TIMEOUT, lease=lease)
+            raise InferenceTimeout(f"inference exceeded {self.timeout:.0f}s, worker {worker.pid} killed")
+        if lease is not None:
+            lease.release()
+        status, payload, rss = reply
+
+        worker.served += 1
+        worker.rss = rss
+        if worker.generation != self.generation:
+            self._retire(worker, RECYCLE_RELOAD, replace=False)
+        elif self.max_requests and worker.served >= self.max_requests:
+            self._retire(worker, RECYCLE_REQUESTS)
+        elif self.max_rss and rss > self.max_rss:
+            self._retire(worker, RECYCLE_RSS)
+        else:
+            self._idle.put(worker)
+        if status != "ok":
+            raise InferenceFailed(payload)
+        return _unpack_result(payload)
+
+    def _retire(self, worker, reason, replace=True, lease=None):
+        """用预热好的备用进程接替，再在后台补充备用进程并停止旧进程；lease 为该进程仍可能在读的槽，进程停止后归还"""
+        _recycled.inc(reason=reason)
+        logger.warning(f"回收推理工作进程 {worker.pid}（原因: {reason}，已处理 {worker.served} 个请求，RSS {worker.rss // (1024 * 1024)}MB）")
+        with self._lock:
+            self._active -= 1
+        if not replace:
+            # 热替换时新一代进程已全部就绪，无需补充
+            threading.Thread(target=worker.stop, daemon=True).start()
+            return
+        try:
+            spare = self._spares.get_nowait()
+            self._idle.put(spare)
+            self._spawn_async(self._spares)
+        except queue.Empty:
+            # 没有可用的备用进程时直接补充工作进程，其余进程继续服务
+            self._spawn_async(self._idle)
+        graceful = reason not in (RECYCLE_TIMEOUT, RECYCLE_CRASH)
+        threading.Thread(target=self._stop_worker, args=(worker, graceful, lease), daemon=True).start()
+
+    @staticmethod
+    def _stop_worker(worker, graceful, lease):
+        worker.stop(graceful)
+        if lease is not None:
+            lease.release()
+
+    def _spawn_async(self, target_queue):
+        if self._closed:
+            return
+        threading.Thread(target=self._spawn, args=(target_queue,), daemon=True).start()
+
+    def _start_worker(self, engine_params, generation):
+        """启动一个工作进程并等待其构建、预热完成"""
+        parent_conn, child_conn = self._context.Pipe()
+        slots = (self.slots.name, self.slots.slot_bytes) if self.slots is not None else None
+        process = self._context.Process(target=_worker_main, args=(child_conn, engine_params, slots), daemon=True, name="ocr-inference")
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn, generation)
+        started = time.monotonic()
+        try:
+            if not parent_conn.poll(self.start_timeout):
+                raise TimeoutError(f"worker did not become ready within {self.start_timeout:.0f}s")
+            status, pid, rss = parent_conn.recv()
+            worker.rss = rss
+        except Exception:
+            worker.stop(graceful=False)
+            raise
+        logger.info(f"推理工作进程 {worker.pid} 已就绪，耗时 {time.monotonic() - started:.1f}s")
+        return worker
+
+    def _spawn(self, target_queue):
+        generation = self.generation
+        try:
+            worker = self._start_worker(self.engine_params, generation)
+        except Exception as e:
+            if self._closed:
+                return
+            logger.error(f"推理工作进程启动失败: {type(e).__name__}: {e}")
+            time.sleep(1.0)
+            self._spawn_async(target_queue)
+            return
+        if self._closed or generation != self.generation:
+            # 启动期间发生了热替换，新一代进程已经补齐
+            worker.stop()
+            return
+        with self._lock:
+            self._active += 1
+        target_queue.put(worker)
+
+
+inference_pool = InferenceWorkerPool(engine_params=load_engine_params()) if OCR_PROCESS_WORKERS > 0 else None
+
+
+def start_inference_pool():
+    if inference_pool is not None:
+        inference_pool.start()
+
+
+def shutdown_inference_pool():
+    if inference_pool is not None:
+        inference_pool.shutdown()
@@ -0,0 +1,132 @@
+"""内存预算准入与单请求内存统计
+
+- 根据图片头部信息（不解码）得到的宽高估算单个请求的峰值内存
+- 调度器在全局字节预算内放行请求：预算不足时队首请求等待，超过整个预算的请求直接拒绝
+- 在处理阶段边界采样进程 RSS，记录每个请求相对开始时的峰值增量（并发时为近似值）
+"""
+import os
+import resource
+import threading
+
+from app.config import OCR_MEMORY_BUDGET_MB
+from app.utils.image_utils import probe_image_file_size, probe_image_size
+from app.utils.metrics import REGISTRY
+
+
+# 无法读取图片头时，按常见压缩率（约 10:1）由文件大小反推像素数
+_FALLBACK_COMPRESSION_RATIO = 10
+
+_budget_used = REGISTRY.gauge("ocr_memory_budget_used_bytes", "Estimated bytes reserved by admitted requests")
+_budget_total = REGISTRY.gauge("ocr_memory_budget_bytes", "Memory budget for admitted requests")
+_rss_delta = REGISTRY.summary("ocr_request_peak_rss_delta_bytes", "Per-request peak RSS growth sampled at stage boundaries")
+_estimate = REGISTRY.summary("ocr_request_estimated_bytes", "Estimated per-request peak memory used for admission")
+REGISTRY.gauge("ocr_process_peak_rss_bytes", "Peak resident set size of the process").set_function(
+    lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+)
+
+
+class RequestTooLarge(Exception):
+    """单个请求的预估内存超过全局预算"""
+
+    def __init__(self, estimated_bytes, budget_bytes):
+        super().__init__(f"estimated {estimated_bytes} bytes exceeds memory budget {budget_bytes} bytes")
+        self.estimated_bytes = estimated_bytes
+        self.budget_bytes = budget_bytes
+
+
+def estimate_request_bytes(contents, include_image_info=False, direction_correction=False):
+    """估算一个请求处理过程中的峰值内存（字节）"""
+    return _estimate_bytes(len(contents), probe_image_size(contents), include_image_info, direction_correction)
+
+
+def estimate_file_bytes(path, include_image_info=False, direction_correction=False):
+    """同 estimate_request_bytes，图片为本地文件（只读取文件头）"""
+    return _estimate_bytes(os.path.getsize(path), probe_image_file_size(path), include_image_info, direction_correction)
+
+
+def _estimate_bytes(content_length, size, include_image_info, direction_correction):
+    if size is not None:
+        width, height = size
+        decoded = width * height * 3
+    else:
+        decoded = content_length * _FALLBACK_COMPRESSION_RATIO
+    # 原始字节 + 解码图像 + 推理内部拷贝
+    estimate = content_length + decoded * 2
+    # 旋转输出（保持尺寸或扩展画布，中间角度时画布最多约 2 倍）
+    estimate += decoded * (2 if direction_correction else 1)
+    if include_image_info:
+        # 编码缓冲与 base64 字符串
+        estimate += decoded // 2 + content_length * 2
+    _estimate.observe(estimate)
+    return estimate
+
+
+class MemoryBudget:
+    def __init__(self, total_bytes, name="ocr"):
+        self.name = name
+        self.total_bytes = total_bytes
+        self._used = 0
+        self._lock = threading.Lock()
+        _budget_total.set_function(lambda: self.total_bytes, budget=name)
+        _budget_used.set_function(lambda: self._used, budget=name)
+
+    @property
+    def enabled(self):
+        return self.total_bytes > 0
+
+    @property
+    def used(self):
+        return self._used
+
+    def check(self, cost):
+        if self.enabled and cost > self.total_bytes:
+            raise RequestTooLarge(cost, self.total_bytes)
+
+    def try_reserve(self, cost):
+        """预算足够时预留并返回 True；没有其他预留时总是放行，避免单个大请求饿死"""
+        if not self.enabled or not cost:
+            return True
+        with self._lock:
+            if self._used and self._used + cost > self.total_bytes:
+                return False
+            self._used += cost
+            return True
+
+    def release(self, cost):
+        if not self.enabled or not cost:
+            return
+        with self._lock:
+            self._used = max(0, self._used - cost)
+
+
+memory_budget = MemoryBudget(OCR_MEMORY_BUDGET_MB * 1024 * 1024)
+
+
+def current_rss():
+    """当前进程 RSS（字节），无法读取时返回 None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RssTracker:
+    """在阶段边界调用 sample()，结束时 finish() 记录相对起点的峰值增量"""
+
+    def __init__(self):
+        self.start = current_rss()
+        self.peak = self.start
+
+    def sample(self):
+        rss = current_rss()
+        if rss is not None and self.peak is not None and rss > self.peak:
+            self.peak = rss
+
+    def finish(self):
+        self.sample()
+        if self.start is None or self.peak is None:
+            return None
+        delta = self.peak - self.start
+        _rss_delta.observe(delta)
+        return delta
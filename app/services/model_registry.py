@@ -0,0 +1,246 @@
+"""按语言 / 模型配置管理 OCR 引擎
+
+- 首次请求某语言时才构建引擎，同一语言并发的首个请求只构建一次
+- 识别模型相同的语言（如 PP-OCRv5 覆盖的 ch/en/japan/chinese_cht）通过别名共用同一个引擎
+- 每个引擎有自己的推理锁，不同语言的请求可以并行推理
+- 已加载引擎的总内存（构建前后的 RSS 增量）或数量超过上限时，淘汰最久未使用的空闲引擎；默认语言常驻
+- 引擎按引用计数借出，被替换或淘汰的引擎在最后一个请求结束后才释放
+- reload 用新参数在后台构建并预热新引擎，全部就绪后原子替换，新请求立即使用新引擎
+"""
+import gc
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from app.config import (
+    OCR_DEFAULT_LANG,
+    OCR_MODEL_LANGS,
+    OCR_MODEL_ALIASES,
+    OCR_MODEL_CACHE_MB,
+    OCR_MODEL_MAX_LOADED,
+    OCR_ENGINE_PARAMS_FILE,
+)
+from app.services.memory import current_rss
+from app.utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("paddleocr_app")
+
+# RSS 增量低于该值（模型主要占用显存）时按该值计入内存上限
+_DEFAULT_MODEL_BYTES = 512 * 1024 * 1024
+
+_models_loaded = REGISTRY.gauge("ocr_models_loaded", "OCR engines currently loaded")
+_model_bytes = REGISTRY.gauge("ocr_models_loaded_bytes", "Estimated host memory held by loaded OCR engines")
+_model_builds = REGISTRY.counter("ocr_model_builds_total", "OCR engines built, by model key")
+_model_evictions = REGISTRY.counter("ocr_model_evictions_total", "OCR engines evicted to stay within the model cache limits")
+_model_build_seconds = REGISTRY.summary("ocr_model_build_seconds", "Time spent building and warming OCR engines")
+
+
+class UnknownModel(ValueError):
+    """请求的语言未在 OCR_MODEL_LANGS 中配置"""
+
+    def __init__(self, lang):
+        super().__init__(f"Unsupported lang: {lang}")
+        self.lang = lang
+
+
+def load_engine_params(path=None):
+    """读取引擎参数 JSON 文件；未配置时返回空字典"""
+    path = OCR_ENGINE_PARAMS_FILE if path is None else path
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        params = json.load(f)
+    if not isinstance(params, dict):
+        raise ValueError(f"{path}: engine params must be a JSON object")
+    return params
+
+
+def release_device_memory():
+    """释放引擎后归还 Paddle 缓存的显存；Paddle 不可用时忽略"""
+    gc.collect()
+    try:
+        import paddle
+        paddle.device.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+class LoadedModel:
+    def __init__(self, key, engine, size_bytes, generation=0):
+        self.key = key
+        self.engine = engine
+        self.size_bytes = size_bytes
+        self.generation = generation
+        # 引擎非线程安全：同一引擎上的 predict 串行执行
+        self.lock = threading.Lock()
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.retired = False
+
+
+class ModelRegistry:
+    def __init__(self, factory, default_lang=OCR_DEFAULT_LANG, langs=OCR_MODEL_LANGS, aliases=OCR_MODEL_ALIASES,
+                 max_bytes=OCR_MODEL_CACHE_MB * 1024 * 1024, max_loaded=OCR_MODEL_MAX_LOADED, engine_params=None):
+        # factory(key, engine_params) -> 已预热的引擎
+        self.factory = factory
+        self.engine_params = dict(engine_params or {})
+        self.generation = 0
+        self.default_lang = default_lang
+        self.langs = set(langs) | {default_lang}
+        self.aliases = dict(aliases)
+        self.max_bytes = max_bytes
+        self.max_loaded = max_loaded
+        self._models = {}
+        self._build_locks = {}
+        self._lock = threading.Lock()
+        _models_loaded.set_function(lambda: len(self._models))
+        _model_bytes.set_function(lambda: sum(model.size_bytes for model in list(self._models.values())))
+
+    @property
+    def default_key(self):
+        return self.resolve(self.default_lang)
+
+    def resolve(self, lang=None):
+        """语言 -> 引擎键（别名解析后）"""
+        lang = lang or self.default_lang
+        if lang not in self.langs:
+            raise UnknownModel(lang)
+        return self.aliases.get(lang, lang)
+
+    def loaded(self, lang=None):
+        with self._lock:
+            return self.resolve(lang) in self._models
+
+    def get(self, lang=None):
+        """返回已加载的引擎，未加载时构建"""
+        key = self.resolve(lang)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                model.last_used = time.monotonic()
+                return model
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                model = self._models.get(key)
+            if model is None:
+                model = self._create(key)
+                with self._lock:
+                    self._models[key] = model
+                self._evict(keep=key)
+        return model
+
+    def reload(self, engine_params=None, langs=None):
+        """用新参数重建已加载（或指定语言）的引擎，全部构建成功后一并原子替换；
+        任一构建失败时释放已构建的新引擎，参数与引擎保持不变并抛出异常"""
+        params = self.engine_params if engine_params is None else dict(engine_params)
+        generation = self.generation + 1
+        with self._lock:
+            keys = sorted({self.resolve(lang) for lang in langs} if langs else set(self._models) | {self.default_key})
+            build_locks = [self._build_locks.setdefault(key, threading.Lock()) for key in keys]
+        built = {}
+        with ExitStack() as stack:
+            # 持有构建锁：重建期间并发的 get 不会用旧参数构建同一引擎并覆盖新引擎
+            for build_lock in build_locks:
+                stack.enter_context(build_lock)
+            try:
+                for key in keys:
+                    # 新旧引擎短暂共存，需预留新引擎的内存
+                    built[key] = self._create(key, params, generation)
+            except Exception:
+                for model in built.values():
+                    self._free(model)
+                raise
+            retired = []
+            with self._lock:
+                self.engine_params = params
+                self.generation = generation
+                for key, model in built.items():
+                    old = self._models.get(key)
+                    self._models[key] = model
+                    if old is not None:
+                        old.retired = True
+                        retired.append((old, old.refs == 0))
+        for old, free_old in retired:
+            if free_old:
+                self._free(old)
+            else:
+                logger.info(f"OCR 引擎 {old.key} 已切换，旧引擎在 {old.refs} 个进行中的请求结束后释放")
+        self._evict()
+
+    @contextmanager
+    def use(self, lang=None):
+        """借出引擎，期间不会被淘汰或释放"""
+        while True:
+            model = self.get(lang)
+            with self._lock:
+                # 取到后、加引用前可能恰好被淘汰，重新获取
+                if self._models.get(model.key) is model:
+                    model.refs += 1
+                    model.last_used = time.monotonic()
+                    break
+        try:
+            yield model
+        finally:
+            self._release(model)
+
+    def _release(self, model):
+        with self._lock:
+            model.refs -= 1
+            free = model.retired and model.refs == 0
+            over_limit = not model.retired and model.refs == 0 and self._over_limit()
+        if free:
+            self._free(model)
+        elif over_limit:
+            # 构建时其他引擎都在使用、未能淘汰的情况下，空闲后再淘汰
+            self._evict()
+
+    def _create(self, key, engine_params=None, generation=None):
+        logger.info(f"构建 OCR 引擎: {key}")
+        started = time.monotonic()
+        rss_before = current_rss()
+        engine = self.factory(key, self.engine_params if engine_params is None else engine_params)
+        size_bytes = max(current_rss() - rss_before, _DEFAULT_MODEL_BYTES)
+        elapsed = time.monotonic() - started
+        _model_builds.inc(model=key)
+        _model_build_seconds.observe(elapsed)
+        logger.info(f"OCR 引擎 {key} 已就绪，耗时 {elapsed:.1f}s，约 {size_bytes // (1024 * 1024)}MB")
+        return LoadedModel(key, engine, size_bytes, self.generation if generation is None else generation)
+
+    def _over_limit(self):
+        if self.max_loaded and len(self._models) > self.max_loaded:
+            return True
+        return bool(self.max_bytes) and sum(model.size_bytes for model in self._models.values()) > self.max_bytes
+
+    def _evict(self, keep=None):
+        """淘汰最久未使用的空闲引擎，直到回到上限内；默认语言与刚构建的引擎不淘汰"""
+        evicted = []
+        with self._lock:
+            while self._over_limit():
+                pinned = {keep, self.default_key}
+                idle = [model for model in self._models.values() if model.refs == 0 and model.key not in pinned]
+                if not idle:
+                    break
+                victim = min(idle, key=lambda model: model.last_used)
+                del self._models[victim.key]
+                victim.retired = True
+                evicted.append(victim)
+        for model in evicted:
+            _model_evictions.inc()
+            logger.info(f"淘汰空闲 OCR 引擎: {model.key}（约 {model.size_bytes // (1024 * 1024)}MB）")
+            self._free(model)
+
+    def _free(self, model):
+        model.engine = None
+        release_device_memory()
+
+    def describe(self):
+        with self._lock:
+            return [
+                {"key": model.key, "generation": model.generation, "refs": model.refs, "sizeBytes": model.size_bytes,
+                 "idleSeconds": time.monotonic() - model.last_used}
+                for model in self._models.values()
+            ]
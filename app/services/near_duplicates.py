@@ -0,0 +1,186 @@
+"""近重复图片的识别结果复用
+
+同一份文档经不同客户端重新编码、压缩或缩放后字节完全不同，按字节哈希无法命中。
+解码后对缩略图计算感知哈希（dHash），在有界索引中按汉明距离查找之前的结果：
+
+- 哈希切成 MAX_DISTANCE + 1 段，每段建精确匹配的倒排表；距离不超过 MAX_DISTANCE 的两个哈希
+  至少有一段完全相同（鸽巢原理），查找只需比较这些候选，不必遍历整个索引
+- dHash 分不开同一模板、只有字段内容不同的表单（金额不同的两张发票哈希可能完全相同），只用来找候选；
+  候选还要在 VERIFY_SIZE×VERIFY_SIZE 灰度缩略图上逐块比较，每个 4×4 像素块的平均灰度差都不超过 MAX_TILE_DIFF 才算命中。
+  重新编码、等比缩放的差异分散且幅度小，改动过的字段集中在少数块上且差异大；比一个块还小的改动（如单个字符）仍可能漏判
+- 还要求租户相同、宽高比一致、语言相同，才视为同一张图：不同租户的结果互不复用
+- 命中时返回之前精简后的预测结果，多边形按新旧图片尺寸缩放，之后与正常推理结果走同样的解析流程
+- 条目数超过上限时淘汰最久未命中的；引擎热替换后清空
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.config import (OCR_DEDUP_ENABLED, OCR_DEDUP_MAX_ENTRIES, OCR_DEDUP_HASH_SIZE, OCR_DEDUP_MAX_DISTANCE,
+                        OCR_DEDUP_VERIFY_SIZE, OCR_DEDUP_MAX_TILE_DIFF)
+from app.utils.image_utils import difference_hash, gray_thumbnail
+from app.utils.metrics import REGISTRY
+
+
+# 宽高比相差超过 2% 的不视为同一张图（裁剪、拼接后的图哈希可能仍然接近）
+_MAX_ASPECT_LOG_RATIO = math.log(1.02)
+
+# 逐像素确认时的分块边长（像素）
+_TILE = 4
+
+_lookups = REGISTRY.counter("ocr_dedup_lookups_total", "Near-duplicate index lookups, by result (hit or miss)")
+_hit_distance = REGISTRY.summary("ocr_dedup_hit_distance", "Hamming distance between a request and the cached image it matched")
+_entries = REGISTRY.gauge("ocr_dedup_entries", "Images held in the near-duplicate index")
+_max_distance = REGISTRY.gauge("ocr_dedup_max_distance", "Largest Hamming distance accepted as a near-duplicate match")
+_evictions = REGISTRY.counter("ocr_dedup_evictions_total", "Entries dropped from the near-duplicate index to stay within its limit")
+_rejected = REGISTRY.counter("ocr_dedup_verify_rejected_total", "Hash candidates rejected by the thumbnail comparison")
+
+
+class Fingerprint:
+    """感知哈希（找候选）与确认用的灰度缩略图"""
+    __slots__ = ("dhash", "thumbnail")
+
+    def __init__(self, dhash, thumbnail):
+        self.dhash = dhash
+        self.thumbnail = thumbnail
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "scope", "lang", "width", "height", "result")
+
+    def __init__(self, fingerprint, scope, lang, width, height, result):
+        self.fingerprint = fingerprint
+        self.scope = scope
+        self.lang = lang
+        self.width = width
+        self.height = height
+        self.result = result
+
+
+def _canvas_size(width, height, angle):
+    """预处理旋转 90/270 度后，多边形所在画布的宽高互换"""
+    return (height, width) if int(angle) % 180 == 90 else (width, height)
+
+
+def _scale_boxes(boxes, sx, sy):
+    scaled = []
+    for box in boxes:
+        try:
+            scaled.append([[x * sx, y * sy] for x, y in box])
+        except (TypeError, ValueError):
+            # 四元组 [x1, y1, x2, y2] 形式的矩形框
+            scaled.append([value * (sx if i % 2 == 0 else sy) for i, value in enumerate(box)])
+    return scaled
+
+
+def rescale_result(result, from_size, to_size):
+    """把精简后的预测结果（compact_predict_results）中的多边形从 from_size 缩放到 to_size"""
+    res = dict(result[0]["res"])
+    angle = (res.get("doc_preprocessor_res") or {}).get("angle", 0)
+    from_w, from_h = _canvas_size(*from_size, angle)
+    to_w, to_h = _canvas_size(*to_size, angle)
+    sx, sy = to_w / from_w, to_h / from_h
+    for name in ("rec_polys", "rec_boxes", "dt_polys"):
+        res[name] = _scale_boxes(res.get(name) or [], sx, sy)
+    return [{"res": res}]
+
+
+class NearDuplicateIndex:
+    def __init__(self, max_entries=OCR_DEDUP_MAX_ENTRIES, hash_size=OCR_DEDUP_HASH_SIZE, max_distance=OCR_DEDUP_MAX_DISTANCE,
+                 verify_size=OCR_DEDUP_VERIFY_SIZE, max_tile_diff=OCR_DEDUP_MAX_TILE_DIFF, enabled=OCR_DEDUP_ENABLED):
+        self.enabled = enabled and max_entries > 0
+        self.max_entries = max_entries
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        # 向上取整到分块边长的整数倍
+        self.verify_size = max(_TILE, -(-verify_size // _TILE) * _TILE)
+        self.max_tile_diff = max_tile_diff
+        bits = hash_size * hash_size
+        bands = max(1, min(max_distance + 1, bits))
+        # 每段的 (起始位, 位数)；最后一段包含除不尽的余数
+        width = bits // bands
+        self._bands = [(i * width, width if i < bands - 1 else bits - i * width) for i in range(bands)]
+        self._entries = OrderedDict()    # id -> _Entry，按最近使用排序
+        self._buckets = {}               # (段号, 段值) -> {id}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        _entries.set_function(lambda: len(self._entries))
+        _max_distance.set(max_distance)
+
+    def fingerprint(self, image):
+        return Fingerprint(difference_hash(image, self.hash_size), gray_thumbnail(image, self.verify_size, self.verify_size))
+
+    def _band_keys(self, dhash):
+        return [(i, (dhash >> start) & ((1 << width) - 1)) for i, (start, width) in enumerate(self._bands)]
+
+    def same_image(self, a, b):
+        """逐块比较两张缩略图：每个 4×4 像素块的平均灰度差都不超过 max_tile_diff"""
+        diff = np.abs(a.thumbnail.astype(np.int16) - b.thumbnail.astype(np.int16))
+        tiles = diff.reshape(self.verify_size // _TILE, _TILE, self.verify_size // _TILE, _TILE).mean(axis=(1, 3))
+        return float(tiles.max()) <= self.max_tile_diff
+
+    def lookup(self, fingerprint, size, lang, scope=None):
+        """返回缩放到 size=(宽, 高) 的之前结果；未命中返回 None。scope（租户）不同的结果不复用"""
+        width, height = size
+        aspect = math.log(width / height)
+        best, best_distance, rejected = None, None, 0
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(fingerprint.dhash):
+                candidates.update(self._buckets.get(key, ()))
+            ranked = []
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry.scope != scope or entry.lang != lang or abs(math.log(entry.width / entry.height) - aspect) > _MAX_ASPECT_LOG_RATIO:
+                    continue
+                distance = (entry.fingerprint.dhash ^ fingerprint.dhash).bit_count()
+                if distance <= self.max_distance:
+                    ranked.append((distance, entry_id))
+            # 按汉明距离从近到远确认，第一个通过缩略图比较的即为命中
+            for distance, entry_id in sorted(ranked):
+                entry = self._entries[entry_id]
+                if self.same_image(entry.fingerprint, fingerprint):
+                    best, best_distance = entry, distance
+                    self._entries.move_to_end(entry_id)
+                    break
+                rejected += 1
+        if rejected:
+            _rejected.inc(rejected)
+        if best is None:
+            _lookups.inc(result="miss")
+            return None
+        _lookups.inc(result="hit")
+        _hit_distance.observe(best_distance)
+        return rescale_result(best.result, (best.width, best.height), size)
+
+    def add(self, fingerprint, size, lang, result, scope=None):
+        """记录精简后的预测结果（只含文本、分数与多边形，不含原图；另存一张确认用的缩略图）"""
+        width, height = size
+        evicted = 0
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(fingerprint, scope, lang, width, height, result)
+            for key in self._band_keys(fingerprint.dhash):
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                old_id, old = self._entries.popitem(last=False)
+                for key in self._band_keys(old.fingerprint.dhash):
+                    bucket = self._buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(old_id)
+                        if not bucket:
+                            del self._buckets[key]
+                evicted += 1
+        if evicted:
+            _evictions.inc(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+
+near_duplicates = NearDuplicateIndex()
@@ -1,220 +1,130 @@
-import math
-import cv2
-import numpy as np
-from paddleocr import PaddleOCR, PPStructureV3
-from app.utils.image_utils import image_to_base64, _rotate_image_keep_size, _rotate_image_resize
-from app.utils.geom_utils import ensure_quad_points, rotate_points
-
-
-simple_ocr = PaddleOCR(
-    device="gpu",
-    use_angle_cls=True,
-    use_doc_unwarping=False,
+import base64
+from app.config import OCR_IMG_FORMAT, OCR_IMG_QUALITY, OCR_IMG_MAX_SIDE
+from app.services import inference_workers
+from app.services.cancellation import raise_if_cancelled
+from app.services.concurrency import inference_limiter
+from app.services.memory import RssTracker
+from app.services.model_registry import ModelRegistry, load_engine_params
+from app.services.near_duplicates import near_duplicates
+from app.utils.buffer_pool import buffer_pool
+from app.utils.image_utils import image_to_base64, sniff_image_format, decode_image_bytes, _rotate_image_keep_size, _rotate_image_resize
+from app.utils.log_utils import log_stage
+from app.utils.predict_utils import (
+    RESPONSE_FORMAT_COLUMNAR,
+    RESPONSE_FORMAT_DETAIL,
+    build_columnar_response,
+    build_items_from_predict_results,
+    build_simple_ocr,
+    build_structured_response,
+    compact_predict_results,
 )
 
-# structure_ocr = PPStructureV3(
-#     device="gpu",
-#     use_chart_recognition=True,
-# )
-
-def _select_primary_boxes(rec_polys, rec_boxes, dt_polys):
-    if rec_polys and len(rec_polys) > 0:
-        return rec_polys
-    if rec_boxes and len(rec_boxes) > 0:
-        return rec_boxes
-    if dt_polys and len(dt_polys) > 0:
-        return dt_polys
-    return []
-
-def _parse_predict_results(predict_results):
-    rec_texts_all, rec_scores_all, rec_polys_all, rec_boxes_all, dt_polys_all = [], [], [], [], []
-    for res in predict_results:
-        if hasattr(res, 'dict') and callable(getattr(res, 'dict')):
-            obj = res.dict()
-        elif hasattr(res, '__dict__') and res.__dict__:
-            obj = dict(res.__dict__)
-        else:
-            obj = res if isinstance(res, dict) else {}
-
-        try:
-            if hasattr(res, '_to_json'):
-                json_obj = res._to_json()
-            elif hasattr(res, 'json'):
-                json_obj = res.json if not callable(res.json) else res.json()
-            else:
-                json_obj = obj
-            if isinstance(json_obj, dict) and 'res' in json_obj and isinstance(json_obj['res'], dict):
-                obj = json_obj['res']
-            else:
-                obj = json_obj if isinstance(json_obj, dict) else obj
-        except Exception as e:
-            obj = {}
-
-        rec_texts = obj.get('rec_texts') or []
-        rec_scores = obj.get('rec_scores') or []
-        rec_polys = obj.get('rec_polys') or []
-        rec_boxes = obj.get('rec_boxes') or []
-        dt_polys = obj.get('dt_polys') or []
-
-
-        rec_texts_all.extend(rec_texts if isinstance(rec_texts, list) else [])
-        rec_scores_all.extend(rec_scores if isinstance(rec_scores, list) else [])
-        rec_polys_all.extend(rec_polys if isinstance(rec_polys, list) else [])
-        rec_boxes_all.extend(rec_boxes if isinstance(rec_boxes, list) else [])
-        dt_polys_all.extend(dt_polys if isinstance(dt_polys, list) else [])
-
-        # 获取预处理角度
-        pre_angle = 0
-        try:
-            doc_preprocessor_res = obj.get('doc_preprocessor_res')
-            if doc_preprocessor_res and isinstance(doc_preprocessor_res, dict):
-                pre_angle = doc_preprocessor_res.get('angle', 0)
-        except Exception:
-            pre_angle = 0
-
-    return rec_texts_all, rec_scores_all, rec_polys_all, rec_boxes_all, dt_polys_all, pre_angle
-
-def _compute_rotation_angle_from_boxes(boxes, texts, scores):
-    candidates = []
-    for i, box in enumerate(boxes):
-        norm_box = ensure_quad_points(box)
-        if not norm_box:
-            continue
-        text_val = texts[i] if i < len(texts) else ""
-        score_val = float(scores[i]) if i < len(scores) and isinstance(scores[i], (int, float)) else 1.0
-        candidates.append({
-            "Confidence": score_val,
-            "Position": norm_box,
-            "Value": text_val,
-        })
-
-    if not candidates:
-        return 0.0
-
-    best = None
-    best_conf = -1.0
-    for c in candidates:
-        if (c["Confidence"] > best_conf and len(c["Value"]) > 3 and (" " in c["Value"])):
-            best = c
-            best_conf = c["Confidence"]
-
-    if best is None:
-        best = candidates[0]
-
-    position = best["Position"]
-    if len(position) >= 2:
-        x1, y1 = position[0]
-        x2, y2 = position[1]
-        angle_rad = math.atan2(y2 - y1, x2 - x1)
-        return math.degrees(angle_rad)
-    return 0.0
-
-
-
-
-def build_items_from_predict_results(predict_results, image=None, directionCorrection=False):
-    rec_texts, rec_scores, rec_polys, rec_boxes, dt_polys, pre_angle = _parse_predict_results(predict_results)
-    if pre_angle != 0:
-        rotation_angle = pre_angle
-    else:
-        primary_boxes = _select_primary_boxes(rec_polys, rec_boxes, dt_polys)
-        rotation_angle = _compute_rotation_angle_from_boxes(primary_boxes, rec_texts, rec_scores)
-
-    if pre_angle == 0 and directionCorrection and image is not None and abs(rotation_angle) > 1.0:
-        height, width = image.shape[:2]
-        center = (width // 2, height // 2)
-        image[:] = _rotate_image_keep_size(image, rotation_angle)
-
-        def rotate_list_of_boxes(box_list):
-            rotated = []
-            for b in box_list:
-                norm = ensure_quad_points(b)
-                if norm:
-                    rotated.append(rotate_points(norm, center, -rotation_angle))
-                else:
-                    rotated.append(b)
-            return rotated
-
-        rec_polys = rotate_list_of_boxes(rec_polys)
-        rec_boxes = rotate_list_of_boxes(rec_boxes)
-        dt_polys = rotate_list_of_boxes(dt_polys)
-
-    extracted = []
-    num = max(len(rec_texts), len(rec_scores), len(rec_polys or []), len(rec_boxes or []), len(dt_polys or []))
-    for i in range(num):
-        text_val = rec_texts[i] if i < len(rec_texts) else ""
-        score_val = rec_scores[i] if i < len(rec_scores) else 1.0
-        box = None
-
-        if rec_polys and i < len(rec_polys):
-            box = ensure_quad_points(rec_polys[i])
-        if box is None and rec_boxes and i < len(rec_boxes):
-            box = ensure_quad_points(rec_boxes[i])
-        if box is None and dt_polys and i < len(dt_polys):
-            box = ensure_quad_points(dt_polys[i])
-        if box is None:
-            continue
-        extracted.append({
-            'text': text_val,
-            'confidence': float(score_val) if isinstance(score_val, (int, float)) else 1.0,
-            'bbox': box,
-        })
-    if extracted:
-        extracted[-1]['text'] = f"{extracted[-1]['text']}\n"
-    return extracted, rotation_angle, pre_angle
-
-def build_structured_response(extracted_text, image_width, image_height, angle=0, include_image_info=False, image_base64=None):
-    details = []
-    concatenated_text = ""
-    for item in extracted_text:
-        value = item.get("text", "")
-        concatenated_text += value
-        details.append({
-            "Confidence": item.get("confidence", 0.0),
-            "Position": item.get("bbox", []),
-            "Value": value,
-        })
-
-    # 将角度转换为负数，为前端目标旋转角度，方便前端直接使用
-    angle = -angle
-    # 根据360度为周期，将角度转换为0-360度
-    angle = angle % 360
-    structured = {
-        "OcrInfo": [
-            {
-                "Text": concatenated_text,
-                "Detail": details,
-            }
-        ],
-        "ImageInfo": [
-            {
-                "Angle": angle,
-                "Height": image_height,
-                "Width": image_width,
-            }
-        ]
-    }
-    # 仅当需要时才包含 ImageBase64
-    if include_image_info and image_base64 is not None:
-        structured["ImageInfo"][0]["ImageBase64"] = image_base64
-    return structured
 
-# def process_structure(image, direction_correction=False, include_image_info=False):
-#     result = structure_ocr.predict(image)
-#     items, rotation_angle = build_items_from_predict_results(result, image=image, directionCorrection=direction_correction)
-#     h, w = image.shape[:2]
-#     img_b64 = image_to_base64(image) if include_image_info else None
-#     return build_structured_response(items, image_width=w, image_height=h, angle=rotation_angle, include_image_info=include_image_info, image_base64=img_b64)
+class InvalidImageError(ValueError):
+    """上传内容无法解码为图像"""
 
-def process_simple(image, direction_correction=False, include_image_info=False):
-    result = simple_ocr.predict(image)
 
-    items, rotation_angle, pre_angle = build_items_from_predict_results(result, image=image, directionCorrection=direction_correction)
-    if pre_angle != 0:
-        image = _rotate_image_resize(image, pre_angle)
-        h, w = image.shape[:2]
+# 按语言懒加载的引擎；启用推理工作进程时 API 进程不加载模型，由各工作进程各自持有
+model_registry = ModelRegistry(build_simple_ocr, engine_params=load_engine_params())
+
+
+def get_simple_ocr(lang=None):
+    """返回指定语言（默认 OCR_DEFAULT_LANG）的 PaddleOCR 引擎，首次使用时构建"""
+    return model_registry.get(lang).engine
+
+
+def predict_local(image, lang=None):
+    """在当前进程内推理；PaddleOCR 实例非线程安全，同一引擎上的 predict 串行执行"""
+    with model_registry.use(lang) as model, model.lock:
+        return model.engine.predict(image)
+
+
+def _predict(image, lang=None):
+    pool = inference_workers.inference_pool
+    if pool is not None:
+        return pool.predict(image, lang)
+    return predict_local(image, lang)
+
+def _encode_result_image(image, rotated, source_bytes=None, img_format=None, img_quality=None, img_max_side=None, alloc=None):
+    """生成返回的 ImageBase64，返回 (base64, 格式)。
+
+    未发生旋转、未指定格式/质量且无需缩放时直接返回上传的原始字节，避免重新编码。
+    """
+    max_side = OCR_IMG_MAX_SIDE if img_max_side is None else img_max_side
+    height, width = image.shape[:2]
+    exceeds_max_side = bool(max_side) and max(height, width) > max_side
+    if not rotated and source_bytes is not None and img_format is None and img_quality is None and not exceeds_max_side:
+        source_format = sniff_image_format(source_bytes)
+        if source_format is not None:
+            return base64.b64encode(source_bytes).decode('utf-8'), source_format
+
+    fmt = img_format or OCR_IMG_FORMAT
+    quality = OCR_IMG_QUALITY if img_quality is None else img_quality
+    return image_to_base64(image, fmt=fmt, quality=quality, max_side=max_side, alloc=alloc), fmt
+
+def process_simple(image, direction_correction=False, include_image_info=False, response_format=RESPONSE_FORMAT_DETAIL, pack_boxes=False,
+                   source_bytes=None, img_format=None, img_quality=None, img_max_side=None, lang=None, include_layout=False, cancel_token=None,
+                   dedup_scope=None):
+    """dedup_scope: 近重复复用的范围（租户），只复用同一范围内的结果"""
+    rss = RssTracker()
     h, w = image.shape[:2]
-    img_b64 = image_to_base64(image) if include_image_info else None
-    return build_structured_response(items, image_width=w, image_height=h, angle=pre_angle if pre_angle != 0 else rotation_angle, include_image_info=include_image_info, image_base64=img_b64)
+    fingerprint, result = None, None
+    if near_duplicates.enabled:
+        fingerprint = near_duplicates.fingerprint(image)
+        result = near_duplicates.lookup(fingerprint, (w, h), model_registry.resolve(lang), scope=dedup_scope)
+    if result is None:
+        with inference_limiter.measure(h * w), log_stage("predict"):
+            raise_if_cancelled(cancel_token, "predict")
+            result = _predict(image, lang)
+        if fingerprint is not None:
+            result = compact_predict_results(result)
+            near_duplicates.add(fingerprint, (w, h), model_registry.resolve(lang), result, scope=dedup_scope)
+    rss.sample()
+    raise_if_cancelled(cancel_token, "postprocess")
+
+    items, rotation_angle, pre_angle = build_items_from_predict_results(result, directionCorrection=direction_correction, image_size=(w, h))
+    # 预测结果中带有输入图与预处理图的拷贝，解析后立即释放
+    del result
+    # 与 build_items_from_predict_results 中的矫正条件保持一致
+    rotated = pre_angle != 0 or (direction_correction and abs(rotation_angle) > 1.0)
+    # 旋转画布与缩放输出借自缓冲池，编码完成后随 with 块归还；借出的数组不能离开该块
+    with buffer_pool.lease() as lease:
+        if pre_angle != 0:
+            image = _rotate_image_resize(image, pre_angle, alloc=lease.empty)
+        elif rotated and include_image_info:
+            # 只有需要返回图片时才旋转像素；重新绑定后原图即可释放
+            image = _rotate_image_keep_size(image, rotation_angle, alloc=lease.empty)
+        rss.sample()
+        h, w = image.shape[:2]
+        img_b64, img_fmt = None, None
+        if include_image_info:
+            raise_if_cancelled(cancel_token, "encode")
+            with log_stage("encode"):
+                img_b64, img_fmt = _encode_result_image(image, rotated, source_bytes=source_bytes, img_format=img_format, img_quality=img_quality,
+                                                        img_max_side=img_max_side, alloc=lease.empty)
+        del image
+    angle = pre_angle if pre_angle != 0 else rotation_angle
+    if response_format == RESPONSE_FORMAT_COLUMNAR:
+        structured = build_columnar_response(items, image_width=w, image_height=h, angle=angle, include_image_info=include_image_info, image_base64=img_b64, pack_boxes=pack_boxes,
+                                             include_layout=include_layout)
+    else:
+        structured = build_structured_response(items, image_width=w, image_height=h, angle=angle, include_image_info=include_image_info, image_base64=img_b64,
+                                               include_layout=include_layout)
+    if img_b64 is not None:
+        structured["ImageInfo"][0]["ImageFormat"] = img_fmt
+    rss.finish()
+    return structured
 
 
+def process_simple_bytes(contents, decoder=decode_image_bytes, cancel_token=None, **kwargs):
+    """解码 + process_simple，作为一个整体调度，过期请求连解码也不必执行"""
+    raise_if_cancelled(cancel_token, "decode")
+    try:
+        with log_stage("decode"):
+            decoded = [decoder(contents)]
+    except Exception as e:
+        raise InvalidImageError("Invalid image file") from e
+    if decoded[0] is None:
+        raise InvalidImageError("Invalid image file")
+    # 通过 pop 把唯一引用交给 process_simple，旋转后原图可以及时释放
+    return process_simple(decoded.pop(), source_bytes=contents, cancel_token=cancel_token, **kwargs)
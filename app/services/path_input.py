@@ -0,0 +1,111 @@
+"""本地路径输入：同机的生产者把图片放到共享目录（OCR_DATA_ROOT），只传路径，不经过 HTTP 上传与 multipart 解析
+
+- 路径可以是单个文件、glob 模式或清单文件（每行一个路径），都相对 OCR_DATA_ROOT 解析；
+  解析符号链接后仍必须位于该目录内，否则拒绝
+- 文件以只读 mmap 映射后直接交给 cv2.imdecode，不复制到堆上
+- 可选把结果写到图片旁边的 <文件名>.ocr.json（先写临时文件再原子替换）
+"""
+import glob
+import json
+import os
+
+from app.config import OCR_DATA_ROOT, OCR_PATH_MAX_FILES
+from app.services.ocr_service import process_simple_bytes
+from app.utils.image_utils import decode_image_bytes, map_image_file
+from app.utils.response_utils import convert_numpy_to_list
+
+
+RESULT_SUFFIX = ".ocr.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+
+class PathNotAllowed(Exception):
+    """路径不在数据目录内，或输入不合法"""
+
+
+class TooManyFiles(Exception):
+    def __init__(self, count, limit):
+        super().__init__(f"{count} files exceed the limit of {limit}")
+        self.count = count
+        self.limit = limit
+
+
+class PathResolver:
+    def __init__(self, root=OCR_DATA_ROOT, max_files=OCR_PATH_MAX_FILES):
+        self.root = os.path.realpath(root) if root else None
+        self.max_files = max_files
+
+    @property
+    def enabled(self):
+        return self.root is not None
+
+    def relative(self, path):
+        return os.path.relpath(path, self.root)
+
+    def _real(self, path):
+        # 相对路径按数据目录解析；realpath 解析符号链接，防止链接指向目录外
+        real = os.path.realpath(os.path.join(self.root, path))
+        return real if os.path.commonpath([self.root, real]) == self.root else None
+
+    def _inside(self, path):
+        real = self._real(path)
+        if real is None:
+            raise PathNotAllowed(f"Path outside data root: {path}")
+        return real
+
+    def resolve(self, paths=(), pattern=None, manifest=None):
+        """返回去重后的绝对路径列表（保持输入顺序）；显式列出的文件不存在时保留，由处理阶段报告"""
+        resolved = [self._inside(path) for path in paths]
+        if manifest:
+            with open(self._inside(manifest), "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        resolved.append(self._inside(line))
+                    if len(resolved) > self.max_files:
+                        raise TooManyFiles(len(resolved), self.max_files)
+        if pattern:
+            if os.path.isabs(pattern) or ".." in pattern.replace("\\", "/").split("/"):
+                raise PathNotAllowed(f"Glob pattern must be relative to the data root: {pattern}")
+            matches = []
+            for match in glob.iglob(os.path.join(self.root, pattern), recursive=True):
+                if not match.lower().endswith(IMAGE_EXTENSIONS) or not os.path.isfile(match):
+                    continue
+                # 指向目录外的符号链接直接跳过
+                real = self._real(match)
+                if real is not None:
+                    matches.append(real)
+                    if len(resolved) + len(matches) > self.max_files:
+                        raise TooManyFiles(len(resolved) + len(matches), self.max_files)
+            resolved.extend(sorted(matches))
+        resolved = list(dict.fromkeys(resolved))
+        if len(resolved) > self.max_files:
+            raise TooManyFiles(len(resolved), self.max_files)
+        return resolved
+
+
+def _write_result(path, structured):
+    result_path = path + RESULT_SUFFIX
+    with open(result_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(convert_numpy_to_list(structured), f, ensure_ascii=False)
+    os.replace(result_path + ".tmp", result_path)
+    return result_path
+
+
+def process_simple_path(path, write_result=False, cancel_token=None, **kwargs):
+    """映射文件并执行 process_simple_bytes；write_result=True 时结果写到图片旁边，返回 (结果, 结果文件路径)"""
+    mapped = map_image_file(path)
+    try:
+        # 原始字节（needImg 时原样返回）同样直接取自映射
+        structured = process_simple_bytes(mapped, decoder=decode_image_bytes, cancel_token=cancel_token, **kwargs)
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # 异常回溯仍引用着基于映射的数组时无法立即关闭，由垃圾回收解除映射
+            pass
+    result_path = _write_result(path, structured) if write_result else None
+    return structured, result_path
+
+
+path_resolver = PathResolver()
@@ -0,0 +1,285 @@
+"""按需性能剖析：由管理接口开启，覆盖之后的 N 个请求或 T 秒，结束后保留结果供下载
+
+- sample：后台线程按固定间隔采样所有线程的调用栈，输出火焰图可用的折叠栈（collapsed stacks，
+  每行 "线程;外层函数;...;内层函数 次数"，可交给 flamegraph.pl / speedscope）；默认跳过空闲等待中的线程
+- cprofile：事件循环线程（控制器、序列化）与工作线程中执行的任务（解码、process_simple、旋转、编码）
+  分别用 cProfile 记录，结束时合并为一份 pstats
+- tracemalloc：可与以上任一模式同时开启，结束时输出期间分配且仍存活的内存按代码行汇总的前 N 项
+- 剖析期间覆盖进程内的全部请求（不只是计数的 N 个）；同一时间只允许一个剖析会话
+- 启用推理工作进程时，推理本身在其他进程中执行，不在剖析结果内
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from app.utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("paddleocr_app")
+
+MODE_SAMPLE = "sample"
+MODE_CPROFILE = "cprofile"
+MODE_NONE = "none"
+
+STATE_RUNNING = "running"
+STATE_FINISHED = "finished"
+
+# 单次剖析的最长时间（秒）
+MAX_SECONDS = 600
+
+# 只有 OCR 接口计入请求数（健康检查、指标抓取与管理接口不计）
+_COUNTED_PREFIX = "/ocr_"
+
+# 叶子帧为这些函数时视为空闲等待（事件循环 select、线程池取任务、队列与条件变量等待）
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("connection.py", "_poll"),
+}
+
+# Python 3.12 起 cProfile 基于 sys.monitoring，对所有线程生效且同一时间只能启用一个；之前的版本只记录启用它的线程
+_PER_THREAD_PROFILE = sys.version_info < (3, 12)
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_sessions = REGISTRY.counter("ocr_profile_sessions_total", "Profiling sessions started, by mode")
+
+
+class ProfileInProgress(Exception):
+    """已有剖析会话在运行"""
+
+
+def _short_path(filename):
+    if filename.startswith(_APP_ROOT + os.sep):
+        return os.path.relpath(filename, _APP_ROOT)
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return os.path.basename(filename)
+
+
+def _thread_group(name):
+    # ocr-worker_0、ocr-worker_1 ... 合并为一组
+    return re.sub(r"[_-]?\d+$", "", name) or name
+
+
+class StackSampler:
+    def __init__(self, interval, include_idle=False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples = 0
+        self._stacks = Counter()
+        self._labels = {}
+        self._idle_codes = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ocr-profiler")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _is_idle(self, code):
+        idle = self._idle_codes.get(code)
+        if idle is None:
+            idle = (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES
+            self._idle_codes[code] = idle
+        return idle
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if not self.include_idle and self._is_idle(frame.f_code):
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                self._stacks[(_thread_group(names.get(ident, str(ident))), tuple(codes))] += 1
+            self.samples += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def collapsed(self):
+        lines = []
+        for (thread, codes), count in self._stacks.most_common():
+            lines.append(";".join([thread] + [self._label(code) for code in codes]) + f" {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+class ProfileSession:
+    def __init__(self, mode, max_requests=0, seconds=30.0, interval=0.01, include_idle=False, trace_malloc=False, top=30):
+        self.mode = mode
+        self.max_requests = max_requests
+        self.seconds = seconds
+        self.trace_malloc = trace_malloc
+        self.top = top
+        self.state = STATE_RUNNING
+        self.started_at = time.time()
+        self.finished_at = None
+        self.requests = 0
+        self.sampler = StackSampler(interval, include_idle) if mode == MODE_SAMPLE else None
+        # cProfile：事件循环线程一个，工作线程中每个任务一个（Profile 只能在启用它的线程中使用）
+        self.loop_profile = cProfile.Profile() if mode == MODE_CPROFILE else None
+        self.job_profiles = []
+        self.allocations = None
+        self._started_tracemalloc = False
+        self._done = asyncio.Event()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def status(self):
+        end = self.finished_at or time.time()
+        status = {
+            "mode": self.mode,
+            "state": self.state,
+            "requests": self.requests,
+            "maxRequests": self.max_requests,
+            "seconds": self.seconds,
+            "elapsedSeconds": round(end - self.started_at, 3),
+            "tracemalloc": self.trace_malloc,
+        }
+        if self.sampler is not None:
+            status["samples"] = self.sampler.samples
+        if self.loop_profile is not None:
+            status["profiledJobs"] = len(self.job_profiles)
+        return status
+
+
+class Profiler:
+    def __init__(self):
+        self.session = None
+
+    def start(self, mode=MODE_SAMPLE, max_requests=0, seconds=30.0, interval=0.01, include_idle=False, trace_malloc=False, top=30):
+        """开启剖析（需在事件循环线程中调用）；N 个请求完成或 seconds 秒后自动结束"""
+        if self.session is not None and self.session.state == STATE_RUNNING:
+            raise ProfileInProgress()
+        session = ProfileSession(mode, max_requests, min(seconds, MAX_SECONDS), interval, include_idle, trace_malloc, top)
+        if trace_malloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            session._started_tracemalloc = True
+        if session.sampler is not None:
+            session.sampler.start()
+        if session.loop_profile is not None:
+            session.loop_profile.enable()
+        session._timer = asyncio.get_running_loop().call_later(session.seconds, self.stop)
+        self.session = session
+        _sessions.inc(mode=mode)
+        logger.warning(f"性能剖析已开启 (mode={mode}, requests={max_requests}, seconds={session.seconds}, tracemalloc={trace_malloc})")
+        return session.status()
+
+    def stop(self):
+        """结束当前会话并整理结果（需在事件循环线程中调用）"""
+        session = self.session
+        if session is None or session.state != STATE_RUNNING:
+            return
+        session.state = STATE_FINISHED
+        session.finished_at = time.time()
+        session._timer.cancel()
+        if session.loop_profile is not None:
+            session.loop_profile.disable()
+        if session.sampler is not None:
+            session.sampler.stop()
+        if session.trace_malloc:
+            session.allocations = self._allocation_stats(session)
+        session._done.set()
+        logger.warning(f"性能剖析已结束 ({session.status()})")
+
+    @staticmethod
+    def _allocation_stats(session):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        if session._started_tracemalloc:
+            tracemalloc.stop()
+        top = []
+        for stat in snapshot.statistics("lineno")[:session.top]:
+            frame = stat.traceback[0]
+            top.append({"File": _short_path(frame.filename), "Line": frame.lineno, "SizeBytes": stat.size, "Count": stat.count})
+        return {"TracedCurrentBytes": current, "TracedPeakBytes": peak, "Top": top}
+
+    async def wait(self):
+        if self.session is not None:
+            await self.session._done.wait()
+
+    def request_finished(self, path):
+        """请求结束时由中间件调用（事件循环线程）"""
+        session = self.session
+        if session is None or session.state != STATE_RUNNING or not path.startswith(_COUNTED_PREFIX):
+            return
+        session.requests += 1
+        if session.max_requests and session.requests >= session.max_requests:
+            self.stop()
+
+    def run(self, call, *args, **kwargs):
+        """工作线程中执行任务；cProfile 会话进行中时记录该任务"""
+        session = self.session
+        if not _PER_THREAD_PROFILE or session is None or session.loop_profile is None or session.state != STATE_RUNNING:
+            return call(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(call, *args, **kwargs)
+        finally:
+            with session._lock:
+                if session.state == STATE_RUNNING:
+                    session.job_profiles.append(profile)
+
+    def collapsed_stacks(self):
+        session = self.session
+        return session.sampler.collapsed() if session is not None and session.sampler is not None else None
+
+    def pstats(self):
+        session = self.session
+        if session is None or session.loop_profile is None:
+            return None
+        stats = pstats.Stats(session.loop_profile)
+        with session._lock:
+            for profile in session.job_profiles:
+                stats.add(profile)
+        return stats
+
+    def pstats_text(self, sort="cumulative", limit=80):
+        stats = self.pstats()
+        if stats is None:
+            return None
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def pstats_binary(self):
+        """与 pstats.Stats.dump_stats 写出的文件格式相同，可用 pstats.Stats(文件) 或 snakeviz 打开"""
+        stats = self.pstats()
+        return marshal.dumps(stats.stats) if stats is not None else None
+
+
+profiler = Profiler()
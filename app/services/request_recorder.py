@@ -0,0 +1,164 @@
+"""慢请求录制：把超过延迟阈值（或按比例采样）的请求的输入、参数与阶段耗时保存到本地目录，供 replay_traffic.py 重放
+
+- 默认关闭：配置 OCR_RECORD_DIR 且 OCR_RECORD_SLOW_MS > 0 或 OCR_RECORD_SAMPLE_RATE > 0 时启用
+- 接口在读取上传内容后调用 attach 登记输入与参数；请求结束时由 RequestContextMiddleware 调用 finish，
+  按总耗时与采样决定是否保存
+- 写盘在后台线程中进行，队列满时丢弃；目录总大小超过 OCR_RECORD_MAX_MB 时删除最早的记录
+- 每条记录为 <名称>.img（原始图片字节）与 <名称>.json（元数据，最后写入，存在即表示记录完整）
+"""
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from app.config import OCR_RECORD_DIR, OCR_RECORD_SLOW_MS, OCR_RECORD_SAMPLE_RATE, OCR_RECORD_MAX_MB
+from app.utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("paddleocr_app")
+
+REASON_SLOW = "slow"
+REASON_SAMPLED = "sampled"
+
+IMAGE_SUFFIX = ".img"
+META_SUFFIX = ".json"
+
+# 等待写盘的记录数上限
+_QUEUE_SIZE = 64
+
+_capture_var = ContextVar("request_capture", default=None)
+
+_captured = REGISTRY.counter("ocr_recorder_captured_total", "Requests saved to the capture spool, by reason")
+_dropped = REGISTRY.counter("ocr_recorder_dropped_total", "Captures dropped because the write queue was full or the write failed")
+_spool_bytes = REGISTRY.gauge("ocr_recorder_spool_bytes", "Bytes currently held in the capture spool")
+
+
+class RequestRecorder:
+    def __init__(self, directory=OCR_RECORD_DIR, slow_ms=OCR_RECORD_SLOW_MS, sample_rate=OCR_RECORD_SAMPLE_RATE,
+                 max_bytes=OCR_RECORD_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.enabled = bool(directory) and (slow_ms > 0 or sample_rate > 0)
+        self._queue = queue.Queue(maxsize=_QUEUE_SIZE)
+        self._entries = deque()     # (名称, 字节数)，按写入顺序
+        self._bytes = 0
+        self._written = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        _spool_bytes.set_function(lambda: self._bytes)
+
+    def begin(self):
+        """请求开始时调用，返回用于 end 的 token；未启用时返回 None"""
+        if not self.enabled:
+            return None
+        return _capture_var.set({})
+
+    def end(self, token):
+        if token is not None:
+            _capture_var.reset(token)
+
+    def attach(self, endpoint, contents, params):
+        """登记本请求的输入与参数（params 为传给 process_* 的关键字参数）"""
+        capture = _capture_var.get()
+        if capture is not None:
+            capture.update(endpoint=endpoint, contents=contents, params=params)
+
+    def finish(self, request_id, path, query, status, duration_ms, stages_ms):
+        capture = _capture_var.get()
+        if not capture or capture.get("contents") is None:
+            return
+        if self.slow_ms > 0 and duration_ms >= self.slow_ms:
+            reason = REASON_SLOW
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            reason = REASON_SAMPLED
+        else:
+            return
+        meta = {
+            "request_id": request_id,
+            "endpoint": capture["endpoint"],
+            "path": path,
+            "query": query,
+            "params": capture["params"],
+            "status": status,
+            "duration_ms": duration_ms,
+            "stages_ms": stages_ms,
+            "reason": reason,
+            "recorded_at": time.time(),
+            "image_bytes": len(capture["contents"]),
+        }
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((meta, capture["contents"]))
+        except queue.Full:
+            _dropped.inc()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_existing()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="ocr-recorder")
+            self._thread.start()
+
+    def _load_existing(self):
+        names = sorted(name[:-len(META_SUFFIX)] for name in os.listdir(self.directory) if name.endswith(META_SUFFIX))
+        for name in names:
+            self._entries.append((name, self._entry_size(name)))
+            self._bytes += self._entries[-1][1]
+
+    def _entry_size(self, name):
+        size = 0
+        for suffix in (IMAGE_SUFFIX, META_SUFFIX):
+            try:
+                size += os.path.getsize(os.path.join(self.directory, name + suffix))
+            except OSError:
+                pass
+        return size
+
+    def _run(self):
+        while True:
+            meta, contents = self._queue.get()
+            try:
+                self._write(meta, contents)
+            except OSError as e:
+                _dropped.inc()
+                logger.warning(f"保存慢请求记录失败: {e}")
+
+    def _write(self, meta, contents):
+        # 名称按时间排序，删除时先删最早的
+        # 请求 ID 可能来自客户端请求头，只保留文件名安全的字符
+        request_id = re.sub(r"[^0-9A-Za-z_-]", "_", meta["request_id"] or "")
+        self._written += 1
+        name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(meta['recorded_at']))}-{self._written:06d}-{request_id}"
+        image_path = os.path.join(self.directory, name + IMAGE_SUFFIX)
+        meta_path = os.path.join(self.directory, name + META_SUFFIX)
+        with open(image_path, "wb") as f:
+            f.write(contents)
+        meta = dict(meta, image=name + IMAGE_SUFFIX)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+        _captured.inc(reason=meta["reason"])
+
+        self._entries.append((name, self._entry_size(name)))
+        self._bytes += self._entries[-1][1]
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_name, old_size = self._entries.popleft()
+            for suffix in (META_SUFFIX, IMAGE_SUFFIX):
+                try:
+                    os.remove(os.path.join(self.directory, old_name + suffix))
+                except OSError:
+                    pass
+            self._bytes -= old_size
+
+
+request_recorder = RequestRecorder()
@@ -0,0 +1,288 @@
+"""按优先级与截止时间调度 OCR 请求
+
+- 优先级：interactive > normal > bulk，高优先级队列非空时总是先服务
+- 同一优先级内按租户轮询（round-robin），单个租户的大量提交不会挤占其他租户
+- 请求可携带截止时间：出队时已过期的请求直接丢弃，不再花费推理；
+  等待方在截止时间到达时立即返回，不必等到出队
+- 并发数取自并发限制器（默认按推理延迟自适应），排队超过上限的请求立即拒绝
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict, deque
+
+from app.config import OCR_QUEUE_FACTOR, OCR_QUEUE_MIN
+from app.services.cancellation import (
+    CANCEL_DEADLINE,
+    CANCEL_DISCONNECT,
+    CancelToken,
+    RequestCancelled,
+    record_cancelled,
+    record_saved,
+    record_wasted,
+)
+from app.services.concurrency import inference_limiter
+from app.services.executor import run_in_worker
+from app.services.memory import memory_budget
+from app.utils.log_utils import record_stage
+from app.utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("paddleocr_app")
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_NORMAL = "normal"
+PRIORITY_BULK = "bulk"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK)
+
+DEFAULT_TENANT = "default"
+
+# 各优先级可用的排队长度比例：过载时低优先级先被拒绝
+_QUEUE_SCALE = {
+    PRIORITY_INTERACTIVE: 2.0,
+    PRIORITY_NORMAL: 1.0,
+    PRIORITY_BULK: 0.5,
+}
+
+REJECT_DEADLINE = "deadline"
+REJECT_OVERLOAD = "overload"
+
+_rejected = REGISTRY.counter("ocr_rejected_total", "Requests rejected before inference, by reason")
+_queue_depth = REGISTRY.gauge("ocr_queue_depth", "Requests waiting in the scheduler queue")
+_in_flight = REGISTRY.gauge("ocr_in_flight", "Requests currently being processed")
+_queue_wait = REGISTRY.summary("ocr_queue_wait_seconds", "Time spent waiting in the scheduler queue")
+
+
+class DeadlineExceeded(Exception):
+    """请求在开始推理前已超过截止时间"""
+
+
+class Overloaded(Exception):
+    """排队已满，请求被提前拒绝；retry_after 为建议的重试等待秒数"""
+
+    def __init__(self, retry_after=1.0):
+        super().__init__("OCR queue is full")
+        self.retry_after = retry_after
+
+
+class _Job:
+    __slots__ = ("func", "args", "kwargs", "priority", "tenant", "deadline", "enqueued_at", "future", "cancel_token", "started_at", "cost", "context")
+
+    def __init__(self, func, args, kwargs, priority, tenant, deadline, future, cancel_token, cost=0):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.tenant = tenant
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.future = future
+        self.cancel_token = cancel_token
+        self.started_at = None
+        self.cost = cost
+        # 提交方的上下文（请求 ID、阶段耗时）；任务由其他请求结束时调度，执行时需切回该上下文
+        self.context = contextvars.copy_context()
+
+    def expired(self, now=None):
+        return self.deadline is not None and (now or time.monotonic()) >= self.deadline
+
+
+class OcrScheduler:
+    def __init__(self, limiter=inference_limiter, name="ocr", queue_factor=OCR_QUEUE_FACTOR, queue_min=OCR_QUEUE_MIN, budget=memory_budget,
+                 runner=run_in_worker):
+        self.name = name
+        self.runner = runner
+        self.limiter = limiter
+        self.budget = budget
+        self.queue_factor = queue_factor
+        self.queue_min = queue_min
+        self._running = 0
+        # priority -> OrderedDict(tenant -> deque[_Job])
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._queued = 0
+        # 单个任务执行耗时的 EWMA，用于估算 Retry-After
+        self._job_seconds = None
+        _queue_depth.set_function(lambda: self._queued, scheduler=name)
+        _in_flight.set_function(lambda: self._running, scheduler=name)
+
+    @property
+    def queue_depth(self):
+        return self._queued
+
+    @property
+    def in_flight(self):
+        return self._running
+
+    @property
+    def job_seconds(self):
+        return self._job_seconds
+
+    def max_queue(self, priority=PRIORITY_NORMAL):
+        return max(self.queue_min, self.limiter.limit * self.queue_factor) * _QUEUE_SCALE.get(priority, 1.0)
+
+    def estimated_wait(self):
+        """按当前排队与执行中的任务数估算新请求的等待秒数"""
+        per_job = self._job_seconds or 1.0
+        return (self._queued + self._running) * per_job / max(1, self.limiter.limit)
+
+    def accepting(self, priority=PRIORITY_NORMAL):
+        """该优先级的新请求此刻是否会被接收（不会因排队已满返回 503）"""
+        return self._queued < self.max_queue(priority)
+
+    def capacity(self):
+        """当前负载快照，供 /capacity 与上游负载均衡使用"""
+        return {
+            "queueDepth": self._queued,
+            "inFlight": self._running,
+            "concurrencyLimit": self.limiter.limit,
+            "maxQueue": int(self.max_queue(PRIORITY_NORMAL)),
+            "latencyEwmaSeconds": self._job_seconds,
+            "estimatedBacklogSeconds": self.estimated_wait(),
+            "acceptingByPriority": {priority: self.accepting(priority) for priority in PRIORITIES},
+        }
+
+    def _reject(self, reason, priority):
+        _rejected.inc(reason=reason, priority=priority, scheduler=self.name)
+
+    async def submit(self, func, *args, priority=PRIORITY_NORMAL, tenant=DEFAULT_TENANT, deadline=None, cancel_token=None, cost=0, **kwargs):
+        """提交任务并等待结果；deadline 为 time.monotonic() 时间点，cost 为预估峰值内存（字节）。
+
+        内存预算不足时队首任务等待其他任务释放预算后再开始；cost 超过整个预算时抛出 RequestTooLarge。
+
+        传入 cancel_token 时会同时以 cancel_token 关键字参数转交给 func：取消时排队中的任务直接出队，
+        执行中的任务由 func 在阶段边界检查 token 后放弃。超过截止时间同样会取消 token。
+        """
+        if priority not in self._queues:
+            priority = PRIORITY_NORMAL
+        if cancel_token is None:
+            cancel_token = CancelToken()
+        else:
+            kwargs["cancel_token"] = cancel_token
+        loop = asyncio.get_running_loop()
+        self.budget.check(cost)
+        job = _Job(func, args, kwargs, priority, tenant or DEFAULT_TENANT, deadline, loop.create_future(), cancel_token, cost)
+        if job.expired():
+            self._reject(REJECT_DEADLINE, priority)
+            raise DeadlineExceeded()
+        if self._queued >= self.max_queue(priority):
+            self._reject(REJECT_OVERLOAD, priority)
+            raise Overloaded(retry_after=self.estimated_wait())
+        self._enqueue(job)
+        cancel_token.on_cancel(lambda: self._on_cancel(job))
+        self._dispatch()
+
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            # shield：超时/取消只放弃等待，执行中的任务由 token 通知其尽快结束
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            if job.future.done() and not job.future.cancelled():
+                return job.future.result()
+            cancel_token.cancel(CANCEL_DEADLINE)
+            self._reject(REJECT_DEADLINE, priority)
+            raise DeadlineExceeded()
+        except asyncio.CancelledError:
+            if cancel_token.cancelled and cancel_token.reason == CANCEL_DISCONNECT:
+                raise RequestCancelled(cancel_token.reason)
+            # 等待方自身被取消（如服务关闭），同样通知任务放弃
+            cancel_token.cancel(CANCEL_DISCONNECT)
+            raise
+
+    def _on_cancel(self, job):
+        if job.future.done():
+            return
+        reason = job.cancel_token.reason
+        if job.started_at is None:
+            self._remove(job)
+            record_cancelled(reason, "queued")
+            record_saved(self._job_seconds or 0.0)
+        else:
+            record_cancelled(reason, "running")
+        job.future.cancel()
+
+    def _remove(self, job):
+        tenants = self._queues[job.priority]
+        queue = tenants.get(job.tenant)
+        if queue is None:
+            return
+        try:
+            queue.remove(job)
+        except ValueError:
+            return
+        self._queued -= 1
+        if not queue:
+            del tenants[job.tenant]
+
+    def _enqueue(self, job):
+        tenants = self._queues[job.priority]
+        queue = tenants.get(job.tenant)
+        if queue is None:
+            queue = tenants[job.tenant] = deque()
+        queue.append(job)
+        self._queued += 1
+
+    def _peek_next(self):
+        for priority in PRIORITIES:
+            tenants = self._queues[priority]
+            if tenants:
+                queue = next(iter(tenants.values()))
+                return queue[0]
+        return None
+
+    def _pop(self, job):
+        tenants = self._queues[job.priority]
+        queue = tenants.pop(job.tenant)
+        queue.popleft()
+        self._queued -= 1
+        # 轮询：该租户移到队尾，空队列直接移除
+        if queue:
+            tenants[job.tenant] = queue
+
+    def _dispatch(self):
+        while self._running < self.limiter.limit:
+            job = self._peek_next()
+            if job is None:
+                return
+            if job.future.done():
+                self._pop(job)
+                continue
+            if job.expired():
+                self._pop(job)
+                self._reject(REJECT_DEADLINE, job.priority)
+                job.future.set_exception(DeadlineExceeded())
+                continue
+            # 内存预算不足时队首等待，保持优先级顺序，由执行中的任务结束后再次调度
+            if not self.budget.try_reserve(job.cost):
+                return
+            self._pop(job)
+            self._running += 1
+            asyncio.ensure_future(self._run(job))
+
+    async def _run(self, job):
+        start = job.started_at = time.monotonic()
+        _queue_wait.observe(start - job.enqueued_at, scheduler=self.name)
+        job.context.run(record_stage, "queue", start - job.enqueued_at)
+        try:
+            result = await self.runner(job.context.run, job.func, *job.args, **job.kwargs)
+            if not job.future.done():
+                job.future.set_result(result)
+            else:
+                # 结果已无人接收
+                record_wasted(time.monotonic() - start)
+        except RequestCancelled:
+            elapsed = time.monotonic() - start
+            record_wasted(elapsed)
+            record_saved((self._job_seconds or elapsed) - elapsed)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self.budget.release(job.cost)
+            elapsed = time.monotonic() - start
+            self._job_seconds = elapsed if self._job_seconds is None else self._job_seconds + 0.2 * (elapsed - self._job_seconds)
+            self._running -= 1
+            self._dispatch()
+
+
+ocr_scheduler = OcrScheduler()
@@ -0,0 +1,149 @@
+"""API 进程与推理工作进程之间的共享内存图像槽
+
+- API 进程创建一块共享内存并按固定大小切分为若干槽；推理前把图像写入一个空闲槽，Pipe 中只传槽号、形状与类型，
+  工作进程在同一块内存上构造 NumPy 视图直接推理，图像字节不经过 pickle
+- 槽的生命周期显式管理：借出时记录持有的请求 ID 与时间，工作进程回复后归还；
+  工作进程超时或崩溃时由调用方在进程结束后才归还，避免槽被复用时仍有进程在读
+- 泄漏检测：租约对象未归还就被回收时记录错误并收回槽；借出超过 leak_after 秒的槽记录告警；关闭时报告仍未归还的槽
+- 工作进程通过 spawn 继承 API 进程的 resource_tracker，API 进程异常退出时共享内存同样会被删除
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.utils.log_utils import request_id_var
+from app.utils.metrics import REGISTRY
+
+
+logger = logging.getLogger("paddleocr_app")
+
+_SHM_DIR = "/dev/shm"
+
+_slots = REGISTRY.gauge("ocr_shm_slots", "Shared-memory image slots, by state")
+_leaked = REGISTRY.counter("ocr_shm_leaked_total", "Shared-memory slot leases detected as leaked, by kind")
+
+
+def shm_available_bytes():
+    """/dev/shm 的剩余空间；无法获取时返回 None"""
+    try:
+        stat = os.statvfs(_SHM_DIR)
+    except OSError:
+        return None
+    return stat.f_bavail * stat.f_frsize
+
+
+class SlotLease:
+    """一个已借出的槽；release 可重复调用"""
+
+    def __init__(self, ring, index):
+        self.ring = ring
+        self.index = index
+        self.owner = request_id_var.get()
+        self.acquired_at = time.monotonic()
+        # 租约对象未 release 就被回收时收回槽；回调不引用租约本身
+        self._finalizer = weakref.finalize(self, ring._reclaim, index, self.owner)
+
+    def write(self, image):
+        """把图像拷入槽中，返回工作进程重建视图所需的 (槽号, 形状, 类型)"""
+        view = np.ndarray(image.shape, dtype=image.dtype, buffer=self.ring.buf, offset=self.index * self.ring.slot_bytes)
+        np.copyto(view, image)
+        del view
+        return self.index, image.shape, image.dtype.str
+
+    def release(self):
+        if self._finalizer.detach() is not None:
+            self.ring._release(self.index)
+
+
+class SlotRing:
+    def __init__(self, slot_count, slot_bytes, leak_after):
+        self.slot_count = slot_count
+        self.slot_bytes = slot_bytes
+        self.leak_after = leak_after
+        # tmpfs 按页惰性分配，未使用的槽不占内存
+        self._shm = shared_memory.SharedMemory(create=True, size=slot_count * slot_bytes)
+        self.name = self._shm.name
+        self.buf = self._shm.buf
+        self._free = queue.Queue()
+        for index in range(slot_count):
+            self._free.put(index)
+        # 槽号 -> [借出时间, 持有的请求 ID, 是否已告警]
+        self._leased = {}
+        self._lock = threading.Lock()
+        _slots.set_function(lambda: self._free.qsize(), state="free")
+        _slots.set_function(lambda: len(self._leased), state="leased")
+
+    def acquire(self, nbytes):
+        """借出一个槽；图像放不下或没有空闲槽时返回 None，由调用方改用 Pipe 传输"""
+        if nbytes > self.slot_bytes:
+            return None
+        self.check_leaks()
+        try:
+            index = self._free.get_nowait()
+        except queue.Empty:
+            return None
+        lease = SlotLease(self, index)
+        with self._lock:
+            self._leased[index] = [lease.acquired_at, lease.owner, False]
+        return lease
+
+    def _release(self, index):
+        with self._lock:
+            if self._leased.pop(index, None) is None:
+                return
+        self._free.put(index)
+
+    def _reclaim(self, index, owner):
+        _leaked.inc(kind="unreleased")
+        logger.error(f"共享内存槽 {index} 未归还即被回收（请求 {owner}），已收回")
+        self._release(index)
+
+    def check_leaks(self):
+        """借出超过 leak_after 秒的槽各告警一次（不收回：可能仍有工作进程在读）"""
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            for index, entry in self._leased.items():
+                if not entry[2] and now - entry[0] > self.leak_after:
+                    entry[2] = True
+                    stale.append((index, entry[1], now - entry[0]))
+        for index, owner, held in stale:
+            _leaked.inc(kind="stale")
+            logger.warning(f"共享内存槽 {index} 已借出 {held:.0f}s 仍未归还（请求 {owner}），疑似泄漏")
+
+    def close(self):
+        now = time.monotonic()
+        with self._lock:
+            outstanding = list(self._leased.items())
+        for index, (acquired_at, owner, _) in outstanding:
+            logger.warning(f"关闭时共享内存槽 {index} 仍未归还（请求 {owner}，已借出 {now - acquired_at:.0f}s）")
+        self.buf = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # 仍有基于该内存的视图，映射随进程退出释放
+            pass
+        self._shm.unlink()
+
+
+class SlotReader:
+    """工作进程一侧：按名称附加到同一块共享内存，为槽中的图像构造视图（不拷贝）"""
+
+    def __init__(self, name, slot_bytes):
+        self._shm = shared_memory.SharedMemory(name=name)
+        self.slot_bytes = slot_bytes
+
+    def view(self, index, shape, dtype):
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=self._shm.buf, offset=index * self.slot_bytes)
+
+    def close(self):
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
@@ -0,0 +1,270 @@
+"""WebSocket 流式识别：同一文档的连续帧只在内容变化时重新识别
+
+- 每个会话保存上一次识别的帧的灰度缩略图、尺寸与识别结果
+- 新帧先在缩略图上与上一次识别的帧比较（扣除整体亮度变化），没有变化的帧直接返回 unchanged，不推理
+- 变化集中在局部时只裁剪变化区域重新识别，区域扩展到与之相交的原有文本框，结果合并回上一次的结果；
+  变化面积过大、尺寸变化或整图方向预处理生效时整帧重新识别
+- 推理跟不上来帧速度时只保留最新的一帧（LatestFrame），中间的帧被合并丢弃
+"""
+import asyncio
+import logging
+import math
+
+import cv2
+import numpy as np
+
+from app.config import OCR_STREAM_THUMB_SIDE, OCR_STREAM_DIFF_THRESHOLD, OCR_STREAM_MAX_REGION_RATIO
+from app.services.cancellation import CancelToken, raise_if_cancelled
+from app.services.concurrency import inference_limiter
+from app.services.ocr_service import InvalidImageError, _predict
+from app.utils.image_utils import decode_image_bytes
+from app.utils.layout_utils import order_items
+from app.utils.metrics import REGISTRY
+from app.utils.predict_utils import build_items_from_predict_results, build_structured_response
+
+
+logger = logging.getLogger("paddleocr_app")
+
+STATUS_UNCHANGED = "unchanged"
+STATUS_FULL = "full"
+STATUS_PARTIAL = "partial"
+
+_frames = REGISTRY.counter("ocr_stream_frames_total", "Frames received on streaming sessions, by outcome")
+_sessions = REGISTRY.gauge("ocr_stream_sessions", "Open streaming OCR sessions")
+_reocr_ratio = REGISTRY.summary("ocr_stream_reocr_area_ratio", "Fraction of the frame area re-recognized for changed frames")
+
+
+def record_frame(outcome):
+    _frames.inc(result=outcome)
+
+
+class LatestFrame:
+    """只保留最新一帧的信箱：处理跟不上时新帧覆盖尚未处理的旧帧"""
+
+    def __init__(self):
+        self._frame = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.coalesced = 0
+
+    def put(self, message):
+        self.received += 1
+        if self._frame is not None:
+            self.coalesced += 1
+            record_frame("coalesced")
+        self._frame = (self.received, message)
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def take(self):
+        """返回 (帧序号, 消息)；会话关闭后返回 None"""
+        while self._frame is None:
+            if self._closed:
+                return None
+            await self._event.wait()
+            self._event.clear()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+class FramePlan:
+    def __init__(self, status, image=None, thumb=None, regions=()):
+        self.status = status
+        self.image = image
+        self.thumb = thumb
+        self.regions = list(regions)
+
+
+def _thumbnail(image, side):
+    height, width = image.shape[:2]
+    scale = side / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    thumb = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGRA2GRAY if thumb.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    return thumb
+
+
+def _bbox_rect(box):
+    xs = [point[0] for point in box]
+    ys = [point[1] for point in box]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(a, b):
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def _merge_rects(rects):
+    """合并相交的矩形，直到两两不相交"""
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for rect in rects:
+            for i, other in enumerate(result):
+                if _intersects(rect, other):
+                    result[i] = _union(rect, other)
+                    merged = True
+                    break
+            else:
+                result.append(rect)
+        rects = result
+    return rects
+
+
+class StreamSession:
+    def __init__(self, lang=None, thumb_side=OCR_STREAM_THUMB_SIDE, diff_threshold=OCR_STREAM_DIFF_THRESHOLD,
+                 max_region_ratio=OCR_STREAM_MAX_REGION_RATIO):
+        self.lang = lang
+        self.thumb_side = thumb_side
+        self.diff_threshold = diff_threshold
+        self.max_region_ratio = max_region_ratio
+        self.thumb = None
+        self.size = None
+        self.items = []
+        self.angle = 0
+        # 整图方向预处理生效时多边形在旋转后的画布上，无法与原帧的区域对应，之后的变化都整帧识别
+        self.pre_angle = 0
+        self._cancel_token = None
+        _sessions.inc()
+
+    def new_token(self):
+        self._cancel_token = CancelToken()
+        return self._cancel_token
+
+    def close(self):
+        if self._cancel_token is not None:
+            self._cancel_token.cancel()
+        _sessions.dec()
+
+    def analyze(self, contents, decoder=decode_image_bytes, cancel_token=None):
+        """解码并与上一次识别的帧比较，返回 FramePlan（工作线程中执行，不修改会话状态）"""
+        raise_if_cancelled(cancel_token, "decode")
+        try:
+            image = decoder(contents)
+        except Exception as e:
+            raise InvalidImageError("Invalid image file") from e
+        if image is None:
+            raise InvalidImageError("Invalid image file")
+        height, width = image.shape[:2]
+        thumb = _thumbnail(image, self.thumb_side)
+        if self.thumb is None or self.size != (width, height) or self.thumb.shape != thumb.shape:
+            return FramePlan(STATUS_FULL, image, thumb)
+
+        diff = thumb.astype(np.int16) - self.thumb.astype(np.int16)
+        # 扣除整体亮度变化（相机自动曝光）
+        diff -= int(np.median(diff))
+        mask = (np.abs(diff) > self.diff_threshold).astype(np.uint8)
+        if not mask.any():
+            return FramePlan(STATUS_UNCHANGED)
+        if self.pre_angle != 0:
+            return FramePlan(STATUS_FULL, image, thumb)
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(cv2.dilate(mask, np.ones((3, 3), np.uint8)))
+        scale_x = width / thumb.shape[1]
+        scale_y = height / thumb.shape[0]
+        rects = []
+        for x, y, w, h, _ in stats[1:count]:
+            rects.append((
+                max(0, math.floor((x - 1) * scale_x)),
+                max(0, math.floor((y - 1) * scale_y)),
+                min(width, math.ceil((x + w + 1) * scale_x)),
+                min(height, math.ceil((y + h + 1) * scale_y)),
+            ))
+        # 扩展到与之相交的原有文本框，整行重新识别，避免半行文字
+        item_rects = [_bbox_rect(item["bbox"]) for item in self.items]
+        for _ in range(3):
+            expanded = []
+            for rect in _merge_rects(rects):
+                for item_rect in item_rects:
+                    if _intersects(rect, item_rect):
+                        rect = _union(rect, item_rect)
+                expanded.append((max(0, rect[0]), max(0, rect[1]), min(width, rect[2]), min(height, rect[3])))
+            if expanded == rects:
+                break
+            rects = expanded
+        rects = _merge_rects(rects)
+
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+        if area > self.max_region_ratio * width * height:
+            return FramePlan(STATUS_FULL, image, thumb)
+        return FramePlan(STATUS_PARTIAL, image, thumb, rects)
+
+    def recognize(self, plan, cancel_token=None):
+        """按 FramePlan 推理并更新会话状态，返回响应（调度器中执行）"""
+        if plan.status == STATUS_PARTIAL:
+            items = self._recognize_regions(plan, cancel_token)
+            if items is None:
+                plan.status = STATUS_FULL
+        if plan.status == STATUS_FULL:
+            items = self._recognize_full(plan, cancel_token)
+        height, width = plan.image.shape[:2]
+        if plan.status == STATUS_PARTIAL:
+            _reocr_ratio.observe(sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in plan.regions) / float(width * height))
+        else:
+            _reocr_ratio.observe(1.0)
+        record_frame(plan.status)
+
+        self.items = items
+        self.thumb = plan.thumb
+        self.size = (width, height)
+        return self.response(plan.status, plan.regions)
+
+    def _recognize_full(self, plan, cancel_token):
+        image = plan.image
+        height, width = image.shape[:2]
+        with inference_limiter.measure(height * width):
+            raise_if_cancelled(cancel_token, "predict")
+            result = _predict(image, self.lang)
+        items, rotation_angle, pre_angle = build_items_from_predict_results(result)
+        del result
+        self.pre_angle = pre_angle
+        self.angle = pre_angle if pre_angle != 0 else rotation_angle
+        plan.regions = []
+        return items
+
+    def _recognize_regions(self, plan, cancel_token):
+        """只识别变化区域并合并；裁剪图触发整图方向预处理时返回 None，由调用方整帧识别"""
+        fresh = []
+        for x0, y0, x1, y1 in plan.regions:
+            crop = np.ascontiguousarray(plan.image[y0:y1, x0:x1])
+            with inference_limiter.measure(crop.shape[0] * crop.shape[1]):
+                raise_if_cancelled(cancel_token, "predict")
+                result = _predict(crop, self.lang)
+            items, _, pre_angle = build_items_from_predict_results(result)
+            del result
+            if pre_angle != 0:
+                return None
+            for item in items:
+                item["bbox"] = [[x + x0, y + y0] for x, y in item["bbox"]]
+                fresh.append(item)
+
+        def inside_region(item):
+            x_min, y_min, x_max, y_max = _bbox_rect(item["bbox"])
+            cx, cy = (x_min + x_max) / 2, (y_min + y_max) / 2
+            return any(x0 <= cx < x1 and y0 <= cy < y1 for x0, y0, x1, y1 in plan.regions)
+
+        kept = [item for item in self.items if not inside_region(item)]
+        # 合并后重新计算阅读顺序与行、块序号
+        return order_items(kept + fresh, angle=self.angle)
+
+    def response(self, status, regions=()):
+        width, height = self.size
+        if self.pre_angle % 180 == 90:
+            # 多边形在旋转后的画布上
+            width, height = height, width
+        structured = build_structured_response(self.items, image_width=width, image_height=height, angle=self.angle)
+        structured["Status"] = status
+        if status == STATUS_PARTIAL:
+            structured["Regions"] = [[int(x0), int(y0), int(x1), int(y1)] for x0, y0, x1, y1 in regions]
+        return structured
@@ -0,0 +1,143 @@
+"""版面 / 表格解析（PPStructureV3）
+
+- 引擎在首次请求时加载，不增加服务启动时间与常驻内存
+- 使用独立的线程池、固定并发上限、排队与内存预算：耗时长的结构化任务不会挤占 /ocr_simple/* 的推理
+- 响应附带各阶段耗时（排队、解码、推理、整理结果）
+"""
+import logging
+import threading
+import time
+
+from paddleocr import PPStructureV3
+
+from app.config import (
+    OCR_STRUCTURE_CONCURRENCY,
+    OCR_STRUCTURE_QUEUE_MIN,
+    OCR_STRUCTURE_MEMORY_BUDGET_MB,
+)
+from app.services.cancellation import raise_if_cancelled
+from app.services.concurrency import FixedLimiter
+from app.services.executor import run_in_structure_worker
+from app.services.memory import MemoryBudget, estimate_request_bytes
+from app.services.ocr_service import InvalidImageError
+from app.services.scheduler import OcrScheduler
+from app.utils.geom_utils import ensure_quad_points
+from app.utils.image_utils import decode_image_bytes
+from app.utils.log_utils import record_stage
+from app.utils.metrics import REGISTRY
+from app.utils.predict_utils import _build_image_info, _result_data
+from app.utils.response_utils import convert_numpy_to_list
+
+
+logger = logging.getLogger("paddleocr_app")
+
+# 版面模型、表格模型与多份中间结果，峰值内存约为普通 OCR 的数倍
+_STRUCTURE_MEMORY_FACTOR = 3
+
+_stage_seconds = REGISTRY.summary("ocr_structure_stage_seconds", "Time spent in each stage of the structure pipeline")
+
+structure_ocr = None
+_structure_lock = threading.Lock()
+# PPStructureV3 实例非线程安全
+_structure_predict_lock = threading.Lock()
+
+structure_scheduler = OcrScheduler(
+    limiter=FixedLimiter(OCR_STRUCTURE_CONCURRENCY),
+    name="structure",
+    queue_min=OCR_STRUCTURE_QUEUE_MIN,
+    budget=MemoryBudget(OCR_STRUCTURE_MEMORY_BUDGET_MB * 1024 * 1024, name="structure"),
+    runner=run_in_structure_worker,
+)
+
+
+def get_structure_ocr():
+    """首次使用时构建 PPStructureV3"""
+    global structure_ocr
+    if structure_ocr is None:
+        with _structure_lock:
+            if structure_ocr is None:
+                logger.info("加载 PPStructureV3 ...")
+                started = time.monotonic()
+                structure_ocr = PPStructureV3(
+                    device="gpu",
+                    use_chart_recognition=True,
+                )
+                logger.info(f"PPStructureV3 已就绪，耗时 {time.monotonic() - started:.1f}s")
+    return structure_ocr
+
+
+def estimate_structure_bytes(contents):
+    return estimate_request_bytes(contents) * _STRUCTURE_MEMORY_FACTOR
+
+
+def _build_page(result, include_markdown=False):
+    data = _result_data(result)
+    blocks = []
+    for block in data.get("parsing_res_list") or []:
+        blocks.append({
+            "Label": block.get("block_label", ""),
+            "Position": ensure_quad_points(block.get("block_bbox")) or [],
+            "Content": block.get("block_content", ""),
+        })
+    tables = []
+    for table in data.get("table_res_list") or []:
+        # 表格位置见 Blocks 中 Label 为 table 的块
+        tables.append({
+            "RegionId": table.get("table_region_id"),
+            "Html": table.get("pred_html", ""),
+        })
+    page = {"Blocks": blocks, "Tables": tables}
+    if include_markdown:
+        markdown = getattr(result, "markdown", None) or {}
+        page["Markdown"] = markdown.get("markdown_texts", "") if isinstance(markdown, dict) else ""
+    return page
+
+
+def process_structure_bytes(contents, include_markdown=False, submitted_at=None, cancel_token=None):
+    """解码 + 版面解析；submitted_at 为提交到调度器时的 time.monotonic()，用于计算排队耗时"""
+    timings = {}
+    started = time.monotonic()
+    if submitted_at is not None:
+        timings["queue"] = started - submitted_at
+
+    raise_if_cancelled(cancel_token, "decode")
+    stage = time.monotonic()
+    try:
+        image = decode_image_bytes(contents)
+    except Exception as e:
+        raise InvalidImageError("Invalid image file") from e
+    if image is None:
+        raise InvalidImageError("Invalid image file")
+    height, width = image.shape[:2]
+    timings["decode"] = time.monotonic() - stage
+
+    # 首次请求时加载引擎，加载耗时单独计入
+    stage = time.monotonic()
+    engine = get_structure_ocr()
+    timings["load"] = time.monotonic() - stage
+
+    raise_if_cancelled(cancel_token, "predict")
+    stage = time.monotonic()
+    with _structure_predict_lock:
+        results = list(engine.predict(image))
+    del image
+    timings["predict"] = time.monotonic() - stage
+
+    raise_if_cancelled(cancel_token, "postprocess")
+    stage = time.monotonic()
+    pages = [_build_page(result, include_markdown=include_markdown) for result in results]
+    del results
+    structured = convert_numpy_to_list({
+        "StructureInfo": pages,
+        "ImageInfo": [_build_image_info(width, height)],
+    })
+    timings["postprocess"] = time.monotonic() - stage
+    timings["total"] = time.monotonic() - (submitted_at if submitted_at is not None else started)
+
+    for name, seconds in timings.items():
+        _stage_seconds.observe(seconds, stage=name)
+        if name not in ("queue", "total"):
+            # 排队耗时由调度器记录，总耗时即访问日志的 duration_ms
+            record_stage(name, seconds)
+    structured["Timings"] = {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+    return structured
@@ -0,0 +1,138 @@
+"""按尺寸分级复用的 NumPy 缓冲池
+
+旋转画布、缩放输出等多 MB 的临时数组在请求之间复用，减少大块内存的反复分配与缺页，
+避免高并发下分配器碎片导致 RSS 持续上涨。
+
+- 尺寸按 2 的幂再四等分分级（最多浪费 25%），同一级别的缓冲可互相复用
+- 池中保留的总字节数不超过上限，超出时先淘汰最久未使用级别的缓冲
+- 通过 lease() 在一个请求内借用，退出 with 块时统一归还；借出的数组不得在 with 块之外继续使用
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.config import OCR_BUFFER_POOL_MB
+from app.utils.metrics import REGISTRY
+
+
+_MIN_CLASS_BYTES = 64 * 1024
+
+_requests = REGISTRY.counter("ocr_buffer_pool_requests_total", "Buffer pool acquisitions by result (hit or miss)")
+_evicted = REGISTRY.counter("ocr_buffer_pool_evicted_bytes_total", "Bytes dropped from the buffer pool to stay within its limit")
+_retained_bytes = REGISTRY.gauge("ocr_buffer_pool_retained_bytes", "Bytes currently retained by the buffer pool")
+_limit_bytes = REGISTRY.gauge("ocr_buffer_pool_limit_bytes", "Maximum bytes the buffer pool may retain")
+
+
+def size_class(nbytes):
+    """向上取整到所属级别的字节数"""
+    nbytes = max(int(nbytes), _MIN_CLASS_BYTES)
+    step = 1 << max(0, nbytes.bit_length() - 3)
+    return (nbytes + step - 1) // step * step
+
+
+class BufferPool:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._free = OrderedDict()   # 级别 -> 空闲缓冲列表，按最近使用排序
+        self._retained = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+        _retained_bytes.set_function(lambda: self._retained)
+        _limit_bytes.set(max_bytes)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @property
+    def hit_rate(self):
+        total = self._hits + self._misses
+        return self._hits / total if total else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self.hit_rate,
+                "retained_bytes": self._retained,
+                "max_bytes": self.max_bytes,
+                "classes": {cls: len(buffers) for cls, buffers in self._free.items()},
+            }
+
+    def acquire(self, nbytes):
+        """借出一块不小于 nbytes 的一维 uint8 缓冲"""
+        cls = size_class(nbytes)
+        with self._lock:
+            buffers = self._free.get(cls)
+            if buffers:
+                buffer = buffers.pop()
+                self._retained -= cls
+                self._free.move_to_end(cls)
+                self._hits += 1
+                hit = True
+            else:
+                buffer = None
+                self._misses += 1
+                hit = False
+        _requests.inc(result="hit" if hit else "miss")
+        if buffer is None:
+            buffer = np.empty(cls, dtype=np.uint8)
+        return buffer
+
+    def release(self, buffer):
+        cls = buffer.nbytes
+        if cls > self.max_bytes:
+            return
+        with self._lock:
+            # 超出上限时从最久未使用的级别开始淘汰
+            evicted = 0
+            while self._retained + cls > self.max_bytes and self._free:
+                oldest_cls, buffers = next(iter(self._free.items()))
+                buffers.pop()
+                self._retained -= oldest_cls
+                evicted += oldest_cls
+                if not buffers:
+                    del self._free[oldest_cls]
+            self._free.setdefault(cls, []).append(buffer)
+            self._free.move_to_end(cls)
+            self._retained += cls
+        if evicted:
+            _evicted.inc(evicted)
+
+    @contextmanager
+    def lease(self):
+        lease = BufferLease(self)
+        try:
+            yield lease
+        finally:
+            lease.close()
+
+
+class BufferLease:
+    """一个请求内借用的缓冲，close 时全部归还"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._buffers = []
+
+    def empty(self, shape, dtype=np.uint8):
+        """与 np.empty 相同的用法，内存来自缓冲池；缓冲池关闭时直接 np.empty"""
+        if not self._pool.enabled:
+            return np.empty(shape, dtype=dtype)
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        buffer = self._pool.acquire(nbytes)
+        self._buffers.append(buffer)
+        return buffer[:nbytes].view(dtype).reshape(shape)
+
+    def close(self):
+        buffers, self._buffers = self._buffers, []
+        for buffer in buffers:
+            self._pool.release(buffer)
+
+
+buffer_pool = BufferPool(OCR_BUFFER_POOL_MB * 1024 * 1024)
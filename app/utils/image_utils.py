@@ -1,33 +1,127 @@
 import base64
 import math
+import mmap
 from io import BytesIO
 from PIL import Image
 import cv2
 import numpy as np
 
+IMAGE_FORMAT_JPEG = "jpeg"
+IMAGE_FORMAT_WEBP = "webp"
+IMAGE_FORMAT_PNG = "png"
+
+_IMAGE_EXTENSIONS = {
+    IMAGE_FORMAT_JPEG: ".jpg",
+    IMAGE_FORMAT_WEBP: ".webp",
+    IMAGE_FORMAT_PNG: ".png",
+}
+
+
 def base64_to_image(base64_string):
-    image_data = base64.b64decode(base64_string)
-    image = Image.open(BytesIO(image_data))
-    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    return bytes_to_image(base64.b64decode(base64_string))
+
+
+def bytes_to_image(image_data):
+    # 优先用 OpenCV 直接解码为 BGR（忽略 EXIF 方向，与 PIL 行为一致），少一次整图拷贝与颜色转换
+    image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is not None:
+        return image
+    # OpenCV 不支持的格式回退到 PIL
+    pil_image = Image.open(BytesIO(image_data))
+    if pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+    image = np.array(pil_image)
+    del pil_image
+    # 原地转换通道顺序，不再额外分配一份图像
+    return cv2.cvtColor(image, cv2.COLOR_RGB2BGR, dst=image)
+
+
+def probe_image_size(image_data):
+    """只读取图片头部获取 (宽, 高)，不解码像素；无法识别时返回 None"""
+    try:
+        with Image.open(BytesIO(image_data)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def probe_image_file_size(path):
+    """同 probe_image_size，直接读取文件头部"""
+    try:
+        with Image.open(path) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def map_image_file(path):
+    """只读映射整个文件，返回可直接交给 decode_image_bytes 的 mmap 对象（用完后调用 close）。
+
+    解码直接读取页缓存，不把文件复制到堆上；空文件无法映射，抛出 ValueError。
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return mapped
+
+
+def decode_image_bytes(contents):
+    return cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+
+
+def sniff_image_format(data):
+    """根据文件头识别图片格式，无法识别时返回 None"""
+    if data[:3] == b"\xff\xd8\xff":
+        return IMAGE_FORMAT_JPEG
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return IMAGE_FORMAT_PNG
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return IMAGE_FORMAT_WEBP
+    return None
+
+def gray_thumbnail(image, width, height):
+    """缩到 width×height 的灰度缩略图（uint8）；INTER_AREA 缩小只读一遍原图，不产生整图大小的中间数组"""
+    thumb = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGRA2GRAY if thumb.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    return thumb
+
+
+def difference_hash(image, hash_size=16):
+    """感知哈希（dHash）：缩到 (N+1)×N 灰度缩略图，比较水平相邻像素，返回 N×N 位的整数。
+
+    对重新编码、压缩与等比缩放不敏感；同一模板、只有字段内容不同的两张表单哈希也几乎相同，只能用来找候选。
+    """
+    thumb = gray_thumbnail(image, hash_size + 1, hash_size).astype(np.int16)
+    # 忽略 1 级以内的差异：空白区域的压缩噪声不翻转哈希位
+    bits = (thumb[:, 1:] - thumb[:, :-1] > 1).reshape(-1)
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
 
-def _rotate_image_keep_size(image, angle_deg):
+
+def _alloc_like(alloc, image, width, height):
+    """alloc(shape) 提供输出数组（如缓冲池），为 None 时由 OpenCV 自行分配"""
+    if alloc is None:
+        return None
+    return alloc((height, width) + image.shape[2:], image.dtype)
+
+
+def _rotate_image_keep_size(image, angle_deg, alloc=None):
     """根据预处理角度旋转图像，保持原尺寸（可能裁剪）"""
     height, width = image.shape[:2]
     center = (width // 2, height // 2)
     rotation_matrix = cv2.getRotationMatrix2D(center, angle_deg, 1.0)
     rotated_image = cv2.warpAffine(
-        image, rotation_matrix, (width, height),
+        image, rotation_matrix, (width, height), dst=_alloc_like(alloc, image, width, height),
         flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE, borderValue=(255, 255, 255)
     )
     return rotated_image
 
 
-def _rotate_image_resize(image, angle_deg):
-    """根据预处理角度旋转图像，确保完整显示不裁剪"""
-    if abs(angle_deg) < 0.1:  # 如果角度很小，直接返回原图
-        return image
-
-    height, width = image.shape[:2]
+def rotated_canvas_size(width, height, angle_deg):
+    """_rotate_image_resize 旋转后的画布尺寸 (宽, 高)；只需要尺寸时不必旋转像素"""
+    if abs(angle_deg) < 0.1:
+        return width, height
 
     # 标准化角度到 0-360 范围
     angle_normalized = angle_deg % 360
@@ -45,6 +139,16 @@ def _rotate_image_resize(image, angle_deg):
         sin_a = abs(math.sin(math.radians(angle_deg)))
         new_width = int(width * cos_a + height * sin_a)
         new_height = int(height * cos_a + width * sin_a)
+    return new_width, new_height
+
+
+def _rotate_image_resize(image, angle_deg, alloc=None):
+    """根据预处理角度旋转图像，确保完整显示不裁剪"""
+    if abs(angle_deg) < 0.1:  # 如果角度很小，直接返回原图
+        return image
+
+    height, width = image.shape[:2]
+    new_width, new_height = rotated_canvas_size(width, height, angle_deg)
 
     # 计算旋转矩阵
     center = (width // 2, height // 2)
@@ -59,6 +163,7 @@ def _rotate_image_resize(image, angle_deg):
         image,
         rotation_matrix,
         (new_width, new_height),
+        dst=_alloc_like(alloc, image, new_width, new_height),
         flags=cv2.INTER_CUBIC,
         borderMode=cv2.BORDER_CONSTANT,
         borderValue=(255, 255, 255)  # 白色背景
@@ -68,11 +173,49 @@ def _rotate_image_resize(image, angle_deg):
     return rotated_image
 
 
-def image_to_base64(image):
+def limit_image_side(image, max_side, alloc=None):
+    """按最长边等比缩小图像，max_side 为 0/None 或图像本身不超限时原样返回"""
+    if not max_side:
+        return image
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if longest <= max_side:
+        return image
+    scale = max_side / float(longest)
+    new_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(image, new_size, dst=_alloc_like(alloc, image, *new_size), interpolation=cv2.INTER_AREA)
+
+
+def encode_image(image, fmt=IMAGE_FORMAT_JPEG, quality=None, max_side=None):
+    """将 BGR 图像编码为指定格式的字节串；cv2.imencode 直接接受 BGR，无需颜色转换"""
+    buffer = _encode_to_buffer(image, fmt=fmt, quality=quality, max_side=max_side)
+    return buffer.tobytes() if buffer is not None else None
+
+
+def _encode_to_buffer(image, fmt=IMAGE_FORMAT_JPEG, quality=None, max_side=None, alloc=None):
+    image = limit_image_side(image, max_side, alloc=alloc)
+    params = []
+    if fmt == IMAGE_FORMAT_JPEG and quality is not None:
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    elif fmt == IMAGE_FORMAT_WEBP and quality is not None:
+        params = [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    elif fmt == IMAGE_FORMAT_PNG:
+        # PNG 无损，quality 映射为压缩级别：质量越高压缩越轻、编码越快
+        level = 3 if quality is None else int(round((100 - int(quality)) * 9 / 100))
+        params = [cv2.IMWRITE_PNG_COMPRESSION, min(9, max(0, level))]
+    ok, buffer = cv2.imencode(_IMAGE_EXTENSIONS[fmt], image, params)
+    if not ok:
+        return None
+    return buffer
+
+
+def image_to_base64(image, fmt=IMAGE_FORMAT_JPEG, quality=None, max_side=None, alloc=None):
     try:
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        _, buffer = cv2.imencode('.jpg', rgb_image)
-        return base64.b64encode(buffer).decode('utf-8')
+        # 直接对编码缓冲做 base64，省去一次 tobytes 拷贝
+        encoded = _encode_to_buffer(image, fmt=fmt, quality=quality, max_side=max_side, alloc=alloc)
+        if encoded is None:
+            return None
+        return base64.b64encode(encoded).decode('utf-8')
     except Exception:
         return None
 
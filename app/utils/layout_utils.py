@@ -0,0 +1,165 @@
+"""阅读顺序与行拼接
+
+- 对文本框做递归 XY 切分：每个区域内把框在 x / y 方向的投影区间按起点排序，用累积最大终点找出空隙，
+  在空隙最大的方向上切开（左右分栏优先于逐行），直到区域内没有可切的空隙；全部为 NumPy 排序与累积运算，O(n log n)
+- 左右空隙两侧的文字不在同一行上时视为分栏；两侧逐行对齐时再看宽度：两侧文字行都宽（相对行高与空隙）时仍是分栏
+  （排版的双栏页面基线通常对齐），较窄一侧是短标签或短数值（表单、票据的标签 / 值）时不分栏，按行切分后同一行的片段合为一行
+- 左右分栏与超过段落间距的上下空隙作为块（Block）边界，块内按框中心的纵向距离分行（Line），行内从左到右
+- 页面倾斜且未做方向矫正时，先把框按估算的角度转正再排序
+"""
+import math
+
+import numpy as np
+
+
+# 以下阈值均为框高中位数的倍数
+# 左右空隙不小于该值才视为分栏（小于时为同一行内相邻的文字片段）
+COLUMN_GAP = 1.0
+# 上下空隙不小于该值时视为段落（块）边界
+PARAGRAPH_GAP = 1.0
+# 同一区域内中心纵向距离超过该值时换行
+LINE_TOLERANCE = 0.5
+# 左右空隙较少一侧的框中，至少该比例能在另一侧找到同一行的框时视为逐行对齐
+_ALIGNED_ROWS = 0.5
+# 逐行对齐时，较窄一侧文字行宽度的中位数不小于该值（框高中位数的倍数）且不小于空隙的 _COLUMN_WIDTH_TO_GAP 倍才视为分栏
+_COLUMN_MIN_WIDTH = 8.0
+_COLUMN_WIDTH_TO_GAP = 3.0
+# 空隙不小于最大空隙的该比例时一并切开，均匀的行距一次切完，不必逐行递归
+_CUT_RATIO = 0.8
+
+
+def _projection_gaps(lo, hi):
+    """区间按起点排序后，每个区间起点与之前所有区间最远终点的距离；返回 (排序下标, 空隙)"""
+    order = np.argsort(lo, kind="stable")
+    reach = np.maximum.accumulate(hi[order])
+    return order, lo[order][1:] - reach[:-1]
+
+
+def _split(idx, order, gaps, threshold):
+    cuts = np.flatnonzero(gaps >= threshold) + 1
+    return np.split(idx[order], cuts), gaps[cuts - 1]
+
+
+def _rows_aligned(parts, cy, tolerance):
+    """左右相邻的两部分是否共享文本行（中心纵坐标相差不超过 tolerance 的框占较少一侧的多数）"""
+    for left, right in zip(parts, parts[1:]):
+        fewer, other = (left, right) if len(left) <= len(right) else (right, left)
+        other_cy = np.sort(cy[other])
+        pos = np.searchsorted(other_cy, cy[fewer])
+        below = other_cy[np.clip(pos, 0, len(other_cy) - 1)]
+        above = other_cy[np.clip(pos - 1, 0, len(other_cy) - 1)]
+        nearest = np.minimum(np.abs(below - cy[fewer]), np.abs(cy[fewer] - above))
+        if np.mean(nearest <= tolerance) >= _ALIGNED_ROWS:
+            return True
+    return False
+
+
+def _wide_columns(parts, part_gaps, widths, unit):
+    """每对相邻部分中较窄一侧的文字行（宽度中位数）都足够宽，相对行高与两侧空隙都像正文栏而不是标签 / 数值"""
+    for left, right, gap in zip(parts, parts[1:], part_gaps):
+        narrow = min(np.median(widths[left]), np.median(widths[right]))
+        if narrow < max(_COLUMN_MIN_WIDTH * unit, _COLUMN_WIDTH_TO_GAP * gap):
+            return False
+    return True
+
+
+def reading_order(quads, angle=0.0):
+    """计算阅读顺序。
+
+    quads 为 (N, 4, 2) 的四边形；返回 (order, lines, blocks)：order 为阅读顺序下的原始下标，
+    lines / blocks 为按阅读顺序排列的行号与块号（从 0 开始，随阅读顺序递增）。
+    """
+    quads = np.asarray(quads, dtype=np.float64).reshape(-1, 4, 2)
+    count = len(quads)
+    if count == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    xs, ys = quads[..., 0], quads[..., 1]
+    if abs(angle) > 1.0:
+        # 与方向矫正相同的旋转（-angle），在转正后的坐标系中排序
+        rad = math.radians(-angle)
+        cos_a, sin_a = math.cos(rad), math.sin(rad)
+        xs, ys = xs * cos_a - ys * sin_a, xs * sin_a + ys * cos_a
+    x0, x1 = xs.min(axis=1), xs.max(axis=1)
+    y0, y1 = ys.min(axis=1), ys.max(axis=1)
+    cy = (y0 + y1) / 2
+    widths = x1 - x0
+    unit = max(float(np.median(y1 - y0)), 1.0)
+    column_gap = COLUMN_GAP * unit
+    paragraph_gap = PARAGRAPH_GAP * unit
+    line_tolerance = LINE_TOLERANCE * unit
+
+    order = np.empty(count, dtype=np.int64)
+    lines = np.empty(count, dtype=np.int64)
+    blocks = np.empty(count, dtype=np.int64)
+    filled, line_id, block_id = 0, -1, -1
+    # 深度优先：(区域内的下标, 是否开始新块)；子区域逆序入栈，先处理上方 / 左侧
+    stack = [(np.arange(count), True)]
+    while stack:
+        idx, new_block = stack.pop()
+        if new_block:
+            block_id += 1
+        if len(idx) > 1:
+            x_order, x_gaps = _projection_gaps(x0[idx], x1[idx])
+            y_order, y_gaps = _projection_gaps(y0[idx], y1[idx])
+            x_max = x_gaps.max() if x_gaps.max() >= column_gap else 0.0
+            y_max = y_gaps.max() if y_gaps.max() > 0 else 0.0
+            parts = None
+            if x_max > 0 and x_max >= y_max:
+                parts, part_gaps = _split(idx, x_order, x_gaps, max(column_gap, x_max * _CUT_RATIO))
+                strong = np.ones(len(part_gaps), dtype=bool)
+                if _rows_aligned(parts, cy, line_tolerance) and not _wide_columns(parts, part_gaps, widths, unit):
+                    # 两侧逐行对齐且有一侧是短标签 / 数值：不是分栏，改为按行切分
+                    parts = None
+            if parts is None and y_max > 0:
+                parts, part_gaps = _split(idx, y_order, y_gaps, y_max * _CUT_RATIO)
+                strong = part_gaps >= paragraph_gap
+            if parts is not None:
+                for i in range(len(parts) - 1, 0, -1):
+                    stack.append((parts[i], bool(strong[i - 1])))
+                stack.append((parts[0], False))
+                continue
+
+        # 区域内不可再切：按中心纵坐标分行，行内按左边界排序
+        if len(idx) == 1:
+            leaf, leaf_lines = idx, np.zeros(1, dtype=np.int64)
+        else:
+            leaf = idx[np.argsort(cy[idx], kind="stable")]
+            leaf_lines = np.concatenate(([0], np.cumsum(np.diff(cy[leaf]) > line_tolerance)))
+            in_line = np.lexsort((x0[leaf], leaf_lines))
+            leaf, leaf_lines = leaf[in_line], leaf_lines[in_line]
+        end = filled + len(leaf)
+        order[filled:end] = leaf
+        lines[filled:end] = line_id + 1 + leaf_lines
+        blocks[filled:end] = block_id
+        line_id = int(lines[end - 1])
+        filled = end
+    return order, lines, blocks
+
+
+def order_items(items, angle=0.0):
+    """按阅读顺序重排文本项（带 bbox 的字典），并写入 line / block 序号；返回新的列表"""
+    if not items:
+        return []
+    order, lines, blocks = reading_order([item["bbox"] for item in items], angle=angle)
+    ordered = []
+    for index, line, block in zip(order.tolist(), lines.tolist(), blocks.tolist()):
+        item = items[index]
+        item["line"] = line
+        item["block"] = block
+        ordered.append(item)
+    return ordered
+
+
+def assemble_text(texts, lines):
+    """同一行内的片段以空格连接，每行以换行结尾"""
+    parts = []
+    previous = None
+    for text, line in zip(texts, lines):
+        if previous is not None:
+            parts.append(" " if line == previous else "\n")
+        parts.append(text)
+        previous = line
+    if parts:
+        parts.append("\n")
+    return "".join(parts)
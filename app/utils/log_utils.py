@@ -0,0 +1,55 @@
+"""非阻塞的结构化日志与请求阶段耗时
+
+- 日志管道（有界队列、后台线程输出、JSON 格式、按请求采样）由 log_pipeline 提供，网关共用同一实现；
+  这里接上丢弃与采样计数的指标
+- 输出为单行 JSON（OCR_LOG_FORMAT=text 时为原来的文本格式），带请求 ID 与各阶段耗时
+- INFO 及以下级别按 OCR_LOG_SAMPLE_RATE 采样：同一请求的日志按请求 ID 一起保留或丢弃；WARNING 及以上总是保留
+- uvicorn 的日志同样经由队列输出
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import log_pipeline
+from log_pipeline import LOG_FORMAT_JSON, request_id_var
+from app.utils.metrics import REGISTRY
+
+
+# 请求级的阶段耗时（秒），由中间件创建；工作线程通过复制的上下文写入同一个字典
+stage_timings_var = ContextVar("stage_timings", default=None)
+
+_dropped = REGISTRY.counter("ocr_log_dropped_total", "Log records dropped because the log queue was full")
+_sampled_out = REGISTRY.counter("ocr_log_sampled_out_total", "Log records skipped by success-log sampling")
+
+
+def record_stage(name, seconds):
+    """累加当前请求某个阶段的耗时；不在请求上下文中时忽略"""
+    timings = stage_timings_var.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def log_stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def stage_timings_ms():
+    timings = stage_timings_var.get() or {}
+    return {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+
+
+def setup_logging(level="INFO", fmt=LOG_FORMAT_JSON, sample_rate=1.0, queue_size=10000, stream=None):
+    """把根日志器、应用日志器与 uvicorn 日志器接到有界队列上；重复调用时替换之前的配置"""
+    listener = log_pipeline.setup_logging(
+        level=level, fmt=fmt, sample_rate=sample_rate, queue_size=queue_size, stream=stream,
+        logger_names=("paddleocr_app",), tag="APP", on_dropped=_dropped.inc, on_sampled_out=_sampled_out.inc,
+    )
+    # 访问日志由 RequestContextMiddleware 输出（带请求 ID 与阶段耗时），不再重复输出 uvicorn 的访问日志
+    logging.getLogger("uvicorn.access").disabled = True
+    return listener
@@ -0,0 +1,312 @@
+"""PaddleOCR 预测结果的解析与响应构造
+
+- 只依赖 NumPy / OpenCV 与 app.utils 下的工具模块，不导入 FastAPI、服务状态或推理进程池，
+  API 进程、推理工作进程与 bulk_ocr 的工作进程共用
+- build_simple_ocr 在调用时才导入 paddleocr
+"""
+import base64
+import math
+
+import numpy as np
+
+from app.utils.buffer_pool import buffer_pool
+from app.utils.geom_utils import ensure_quad_points, rotate_points
+from app.utils.image_utils import _rotate_image_keep_size
+from app.utils.layout_utils import assemble_text, order_items
+from app.utils.response_utils import POSITIONS_ENCODING_BASE64, POSITIONS_ENCODING_LIST
+
+RESPONSE_FORMAT_DETAIL = "detail"
+RESPONSE_FORMAT_COLUMNAR = "columnar"
+
+
+def build_simple_ocr(lang, engine_params):
+    """构建并预热一个 PaddleOCR 引擎（ModelRegistry 的工厂）"""
+    from paddleocr import PaddleOCR
+
+    # OCR_ENGINE_PARAMS_FILE 中的参数覆盖默认值（模型目录、阈值等）
+    kwargs = {
+        "lang": lang,
+        "device": "gpu",
+        "use_angle_cls": True,
+        "use_doc_unwarping": False,
+    }
+    kwargs.update(engine_params)
+    engine = PaddleOCR(**kwargs)
+    # 预热一次，首个真实请求不承担初始化开销
+    engine.predict(np.full((64, 64, 3), 255, dtype=np.uint8))
+    return engine
+
+
+def compact_predict_results(predict_results):
+    """将预测结果精简为可跨进程传输的结构，丢弃其中附带的图像；仍可交给 build_items_from_predict_results 解析"""
+    rec_texts, rec_scores, rec_polys, rec_boxes, dt_polys, pre_angle = _parse_predict_results(predict_results)
+    return [{
+        "res": {
+            "rec_texts": rec_texts,
+            "rec_scores": rec_scores,
+            "rec_polys": rec_polys,
+            "rec_boxes": rec_boxes,
+            "dt_polys": dt_polys,
+            "doc_preprocessor_res": {"angle": pre_angle},
+        }
+    }]
+
+
+def _select_primary_boxes(rec_polys, rec_boxes, dt_polys):
+    if rec_polys and len(rec_polys) > 0:
+        return rec_polys
+    if rec_boxes and len(rec_boxes) > 0:
+        return rec_boxes
+    if dt_polys and len(dt_polys) > 0:
+        return dt_polys
+    return []
+
+def _result_data(result):
+    """PaddleX 结果对象（OCR、检测、方向分类、版面解析）的可序列化字典：取 .json（属性或方法）并去掉外层的 res"""
+    data = getattr(result, "json", None)
+    if data is None:
+        data = result
+    if callable(data):
+        data = data()
+    return data.get("res", data) if isinstance(data, dict) else {}
+
+
+def _parse_predict_results(predict_results):
+    rec_texts_all, rec_scores_all, rec_polys_all, rec_boxes_all, dt_polys_all = [], [], [], [], []
+    for res in predict_results:
+        if hasattr(res, 'dict') and callable(getattr(res, 'dict')):
+            obj = res.dict()
+        elif hasattr(res, '__dict__') and res.__dict__:
+            obj = dict(res.__dict__)
+        else:
+            obj = res if isinstance(res, dict) else {}
+
+        try:
+            if hasattr(res, '_to_json'):
+                json_obj = res._to_json()
+            elif hasattr(res, 'json'):
+                json_obj = res.json if not callable(res.json) else res.json()
+            else:
+                json_obj = obj
+            if isinstance(json_obj, dict) and 'res' in json_obj and isinstance(json_obj['res'], dict):
+                obj = json_obj['res']
+            else:
+                obj = json_obj if isinstance(json_obj, dict) else obj
+        except Exception as e:
+            obj = {}
+
+        rec_texts = obj.get('rec_texts') or []
+        rec_scores = obj.get('rec_scores') or []
+        rec_polys = obj.get('rec_polys') or []
+        rec_boxes = obj.get('rec_boxes') or []
+        dt_polys = obj.get('dt_polys') or []
+
+
+        rec_texts_all.extend(rec_texts if isinstance(rec_texts, list) else [])
+        rec_scores_all.extend(rec_scores if isinstance(rec_scores, list) else [])
+        rec_polys_all.extend(rec_polys if isinstance(rec_polys, list) else [])
+        rec_boxes_all.extend(rec_boxes if isinstance(rec_boxes, list) else [])
+        dt_polys_all.extend(dt_polys if isinstance(dt_polys, list) else [])
+
+        # 获取预处理角度
+        pre_angle = 0
+        try:
+            doc_preprocessor_res = obj.get('doc_preprocessor_res')
+            if doc_preprocessor_res and isinstance(doc_preprocessor_res, dict):
+                pre_angle = doc_preprocessor_res.get('angle', 0)
+        except Exception:
+            pre_angle = 0
+
+    return rec_texts_all, rec_scores_all, rec_polys_all, rec_boxes_all, dt_polys_all, pre_angle
+
+def _compute_rotation_angle_from_boxes(boxes, texts, scores):
+    candidates = []
+    for i, box in enumerate(boxes):
+        norm_box = ensure_quad_points(box)
+        if not norm_box:
+            continue
+        text_val = texts[i] if i < len(texts) else ""
+        score_val = float(scores[i]) if i < len(scores) and isinstance(scores[i], (int, float)) else 1.0
+        candidates.append({
+            "Confidence": score_val,
+            "Position": norm_box,
+            "Value": text_val,
+        })
+
+    if not candidates:
+        return 0.0
+
+    best = None
+    best_conf = -1.0
+    for c in candidates:
+        if (c["Confidence"] > best_conf and len(c["Value"]) > 3 and (" " in c["Value"])):
+            best = c
+            best_conf = c["Confidence"]
+
+    if best is None:
+        best = candidates[0]
+
+    position = best["Position"]
+    if len(position) >= 2:
+        x1, y1 = position[0]
+        x2, y2 = position[1]
+        angle_rad = math.atan2(y2 - y1, x2 - x1)
+        return math.degrees(angle_rad)
+    return 0.0
+
+
+
+
+def build_items_from_predict_results(predict_results, image=None, directionCorrection=False, image_size=None):
+    """解析预测结果并估算角度，文本项按阅读顺序排列并带 line / block 序号。
+
+    directionCorrection 时同步旋转 polys；传入 image 时图像被原地旋转，
+    只传 image_size=(宽, 高) 时仅旋转 polys，由调用方自行旋转图像（避免原地写回多占一份内存）。
+    """
+    rec_texts, rec_scores, rec_polys, rec_boxes, dt_polys, pre_angle = _parse_predict_results(predict_results)
+    if pre_angle != 0:
+        rotation_angle = pre_angle
+    else:
+        primary_boxes = _select_primary_boxes(rec_polys, rec_boxes, dt_polys)
+        rotation_angle = _compute_rotation_angle_from_boxes(primary_boxes, rec_texts, rec_scores)
+
+    boxes_rotated = pre_angle == 0 and directionCorrection and (image is not None or image_size is not None) and abs(rotation_angle) > 1.0
+    if boxes_rotated:
+        if image is not None:
+            height, width = image.shape[:2]
+        else:
+            width, height = image_size
+        center = (width // 2, height // 2)
+        if image is not None:
+            with buffer_pool.lease() as lease:
+                image[:] = _rotate_image_keep_size(image, rotation_angle, alloc=lease.empty)
+
+        def rotate_list_of_boxes(box_list):
+            rotated = []
+            for b in box_list:
+                norm = ensure_quad_points(b)
+                if norm:
+                    rotated.append(rotate_points(norm, center, -rotation_angle))
+                else:
+                    rotated.append(b)
+            return rotated
+
+        rec_polys = rotate_list_of_boxes(rec_polys)
+        rec_boxes = rotate_list_of_boxes(rec_boxes)
+        dt_polys = rotate_list_of_boxes(dt_polys)
+
+    extracted = []
+    num = max(len(rec_texts), len(rec_scores), len(rec_polys or []), len(rec_boxes or []), len(dt_polys or []))
+    for i in range(num):
+        text_val = rec_texts[i] if i < len(rec_texts) else ""
+        score_val = rec_scores[i] if i < len(rec_scores) else 1.0
+        box = None
+
+        if rec_polys and i < len(rec_polys):
+            box = ensure_quad_points(rec_polys[i])
+        if box is None and rec_boxes and i < len(rec_boxes):
+            box = ensure_quad_points(rec_boxes[i])
+        if box is None and dt_polys and i < len(dt_polys):
+            box = ensure_quad_points(dt_polys[i])
+        if box is None:
+            continue
+        extracted.append({
+            'text': text_val,
+            'confidence': float(score_val) if isinstance(score_val, (int, float)) else 1.0,
+            'bbox': box,
+        })
+    # 整图方向预处理或方向矫正后的框已经转正；否则按估算的倾斜角排序
+    layout_angle = 0 if pre_angle != 0 or boxes_rotated else rotation_angle
+    return order_items(extracted, angle=layout_angle), rotation_angle, pre_angle
+
+def _build_image_info(image_width, image_height, angle=0, include_image_info=False, image_base64=None):
+    # 将角度转换为负数，为前端目标旋转角度，方便前端直接使用
+    angle = -angle
+    # 根据360度为周期，将角度转换为0-360度
+    angle = angle % 360
+    image_info = {
+        "Angle": angle,
+        "Height": image_height,
+        "Width": image_width,
+    }
+    # 仅当需要时才包含 ImageBase64
+    if include_image_info and image_base64 is not None:
+        image_info["ImageBase64"] = image_base64
+    return image_info
+
+def _item_lines(extracted_text):
+    # 没有行号的文本项各自成行
+    return [item.get("line", i) for i, item in enumerate(extracted_text)]
+
+
+def build_structured_response(extracted_text, image_width, image_height, angle=0, include_image_info=False, image_base64=None,
+                              include_layout=False):
+    """Text 按行拼接（行内片段以空格分隔，每行以换行结尾）；include_layout=True 时 Detail 每项附带 Line / Block 序号"""
+    details = []
+    for item in extracted_text:
+        detail = {
+            "Confidence": item.get("confidence", 0.0),
+            "Position": item.get("bbox", []),
+            "Value": item.get("text", ""),
+        }
+        if include_layout:
+            detail["Line"] = item.get("line")
+            detail["Block"] = item.get("block")
+        details.append(detail)
+
+    structured = {
+        "OcrInfo": [
+            {
+                "Text": assemble_text([detail["Value"] for detail in details], _item_lines(extracted_text)),
+                "Detail": details,
+            }
+        ],
+        "ImageInfo": [
+            _build_image_info(image_width, image_height, angle=angle, include_image_info=include_image_info, image_base64=image_base64)
+        ]
+    }
+    return structured
+
+def build_columnar_response(extracted_text, image_width, image_height, angle=0, include_image_info=False, image_base64=None, pack_boxes=False,
+                            include_layout=False):
+    """列式响应：Values/Confidences 为平行数组，所有四边形拍平为一个 int32 数组。
+
+    - Positions 长度为 8 * Count，按 [x1, y1, x2, y2, x3, y3, x4, y4] 依次排列
+    - pack_boxes=True 时 Positions 为小端 int32 字节的 base64 字符串
+    - include_layout=True 时附带平行数组 Lines / Blocks
+    - 可用 response_utils.columnar_to_detail 无损还原为 Detail 结构
+    """
+    values = [item.get("text", "") for item in extracted_text]
+    confidences = [item.get("confidence", 0.0) for item in extracted_text]
+    if extracted_text:
+        positions = np.asarray([item.get("bbox", []) for item in extracted_text], dtype=np.int32).reshape(-1)
+    else:
+        positions = np.empty(0, dtype=np.int32)
+
+    columns = {
+        "Count": len(values),
+        "Values": values,
+        "Confidences": confidences,
+    }
+    if pack_boxes:
+        columns["Positions"] = base64.b64encode(positions.astype('<i4', copy=False).tobytes()).decode('ascii')
+        columns["PositionsEncoding"] = POSITIONS_ENCODING_BASE64
+    else:
+        columns["Positions"] = positions.tolist()
+        columns["PositionsEncoding"] = POSITIONS_ENCODING_LIST
+    if include_layout:
+        columns["Lines"] = [item.get("line") for item in extracted_text]
+        columns["Blocks"] = [item.get("block") for item in extracted_text]
+
+    structured = {
+        "OcrInfo": [
+            {
+                "Text": assemble_text(values, _item_lines(extracted_text)),
+                "Columns": columns,
+            }
+        ],
+        "ImageInfo": [
+            _build_image_info(image_width, image_height, angle=angle, include_image_info=include_image_info, image_base64=image_base64)
+        ]
+    }
+    return structured
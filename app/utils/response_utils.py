@@ -1,3 +1,4 @@
+import base64
 import numpy as np
 
 def convert_numpy_to_list(obj):
@@ -19,3 +20,34 @@ def convert_numpy_to_list(obj):
         return str(obj)
 
 
+
+
+POSITIONS_ENCODING_LIST = "list"
+POSITIONS_ENCODING_BASE64 = "base64-int32le"
+
+
+def decode_columnar_positions(positions, encoding=POSITIONS_ENCODING_LIST):
+    """将列式响应中的 Positions 解码为 (N, 4, 2) 的 int32 数组"""
+    if encoding == POSITIONS_ENCODING_BASE64:
+        flat = np.frombuffer(base64.b64decode(positions), dtype='<i4')
+    else:
+        flat = np.asarray(positions, dtype=np.int32)
+    return flat.reshape(-1, 4, 2)
+
+
+def columnar_to_detail(columns):
+    """将列式 Columns 无损还原为 Detail 列表（与默认响应格式一致）"""
+    quads = decode_columnar_positions(columns.get("Positions", []), columns.get("PositionsEncoding", POSITIONS_ENCODING_LIST)).tolist()
+    details = [
+        {
+            "Confidence": confidence,
+            "Position": position,
+            "Value": value,
+        }
+        for value, confidence, position in zip(columns.get("Values", []), columns.get("Confidences", []), quads)
+    ]
+    if "Lines" in columns:
+        for detail, line, block in zip(details, columns["Lines"], columns.get("Blocks", [])):
+            detail["Line"] = line
+            detail["Block"] = block
+    return details
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线批量 OCR：不经过 HTTP，直接在进程池中推理，结果结构与 /ocr_simple/* 一致
+
+- 输入：目录（递归遍历图片）或清单文件（每行一个路径，"-" 表示标准输入）
+- 每个工作进程各自持有一个 PaddleOCR 实例，只导入引擎注册表与 app.utils 下的结果解析函数（不组装 FastAPI 应用），进程内后台线程预取并解码后续几张图片（窗口有界，内存不随批大小增长）
+- 结果增量写入 JSONL 或 Parquet（目录，每批一个 part 文件）
+- 已完成的文件记录在 checkpoint 中，进程被杀后重新运行同一命令即可续跑；每批的 checkpoint 以一条提交记录结尾
+  （JSONL 为写入后的文件长度，Parquet 为 part 文件名），续跑时丢弃最后一条提交记录之后写入的结果，同一批不会写两次
+
+示例：
+    python bulk_ocr.py /data/archive -o results.jsonl --workers 4
+    python bulk_ocr.py --manifest files.txt -o results_parquet --output-format parquet
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+CHECKPOINT_OK = "ok"
+CHECKPOINT_ERROR = "error"
+# 提交记录的状态前缀；提交记录的路径列为空，不会与文件路径混淆
+CHECKPOINT_COMMIT = "commit:"
+
+# 工作进程内的全局状态，由 _init_worker 初始化
+_worker_options = None
+_worker_engine = None
+_worker_prefetch = None
+# 已提交、尚未推理的预取任务数上限
+_worker_prefetch_window = 1
+
+
+def iter_sources(input_dir=None, manifest=None):
+    if manifest:
+        stream = sys.stdin if manifest == "-" else open(manifest, "r", encoding="utf-8")
+        try:
+            for line in stream:
+                path = line.strip()
+                if path and not path.startswith("#"):
+                    yield path
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        return
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def load_checkpoint(path, retry_failed=False):
+    """读取 checkpoint，返回 (已完成的文件集合, 提交记录列表)；retry_failed=True 时失败的文件会被重新处理。
+
+    有提交记录时只采信以提交记录结尾的批次：最后一条提交记录之后的行属于写到一半的批次，其结果会被丢弃并重新处理。
+    没有任何提交记录（旧版本写出的 checkpoint）时采信全部行。
+    """
+    done, commits = set(), []
+    if not os.path.exists(path):
+        return done, commits
+    entries, batch = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                # 写到一半的最后一行
+                break
+            source, _, status = line.rstrip("\n").rpartition("\t")
+            if not source and status.startswith(CHECKPOINT_COMMIT):
+                commits.append(status[len(CHECKPOINT_COMMIT):])
+                entries.extend(batch)
+                batch = []
+            elif source:
+                batch.append((source, status))
+    if not commits:
+        entries.extend(batch)
+    for source, status in entries:
+        if status == CHECKPOINT_OK or (status == CHECKPOINT_ERROR and not retry_failed):
+            done.add(source)
+        elif status == CHECKPOINT_ERROR:
+            done.discard(source)
+    return done, commits
+
+
+def iter_chunks(sources, size):
+    chunk = []
+    for source in sources:
+        chunk.append(source)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(options, prefetch_threads):
+    global _worker_options, _worker_engine, _worker_prefetch, _worker_prefetch_window
+    _worker_options = options
+    _worker_prefetch = ThreadPoolExecutor(max_workers=prefetch_threads, thread_name_prefix="prefetch")
+    _worker_prefetch_window = prefetch_threads + 1
+    # 在工作进程内导入：每个进程各自构建一个默认语言的 PaddleOCR 实例（参数同服务，取自 OCR_ENGINE_PARAMS_FILE）
+    from app.services.model_registry import ModelRegistry, load_engine_params
+    from app.utils.predict_utils import build_simple_ocr
+    _worker_engine = ModelRegistry(build_simple_ocr, engine_params=load_engine_params()).get().engine
+
+
+def _recognize(image, direction_correction=False, response_format="detail"):
+    """推理并构造与 process_simple 相同的结构化结果（不返回图片，因此不旋转像素，只换算旋转后的尺寸）"""
+    from app.utils.image_utils import rotated_canvas_size
+    from app.utils.predict_utils import (
+        RESPONSE_FORMAT_COLUMNAR,
+        build_columnar_response,
+        build_items_from_predict_results,
+        build_structured_response,
+        compact_predict_results,
+    )
+
+    h, w = image.shape[:2]
+    result = compact_predict_results(_worker_engine.predict(image))
+    items, rotation_angle, pre_angle = build_items_from_predict_results(result, directionCorrection=direction_correction, image_size=(w, h))
+    if pre_angle != 0:
+        w, h = rotated_canvas_size(w, h, pre_angle)
+    angle = pre_angle if pre_angle != 0 else rotation_angle
+    if response_format == RESPONSE_FORMAT_COLUMNAR:
+        return build_columnar_response(items, image_width=w, image_height=h, angle=angle)
+    return build_structured_response(items, image_width=w, image_height=h, angle=angle)
+
+
+def _load_image(path):
+    from app.utils.image_utils import decode_image_bytes
+
+    with open(path, "rb") as f:
+        return decode_image_bytes(f.read())
+
+
+def _ocr_chunk(paths):
+    from app.utils.response_utils import convert_numpy_to_list
+
+    records = []
+    # 有界窗口：每取出一张才提交下一张的读取+解码，推理当前图片时后台线程在解码后续几张，
+    # 同时持有的已解码图片不超过窗口大小
+    pending = iter(paths)
+    window = deque()
+    for path in pending:
+        window.append((path, _worker_prefetch.submit(_safe_load, path)))
+        if len(window) >= _worker_prefetch_window:
+            break
+    while window:
+        path, future = window.popleft()
+        image, load_error = future.result()
+        del future
+        next_path = next(pending, None)
+        if next_path is not None:
+            window.append((next_path, _worker_prefetch.submit(_safe_load, next_path)))
+        start = time.time()
+        record = {"path": path}
+        try:
+            if load_error is not None:
+                raise load_error
+            if image is None:
+                raise ValueError("Invalid image file")
+            structured = _recognize(image, **_worker_options)
+            record.update({"ok": True, "result": convert_numpy_to_list(structured)})
+        except Exception as e:
+            record.update({"ok": False, "error": f"{type(e).__name__}: {e}"})
+        record["elapsed"] = round(time.time() - start, 4)
+        records.append(record)
+        # 尽早释放已处理图片
+        del image
+    return records
+
+
+def _safe_load(path):
+    try:
+        return _load_image(path), None
+    except Exception as e:
+        return None, e
+
+
+class JsonlWriter:
+    """追加写入；提交记录为写入后的文件长度，续跑时截掉最后一次提交之后的内容"""
+
+    def __init__(self, path, commits=()):
+        self.discarded = 0
+        if commits and os.path.exists(path):
+            committed = int(commits[-1])
+            size = os.path.getsize(path)
+            if size > committed:
+                with open(path, "r+b") as f:
+                    f.truncate(committed)
+                self.discarded = size - committed
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, records):
+        """写入一批结果并落盘，返回该批的提交记录"""
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False))
+            self._file.write("\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return str(os.fstat(self._file.fileno()).st_size)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """每批结果写成一个独立的 part 文件，续跑时无需改写已有文件；提交记录为 part 文件名，续跑时删除未提交的 part"""
+
+    def __init__(self, directory, commits=()):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet 输出需要安装 pyarrow：pip install pyarrow")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._directory = directory
+        self._run_id = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self.discarded = 0
+        os.makedirs(directory, exist_ok=True)
+        committed = set(commits)
+        for name in os.listdir(directory):
+            if not name.startswith("part-"):
+                continue
+            # 写到一半的临时文件；有提交记录时，不在其中的 part 属于未记入 checkpoint 的批次
+            if name.endswith(".tmp") or (committed and name.endswith(".parquet") and name not in committed):
+                os.remove(os.path.join(directory, name))
+                self.discarded += 1
+
+    def write(self, records):
+        rows = {"path": [], "ok": [], "error": [], "text": [], "angle": [], "width": [], "height": [], "elapsed": [], "result_json": []}
+        for record in records:
+            result = record.get("result") or {}
+            ocr_info = (result.get("OcrInfo") or [{}])[0]
+            image_info = (result.get("ImageInfo") or [{}])[0]
+            rows["path"].append(record["path"])
+            rows["ok"].append(record["ok"])
+            rows["error"].append(record.get("error"))
+            rows["text"].append(ocr_info.get("Text"))
+            rows["angle"].append(image_info.get("Angle"))
+            rows["width"].append(image_info.get("Width"))
+            rows["height"].append(image_info.get("Height"))
+            rows["elapsed"].append(record.get("elapsed"))
+            rows["result_json"].append(json.dumps(result, ensure_ascii=False) if result else None)
+        table = self._pa.table(rows)
+        final_path = os.path.join(self._directory, f"part-{self._run_id}-{self._seq:06d}.parquet")
+        tmp_path = final_path + ".tmp"
+        self._pq.write_table(table, tmp_path)
+        os.replace(tmp_path, final_path)
+        self._seq += 1
+        return os.path.basename(final_path)
+
+    def close(self):
+        pass
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # 上次被杀时写到一半的行单独成行，不与新记录粘连
+                    self._file.write("\n")
+
+    def mark(self, records, commit):
+        """记录一批文件的状态，以该批的提交记录结尾；整批一次写入"""
+        lines = []
+        for record in records:
+            status = CHECKPOINT_OK if record["ok"] else CHECKPOINT_ERROR
+            lines.append(f"{record['path']}\t{status}\n")
+        lines.append(f"\t{CHECKPOINT_COMMIT}{commit}\n")
+        self._file.write("".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def run(args):
+    options = {
+        "direction_correction": args.direction_correction,
+        "response_format": args.response_format,
+    }
+    checkpoint_path = args.checkpoint or f"{args.output.rstrip(os.sep)}.checkpoint"
+    done, commits = load_checkpoint(checkpoint_path, retry_failed=args.retry_failed)
+    pending = (source for source in iter_sources(args.input, args.manifest) if source not in done)
+
+    if args.output_format == "parquet":
+        writer = ParquetWriter(args.output, commits)
+    else:
+        writer = JsonlWriter(args.output, commits)
+    checkpoint = Checkpoint(checkpoint_path)
+    # spawn：避免 fork 继承 CUDA/Paddle 状态
+    context = multiprocessing.get_context("spawn")
+    processed, failed, start = 0, 0, time.time()
+    max_inflight = args.workers * 2
+    print(f"跳过已完成 {len(done)} 个文件，checkpoint: {checkpoint_path}")
+    if writer.discarded:
+        unit = "字节" if args.output_format == "jsonl" else "个 part 文件"
+        print(f"丢弃上次中断时未记入 checkpoint 的结果 {writer.discarded} {unit}，对应文件将重新处理")
+
+    executor = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(options, args.prefetch),
+    )
+    try:
+        inflight = set()
+        chunks = iter_chunks(pending, args.chunk_size)
+        exhausted = False
+        while True:
+            while not exhausted and len(inflight) < max_inflight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                inflight.add(executor.submit(_ocr_chunk, chunk))
+            if not inflight:
+                break
+            finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                records = future.result()
+                # 先写结果再记 checkpoint：中断时最多重新处理一批，续跑时按提交记录丢弃该批已写出的结果
+                commit = writer.write(records)
+                checkpoint.mark(records, commit)
+                processed += len(records)
+                failed += sum(1 for r in records if not r["ok"])
+            elapsed = time.time() - start
+            print(f"\r已处理 {processed}（失败 {failed}），{processed / max(elapsed, 1e-6):.2f} 张/秒", end="", flush=True)
+    except KeyboardInterrupt:
+        print("\n中断，已完成的结果与 checkpoint 已保存，重新运行即可续跑")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise SystemExit(130)
+    finally:
+        writer.close()
+        checkpoint.close()
+    executor.shutdown(wait=True)
+    print(f"\n完成：{processed} 个文件，失败 {failed}，耗时 {time.time() - start:.1f}s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="离线批量 OCR（进程池 + 可续跑 checkpoint）")
+    parser.add_argument("input", nargs="?", help="图片目录（递归遍历）")
+    parser.add_argument("--manifest", help="清单文件，每行一个图片路径；'-' 表示标准输入")
+    parser.add_argument("-o", "--output", required=True, help="输出路径：JSONL 文件或 Parquet 目录")
+    parser.add_argument("--output-format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--checkpoint", help="checkpoint 文件路径，默认 <output>.checkpoint")
+    parser.add_argument("--retry-failed", action="store_true", help="续跑时重新处理此前失败的文件")
+    parser.add_argument("--workers", type=int, default=2, help="工作进程数（每个进程一个 PaddleOCR 实例）")
+    parser.add_argument("--chunk-size", type=int, default=16, help="每个任务包含的图片数")
+    parser.add_argument("--prefetch", type=int, default=2, help="每个工作进程的预取/解码线程数")
+    parser.add_argument("--direction-correction", action="store_true", help="进行方向矫正并同步旋转 polys")
+    parser.add_argument("--response-format", choices=("detail", "columnar"), default="detail")
+    args = parser.parse_args(argv)
+    if bool(args.input) == bool(args.manifest):
+        parser.error("需要且只能指定 input 目录或 --manifest 之一")
+    return args
+
+
+if __name__ == '__main__':
+    run(parse_args())
@@ -0,0 +1,47 @@
+"""多节点 OCR 网关：把请求转发给多个后端实例
+
+按后端上报的排队长度做最少负载路由，按图片内容做一致性哈希以命中节点缓存，并摘除不健康的后端。
+不依赖 PaddleOCR，可以部署在没有 GPU 的机器上。
+"""
+from fastapi import FastAPI
+import asyncio
+import logging
+
+import httpx
+
+from gateway.backends import BackendPool
+from gateway.config import GATEWAY_BACKENDS, GATEWAY_LOG_FORMAT, GATEWAY_LOG_LEVEL, GATEWAY_LOG_QUEUE_SIZE, GATEWAY_TIMEOUT_S
+from gateway.proxy import router
+from log_pipeline import setup_logging
+
+
+# 与 OCR 服务相同的日志管道：写日志只入有界队列，由后台线程输出
+setup_logging(level=GATEWAY_LOG_LEVEL, fmt=GATEWAY_LOG_FORMAT, queue_size=GATEWAY_LOG_QUEUE_SIZE,
+              logger_names=("paddleocr_gateway",), tag="GATEWAY")
+logger = logging.getLogger("paddleocr_gateway")
+
+
+def create_app(backends=None):
+    app = FastAPI(title="PaddleOCR Gateway", description="Load-aware gateway for PaddleOCR API instances", version="1.0.0")
+    app.include_router(router)
+    urls = GATEWAY_BACKENDS if backends is None else backends
+
+    @app.on_event("startup")
+    async def _start():
+        if not urls:
+            logger.warning("未配置后端（GATEWAY_BACKENDS），所有请求将返回 503")
+        app.state.pool = BackendPool(urls)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=64)
+        app.state.client = httpx.AsyncClient(timeout=httpx.Timeout(GATEWAY_TIMEOUT_S, connect=5.0), limits=limits)
+        app.state.health_task = asyncio.create_task(app.state.pool.run_health_checks(app.state.client))
+        logger.info(f"网关已启动，后端: {', '.join(urls) or '无'}")
+
+    @app.on_event("shutdown")
+    async def _stop():
+        app.state.health_task.cancel()
+        await app.state.client.aclose()
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,141 @@
+"""后端实例的负载与健康状态
+
+- 负载 = 网关转发中的请求数与后端上报的执行中请求数取较大者，再加上后端上报的排队长度；
+  后端上报值来自每个响应头（X-Queue-Depth / X-In-Flight）与定期的 /capacity 检查
+- /capacity 报告 accepting=false（排队已满或推理进程都在重启）的后端暂不分配新请求，除非所有后端都如此
+- 选择后端：有内容哈希时按一致性哈希环顺序，取第一个负载不超过「平均负载 × 系数」的健康后端
+  （bounded-load consistent hashing）；没有哈希或都超限时选负载最低者
+- 连续失败 N 次（转发连接失败或健康检查失败）的后端被摘除，后续健康检查成功即恢复
+"""
+import asyncio
+import logging
+import math
+import time
+
+import httpx
+
+from gateway.config import GATEWAY_EJECT_AFTER, GATEWAY_HASH_LOAD_FACTOR, GATEWAY_HEALTH_INTERVAL_S, GATEWAY_VNODES
+from gateway.hashing import HashRing
+
+
+logger = logging.getLogger("paddleocr_gateway")
+
+HEADER_QUEUE_DEPTH = "x-queue-depth"
+HEADER_IN_FLIGHT = "x-in-flight"
+
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class Backend:
+    def __init__(self, url):
+        self.url = url
+        self.healthy = True
+        self.failures = 0
+        self.in_flight = 0          # 网关转发中、尚未返回的请求数
+        self.queue_depth = 0        # 后端上报的排队长度
+        self.reported_in_flight = 0
+        self.reported_at = 0.0
+        self.accepting = True
+        self.backlog_seconds = 0.0
+        self.forwarded = 0
+
+    @property
+    def load(self):
+        return max(self.in_flight, self.reported_in_flight) + self.queue_depth
+
+    def update_from_headers(self, headers):
+        queue_depth = _header_int(headers, HEADER_QUEUE_DEPTH)
+        in_flight = _header_int(headers, HEADER_IN_FLIGHT)
+        if queue_depth is not None:
+            self.queue_depth = queue_depth
+        if in_flight is not None:
+            self.reported_in_flight = in_flight
+        if queue_depth is not None or in_flight is not None:
+            self.reported_at = time.monotonic()
+
+    def update_from_capacity(self, capacity):
+        self.queue_depth = int(capacity.get("queueDepth") or 0)
+        self.reported_in_flight = int(capacity.get("inFlight") or 0)
+        self.accepting = bool(capacity.get("accepting", True))
+        self.backlog_seconds = float(capacity.get("estimatedBacklogSeconds") or 0.0)
+        self.reported_at = time.monotonic()
+
+    def describe(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "load": self.load,
+            "inFlight": self.in_flight,
+            "queueDepth": self.queue_depth,
+            "reportedInFlight": self.reported_in_flight,
+            "accepting": self.accepting,
+            "backlogSeconds": self.backlog_seconds,
+            "forwarded": self.forwarded,
+        }
+
+
+class BackendPool:
+    def __init__(self, urls, load_factor=GATEWAY_HASH_LOAD_FACTOR, eject_after=GATEWAY_EJECT_AFTER, vnodes=GATEWAY_VNODES):
+        self.backends = {url: Backend(url) for url in urls}
+        self.load_factor = load_factor
+        self.eject_after = eject_after
+        self.ring = HashRing(self.backends, vnodes=vnodes)
+
+    def healthy(self):
+        return [backend for backend in self.backends.values() if backend.healthy]
+
+    def choose(self, key=None, exclude=()):
+        candidates = [backend for backend in self.healthy() if backend not in exclude]
+        if not candidates:
+            return None
+        accepting = [backend for backend in candidates if backend.accepting]
+        if accepting:
+            candidates = accepting
+        if key is not None and self.load_factor > 0:
+            # 上限按加入本请求后的平均负载计算，保证至少有一个后端可接收
+            total = sum(backend.load for backend in candidates) + 1
+            bound = math.ceil(self.load_factor * total / len(candidates))
+            for url in self.ring.walk(key):
+                backend = self.backends[url]
+                if backend in candidates and backend.load + 1 <= bound:
+                    return backend
+        return min(candidates, key=lambda backend: (backend.load, backend.forwarded))
+
+    def mark_success(self, backend):
+        backend.failures = 0
+        if not backend.healthy:
+            backend.healthy = True
+            logger.info(f"后端 {backend.url} 已恢复")
+
+    def mark_failure(self, backend, reason):
+        backend.failures += 1
+        if backend.healthy and backend.failures >= self.eject_after:
+            backend.healthy = False
+            logger.warning(f"后端 {backend.url} 连续失败 {backend.failures} 次，已摘除（{reason}）")
+
+    async def check(self, client, backend):
+        try:
+            response = await client.get(f"{backend.url}/capacity", timeout=max(1.0, GATEWAY_HEALTH_INTERVAL_S))
+            if response.status_code != 200:
+                self.mark_failure(backend, f"health check: HTTP {response.status_code}")
+                return
+            capacity = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            self.mark_failure(backend, f"health check: {type(e).__name__}")
+            return
+        backend.update_from_capacity(capacity)
+        self.mark_success(backend)
+
+    async def run_health_checks(self, client, interval=GATEWAY_HEALTH_INTERVAL_S):
+        while True:
+            await asyncio.gather(*(self.check(client, backend) for backend in self.backends.values()))
+            await asyncio.sleep(interval)
+
+    def describe(self):
+        return [backend.describe() for backend in self.backends.values()]
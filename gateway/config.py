@@ -0,0 +1,48 @@
+"""网关配置：全部来自环境变量
+
+网关不导入 app 包（导入 app 会加载 PaddleOCR），因此单独解析环境变量。
+"""
+import os
+
+
+def _env_str(name, default):
+    value = os.getenv(name)
+    return value if value not in (None, "") else default
+
+
+def _env_int(name, default):
+    try:
+        return int(_env_str(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(_env_str(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_backends(value):
+    return [url.strip().rstrip("/") for url in (value or "").split(",") if url.strip()]
+
+
+# 后端 OCR 实例地址，逗号分隔，如 http://10.0.0.1:8008,http://10.0.0.2:8008
+GATEWAY_BACKENDS = parse_backends(_env_str("GATEWAY_BACKENDS", ""))
+# 主动健康检查间隔（秒）
+GATEWAY_HEALTH_INTERVAL_S = _env_float("GATEWAY_HEALTH_INTERVAL_S", 2.0)
+# 连续失败该次数后摘除后端；摘除后继续探测，探测成功即恢复
+GATEWAY_EJECT_AFTER = _env_int("GATEWAY_EJECT_AFTER", 3)
+# 缓存亲和的负载上限系数：后端负载超过平均负载的该倍数时沿哈希环顺延；0 表示只按负载路由
+GATEWAY_HASH_LOAD_FACTOR = _env_float("GATEWAY_HASH_LOAD_FACTOR", 1.25)
+# 每个后端在哈希环上的虚拟节点数
+GATEWAY_VNODES = _env_int("GATEWAY_VNODES", 128)
+# 转发超时（秒）
+GATEWAY_TIMEOUT_S = _env_float("GATEWAY_TIMEOUT_S", 300.0)
+# 连接失败或后端 503 时换一个后端重试的次数
+GATEWAY_RETRIES = _env_int("GATEWAY_RETRIES", 1)
+# 日志：与 OCR 服务相同的非阻塞管道（有界队列 + 后台线程），默认单行 JSON，GATEWAY_LOG_FORMAT=text 为文本格式
+GATEWAY_LOG_LEVEL = _env_str("GATEWAY_LOG_LEVEL", "INFO").upper()
+GATEWAY_LOG_FORMAT = _env_str("GATEWAY_LOG_FORMAT", "json").lower()
+GATEWAY_LOG_QUEUE_SIZE = _env_int("GATEWAY_LOG_QUEUE_SIZE", 10000)
@@ -0,0 +1,41 @@
+"""一致性哈希环：相同图片内容尽量落到同一后端，命中各节点的本地缓存"""
+import bisect
+import hashlib
+
+
+def content_key(data):
+    """图片内容的 64 位哈希"""
+    if isinstance(data, str):
+        data = data.encode("ascii", "ignore")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def _point(label):
+    return int.from_bytes(hashlib.blake2b(label.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, nodes, vnodes=128):
+        self.nodes = list(nodes)
+        points = []
+        for node in self.nodes:
+            for i in range(vnodes):
+                points.append((_point(f"{node}#{i}"), node))
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def walk(self, key):
+        """从 key 所在位置顺时针依次返回不重复的节点"""
+        if not self._hashes:
+            return
+        start = bisect.bisect(self._hashes, key)
+        seen = set()
+        total = len(self._hashes)
+        for offset in range(total):
+            node = self._owners[(start + offset) % total]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
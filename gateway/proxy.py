@@ -0,0 +1,216 @@
+"""转发 OCR 请求到后端实例
+
+- 图片上传接口按文件内容、base64 接口按图片字符串做一致性哈希
+- 其他 /ocr_* 接口原样透传，有请求体（multipart 除外）时按请求体哈希
+- WebSocket 流式会话整体转发到按负载选出的一个后端，双向透传消息
+"""
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+from fastapi import APIRouter, File, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
+
+from gateway.config import GATEWAY_RETRIES
+from gateway.hashing import content_key
+
+
+logger = logging.getLogger("paddleocr_gateway")
+
+router = APIRouter()
+
+# 透传给后端的请求头（调度参数、压缩协商）
+_FORWARD_REQUEST_HEADERS = ("x-priority", "x-deadline-ms", "x-tenant-id", "x-request-id", "accept-encoding")
+# 以 multipart 上传单个图片文件（字段 file）的接口
+_FILE_ENDPOINTS = ("/ocr_simple/file", "/ocr_detect/file", "/ocr_structure/file")
+# 透传给后端的 WebSocket 握手请求头
+_FORWARD_WS_HEADERS = ("x-tenant-id", "x-request-id")
+# 不回传给客户端的响应头（由网关自己的 HTTP 层生成）
+_HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "content-length", "date", "server"}
+
+
+def _forward_headers(request):
+    return {name: request.headers[name] for name in _FORWARD_REQUEST_HEADERS if name in request.headers}
+
+
+async def _forward(request, path, key, method="POST", extra_headers=None, **send_kwargs):
+    """选择后端并转发；连接失败或后端 503 时换一个后端重试"""
+    state = request.app.state
+    pool, client = state.pool, state.client
+    tried = []
+    last_response = None
+    for attempt in range(GATEWAY_RETRIES + 1):
+        backend = pool.choose(key, exclude=tried)
+        if backend is None:
+            break
+        tried.append(backend)
+        backend.in_flight += 1
+        backend.forwarded += 1
+        start_time = time.time()
+        try:
+            async with client.stream(method, f"{backend.url}{path}", params=request.query_params,
+                                     headers={**_forward_headers(request), **(extra_headers or {})}, **send_kwargs) as upstream:
+                # 原样读取（不解压），Content-Encoding 一并透传
+                body = b"".join([chunk async for chunk in upstream.aiter_raw()])
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            # 请求未到达后端，可安全重试
+            pool.mark_failure(backend, type(e).__name__)
+            logger.warning(f"{path} 连接后端 {backend.url} 失败，尝试其他后端")
+            continue
+        except httpx.TimeoutException:
+            pool.mark_failure(backend, "timeout")
+            logger.error(f"{path} 后端 {backend.url} 超时 ({time.time() - start_time:.3f}s)")
+            return JSONResponse(status_code=504, content={"detail": "Backend timed out"})
+        except httpx.HTTPError as e:
+            pool.mark_failure(backend, type(e).__name__)
+            logger.error(f"{path} 后端 {backend.url} 转发失败: {e}")
+            return JSONResponse(status_code=502, content={"detail": "Bad gateway"})
+        finally:
+            backend.in_flight -= 1
+
+        backend.update_from_headers(upstream.headers)
+        pool.mark_success(backend)
+        headers = {name: value for name, value in upstream.headers.items() if name.lower() not in _HOP_BY_HOP}
+        headers["X-Backend"] = backend.url
+        last_response = Response(content=body, status_code=upstream.status_code, headers=headers)
+        if upstream.status_code == 503:
+            # 后端排队已满：下一次 /capacity 检查前不再向其分配请求
+            backend.accepting = False
+            if attempt < GATEWAY_RETRIES:
+                continue
+        logger.info(f"{path} -> {backend.url} {upstream.status_code} ({time.time() - start_time:.3f}s)")
+        return last_response
+    if last_response is not None:
+        return last_response
+    return JSONResponse(status_code=503, content={"detail": "No healthy backend"}, headers={"Retry-After": "1"})
+
+
+async def forward_file(request: Request, file: UploadFile = File(...)):
+    contents = await file.read()
+    files = {"file": (file.filename or "image", contents, file.content_type or "application/octet-stream")}
+    return await _forward(request, request.url.path, content_key(contents), files=files)
+
+
+for _path in _FILE_ENDPOINTS:
+    router.add_api_route(_path, forward_file, methods=["POST"])
+
+
+@router.post('/ocr_simple/base64')
+async def forward_base64(request: Request):
+    body = await request.body()
+    try:
+        # 同一图片的 base64 字符串相同，直接对字符串做哈希
+        key = content_key(json.loads(body).get("image_base64") or "")
+    except (ValueError, AttributeError):
+        key = None
+    return await _forward(request, "/ocr_simple/base64", key, extra_headers={"content-type": "application/json"}, content=body)
+
+
+@router.get('/health')
+async def health(request: Request):
+    pool = request.app.state.pool
+    healthy = len(pool.healthy())
+    status = "healthy" if healthy else "unavailable"
+    return JSONResponse(status_code=200 if healthy else 503, content={"status": status, "healthyBackends": healthy,
+                                                                       "totalBackends": len(pool.backends)})
+
+
+@router.get('/gateway/backends')
+async def backends(request: Request):
+    return {"backends": request.app.state.pool.describe()}
+
+
+async def _ws_connect(url, headers):
+    # websockets >= 13 的新接口用 additional_headers，旧接口用 extra_headers
+    try:
+        from websockets.asyncio.client import connect
+        return await connect(url, additional_headers=headers, max_size=None, open_timeout=5.0)
+    except ImportError:
+        import websockets
+        return await websockets.connect(url, extra_headers=headers, max_size=None, open_timeout=5.0)
+
+
+@router.websocket('/ocr_simple/ws')
+async def forward_stream(websocket: WebSocket):
+    """WebSocket 会话固定在一个后端上（按负载选择），消息双向原样透传"""
+    from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+    pool = websocket.app.state.pool
+    backend = pool.choose(None)
+    if backend is None:
+        await websocket.close(code=1013, reason="No healthy backend")
+        return
+    url = "ws" + backend.url[len("http"):] + websocket.url.path
+    if websocket.url.query:
+        url = f"{url}?{websocket.url.query}"
+    headers = {name: websocket.headers[name] for name in _FORWARD_WS_HEADERS if name in websocket.headers}
+    try:
+        upstream = await _ws_connect(url, headers)
+    except InvalidHandshake as e:
+        # 后端拒绝握手（如不支持的语言）
+        logger.warning(f"{websocket.url.path} 后端 {backend.url} 拒绝连接: {e}")
+        await websocket.close(code=1008, reason="Rejected by backend")
+        return
+    except (OSError, asyncio.TimeoutError) as e:
+        pool.mark_failure(backend, type(e).__name__)
+        logger.error(f"{websocket.url.path} 连接后端 {backend.url} 失败: {e}")
+        await websocket.close(code=1011, reason="Backend unavailable")
+        return
+
+    await websocket.accept()
+    backend.in_flight += 1
+    backend.forwarded += 1
+    start_time = time.time()
+
+    async def client_to_backend():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            await upstream.send(message["bytes"] if message.get("bytes") is not None else message.get("text") or "")
+
+    async def backend_to_client():
+        try:
+            async for message in upstream:
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+        except ConnectionClosed:
+            pass
+
+    tasks = {asyncio.ensure_future(client_to_backend()), asyncio.ensure_future(backend_to_client())}
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None and not isinstance(task.exception(), (WebSocketDisconnect, ConnectionClosed)):
+                logger.error(f"{websocket.url.path} 转发异常: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        backend.in_flight -= 1
+        await upstream.close()
+        # 1005 / 1006 只表示未收到关闭帧，不能出现在发出的关闭帧中
+        code = upstream.close_code
+        code = 1011 if code == 1006 else 1000 if code in (None, 1005) else code
+        try:
+            await websocket.close(code=code)
+        except (RuntimeError, WebSocketDisconnect):
+            # 客户端已断开
+            pass
+    logger.info(f"{websocket.url.path} -> {backend.url} 会话结束 ({time.time() - start_time:.1f}s)")
+
+
+@router.api_route('/{path:path}', methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def forward_other(request: Request, path: str):
+    """其他 /ocr_* 接口原样透传；有请求体时按请求体哈希，相同请求落到同一后端"""
+    if not path.startswith("ocr_"):
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    body = await request.body()
+    content_type = request.headers.get("content-type")
+    # multipart 的分隔符每次不同，按请求体哈希没有意义，只按负载路由
+    key = content_key(body) if body and not (content_type or "").startswith("multipart/") else None
+    extra_headers = {"content-type": content_type} if content_type else None
+    return await _forward(request, f"/{path}", key, method=request.method, extra_headers=extra_headers, content=body)
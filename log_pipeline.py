@@ -0,0 +1,147 @@
+"""非阻塞的结构化日志管道，OCR 服务（app）与网关（gateway）共用
+
+- 业务线程只把日志记录放入有界队列（QueueHandler），由后台线程（QueueListener）格式化并写出；
+  队列满时直接丢弃，日志收集端变慢不会阻塞事件循环或工作线程
+- 输出为单行 JSON（fmt="text" 时为文本格式），带请求 ID 与 extra 字段
+- INFO 及以下级别按 sample_rate 采样：同一请求的日志按请求 ID 一起保留或丢弃；WARNING 及以上总是保留
+- 异常堆栈在后台线程中格式化
+- 只依赖标准库：网关导入本模块时不会加载 app 包（及 PaddleOCR）
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import zlib
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+
+LOG_FORMAT_JSON = "json"
+LOG_FORMAT_TEXT = "text"
+
+request_id_var = ContextVar("request_id", default=None)
+
+# LogRecord 的标准属性，其余属性（logger.info(..., extra={...})）作为 JSON 字段输出
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, tag="APP"):
+        super().__init__(f'%(asctime)s - [{tag}] %(levelname)s - %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{text} [{request_id}]" if request_id else text
+
+
+class SamplingQueueHandler(QueueHandler):
+    """在调用方线程中只做采样判断与浅拷贝，格式化交给后台线程；队列满时丢弃
+
+    on_dropped / on_sampled_out 在丢弃与采样跳过时调用（用于计数），可为 None
+    """
+
+    def __init__(self, log_queue, sample_rate=1.0, on_dropped=None, on_sampled_out=None):
+        super().__init__(log_queue)
+        self.sample_rate = sample_rate
+        self.on_dropped = on_dropped
+        self.on_sampled_out = on_sampled_out
+
+    def _keep(self, record):
+        if record.levelno >= logging.WARNING or self.sample_rate >= 1.0:
+            return True
+        request_id = request_id_var.get()
+        if request_id:
+            # 同一请求的日志一起保留或丢弃
+            return zlib.crc32(request_id.encode("utf-8")) / 0xFFFFFFFF < self.sample_rate
+        return random.random() < self.sample_rate
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        # 参数在调用方线程合并（参数对象之后可能被修改），保留 exc_info 由后台线程格式化堆栈
+        record.msg = record.getMessage()
+        record.args = None
+        record.request_id = request_id_var.get()
+        return record
+
+    def emit(self, record):
+        try:
+            if not self._keep(record):
+                if self.on_sampled_out is not None:
+                    self.on_sampled_out()
+                return
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            if self.on_dropped is not None:
+                self.on_dropped()
+        except Exception:
+            self.handleError(record)
+
+
+def setup_logging(level="INFO", fmt=LOG_FORMAT_JSON, sample_rate=1.0, queue_size=10000, stream=None,
+                  logger_names=(), tag="APP", on_dropped=None, on_sampled_out=None):
+    """把根日志器、logger_names 与 uvicorn 日志器接到有界队列上；重复调用时替换之前的配置"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(TextFormatter(tag) if fmt == LOG_FORMAT_TEXT else JsonFormatter())
+    log_queue = queue.Queue(maxsize=max(0, queue_size))
+    handler = SamplingQueueHandler(log_queue, sample_rate=sample_rate, on_dropped=on_dropped, on_sampled_out=on_sampled_out)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    # 这些日志器都不再直接写流，统一冒泡到根日志器的队列
+    for name in tuple(logger_names) + ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger = logging.getLogger(name)
+        for existing in list(logger.handlers):
+            logger.removeHandler(existing)
+        logger.propagate = True
+        logger.setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """停止后台线程前先写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,21 @@
+"""PaddleOCR 服务的 Python 客户端（同步 / 异步）
+
+仅依赖 httpx，可独立于服务端代码使用。
+"""
+from .async_client import AsyncOcrClient
+from .errors import OcrClientError, OcrHTTPError
+from .models import OcrDetail, OcrImageInfo, OcrItemResult, OcrResult
+from .retry import RetryPolicy
+from .sync_client import OcrClient
+
+__all__ = [
+    "AsyncOcrClient",
+    "OcrClient",
+    "OcrClientError",
+    "OcrHTTPError",
+    "OcrDetail",
+    "OcrImageInfo",
+    "OcrItemResult",
+    "OcrResult",
+    "RetryPolicy",
+]
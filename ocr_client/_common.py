@@ -0,0 +1,88 @@
+"""同步/异步客户端共用的请求构造与响应解析"""
+import os
+
+from .errors import OcrHTTPError
+from .models import OcrResult
+from .retry import parse_retry_after
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+DEFAULT_BASE_URL = "http://localhost:8008"
+FILE_ENDPOINT = "/ocr_simple/file"
+
+
+def build_request(priority=None, tenant=None, deadline_ms=None, **options):
+    """返回 (查询参数, 请求头)；priority / tenant / deadline_ms 经调度请求头 X-Priority / X-Tenant-Id / X-Deadline-Ms 传递"""
+    headers = {}
+    if priority is not None:
+        headers["X-Priority"] = priority
+    if tenant is not None:
+        headers["X-Tenant-Id"] = tenant
+    if deadline_ms is not None:
+        headers["X-Deadline-Ms"] = str(int(deadline_ms))
+    return build_params(**options), headers
+
+
+def build_params(direction_correction=False, need_img=False, response_format="columnar", pack_boxes=True,
+                 img_format=None, img_quality=None, img_max_side=None, layout=False, lang=None):
+    """构造 /ocr_simple/* 的查询参数；默认请求紧凑的列式格式，由客户端还原为类型化结果"""
+    params = {
+        "directionCorrection": _bool(direction_correction),
+        "needImg": _bool(need_img),
+        "format": response_format,
+    }
+    if response_format == "columnar":
+        params["packBoxes"] = _bool(pack_boxes)
+    if img_format is not None:
+        params["imgFormat"] = img_format
+    if img_quality is not None:
+        params["imgQuality"] = int(img_quality)
+    if img_max_side is not None:
+        params["imgMaxSide"] = int(img_max_side)
+    if layout:
+        params["layout"] = "true"
+    if lang is not None:
+        params["lang"] = lang
+    return params
+
+
+def _bool(value):
+    return "true" if value else "false"
+
+
+def parse_response(response):
+    if response.status_code >= 400:
+        try:
+            detail = response.json().get("detail")
+        except ValueError:
+            detail = response.text
+        raise OcrHTTPError(response.status_code, detail, parse_retry_after(response.headers.get("Retry-After")))
+    return OcrResult.from_json(response.json())
+
+
+def iter_image_files(directory, recursive=True, extensions=IMAGE_EXTENSIONS):
+    """按文件名排序遍历目录下的图片文件"""
+    extensions = tuple(ext.lower() for ext in extensions)
+    if recursive:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(extensions):
+                    yield os.path.join(root, name)
+    else:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and name.lower().endswith(extensions):
+                yield path
+
+
+def read_source(source):
+    """批量接口的输入可以是文件路径或 (文件名, 字节) 元组"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return "image", bytes(source)
+    if isinstance(source, tuple):
+        filename, data = source
+        return filename, data
+    with open(source, "rb") as f:
+        return os.path.basename(os.fspath(source)), f.read()
@@ -0,0 +1,125 @@
+"""异步 OCR 客户端：连接池复用的 HTTP/1.1 keep-alive、并发控制与重试"""
+import asyncio
+
+import httpx
+
+from ._common import DEFAULT_BASE_URL, FILE_ENDPOINT, build_request, iter_image_files, parse_response, read_source
+from .models import OcrItemResult
+from .retry import RetryPolicy, parse_retry_after
+
+
+class AsyncOcrClient:
+    """示例：
+
+        async with AsyncOcrClient("http://ocr:8008", max_concurrency=16) as client:
+            result = await client.ocr_file("page.jpg", lang="en", priority="interactive", tenant="team-a")
+            async for item in client.ocr_directory("scans/", ordered=False):
+                ...
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=60.0, max_concurrency=8, max_connections=None,
+                 retry=None, headers=None, **request_options):
+        self.max_concurrency = max_concurrency
+        self.retry = retry or RetryPolicy()
+        self.request_options = request_options
+        max_connections = max_connections or max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            headers=headers,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def ocr_bytes(self, data, filename="image", **options):
+        """options 为查询参数（如 lang、layout、need_img）与调度选项（priority、tenant、deadline_ms），覆盖构造时传入的默认值"""
+        params, headers = build_request(**{**self.request_options, **options})
+        response = await self._post_with_retry(filename, data, params, headers)
+        return parse_response(response)
+
+    async def ocr_file(self, path, **options):
+        filename, data = await asyncio.to_thread(read_source, path)
+        return await self.ocr_bytes(data, filename=filename, **options)
+
+    async def ocr_many(self, sources, ordered=True, concurrency=None, **options):
+        """批量识别，最多同时进行 concurrency 个请求（默认 max_concurrency）。
+
+        sources 为文件路径、字节或 (文件名, 字节) 的可迭代对象，按滑动窗口消费，不会一次性读入内存。
+        ordered=True 时按输入顺序产出，否则按完成顺序产出 OcrItemResult；单项失败不会中断整体。
+        调用方提前退出（break 或 aclose()）时取消窗口内尚未完成的请求，不再上传或重试。
+        """
+        window = concurrency or self.max_concurrency
+        source_iter = enumerate(sources)
+        pending = set()
+        finished = {}
+        next_to_yield = 0
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(pending) < window:
+                    try:
+                        index, source = next(source_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self._ocr_item(index, source, options)))
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    item = task.result()
+                    if ordered:
+                        finished[item.index] = item
+                    else:
+                        yield item
+                while next_to_yield in finished:
+                    yield finished.pop(next_to_yield)
+                    next_to_yield += 1
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def ocr_directory(self, directory, recursive=True, ordered=True, concurrency=None, **options):
+        async for item in self.ocr_many(iter_image_files(directory, recursive=recursive), ordered=ordered,
+                                        concurrency=concurrency, **options):
+            yield item
+
+    async def _ocr_item(self, index, source, options):
+        try:
+            filename, data = await asyncio.to_thread(read_source, source)
+            result = await self.ocr_bytes(data, filename=filename, **options)
+            return OcrItemResult(index=index, source=source, result=result)
+        except Exception as e:
+            return OcrItemResult(index=index, source=source, error=e)
+
+    async def _post_with_retry(self, filename, data, params, headers=None):
+        attempt = 0
+        while True:
+            attempt += 1
+            # 只在请求期间占用并发名额，退避等待时释放
+            async with self._semaphore:
+                try:
+                    response = await self._client.post(FILE_ENDPOINT, params=params, headers=headers, files={"file": (filename, data)})
+                except httpx.TransportError:
+                    if attempt >= self.retry.max_attempts:
+                        raise
+                    response = None
+            if response is None:
+                await asyncio.sleep(self.retry.delay(attempt))
+                continue
+            if not self.retry.should_retry_status(response.status_code) or attempt >= self.retry.max_attempts:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            await asyncio.sleep(self.retry.delay(attempt, retry_after))
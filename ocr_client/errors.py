@@ -0,0 +1,12 @@
+class OcrClientError(Exception):
+    """客户端错误基类"""
+
+
+class OcrHTTPError(OcrClientError):
+    """服务端返回非 2xx 状态码"""
+
+    def __init__(self, status_code, detail=None, retry_after=None):
+        super().__init__(f"OCR request failed with HTTP {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
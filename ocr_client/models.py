@@ -0,0 +1,104 @@
+"""OCR 响应的类型化结果对象，兼容 detail 与 columnar 两种响应格式"""
+import base64
+import sys
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+POSITIONS_ENCODING_BASE64 = "base64-int32le"
+
+
+@dataclass(frozen=True)
+class OcrDetail:
+    value: str
+    confidence: float
+    position: List[List[int]]
+    # 请求 layout=True 时为阅读顺序中的行号与块号
+    line: Optional[int] = None
+    block: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        detail = {"Confidence": self.confidence, "Position": self.position, "Value": self.value}
+        if self.line is not None:
+            detail["Line"] = self.line
+            detail["Block"] = self.block
+        return detail
+
+
+@dataclass(frozen=True)
+class OcrImageInfo:
+    angle: float
+    height: int
+    width: int
+    image_base64: Optional[str] = None
+    image_format: Optional[str] = None
+
+    def image_bytes(self) -> Optional[bytes]:
+        return base64.b64decode(self.image_base64) if self.image_base64 is not None else None
+
+
+@dataclass
+class OcrResult:
+    text: str
+    details: List[OcrDetail]
+    image_info: OcrImageInfo
+    raw: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_json(cls, payload: Dict[str, Any]) -> "OcrResult":
+        ocr_info = (payload.get("OcrInfo") or [{}])[0]
+        if "Columns" in ocr_info:
+            details = _details_from_columns(ocr_info["Columns"])
+        else:
+            details = [
+                OcrDetail(value=d.get("Value", ""), confidence=float(d.get("Confidence", 0.0)), position=d.get("Position", []),
+                          line=d.get("Line"), block=d.get("Block"))
+                for d in ocr_info.get("Detail", [])
+            ]
+        info = (payload.get("ImageInfo") or [{}])[0]
+        image_info = OcrImageInfo(
+            angle=info.get("Angle", 0),
+            height=info.get("Height", 0),
+            width=info.get("Width", 0),
+            image_base64=info.get("ImageBase64"),
+            image_format=info.get("ImageFormat"),
+        )
+        return cls(text=ocr_info.get("Text", ""), details=details, image_info=image_info, raw=payload)
+
+    def to_detail_dicts(self) -> List[Dict[str, Any]]:
+        """还原为服务端默认（detail）格式的 Detail 列表"""
+        return [d.to_dict() for d in self.details]
+
+
+@dataclass
+class OcrItemResult:
+    """批量接口的单项结果：result 与 error 二者有其一"""
+    index: int
+    source: Any
+    result: Optional[OcrResult] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _details_from_columns(columns):
+    positions = columns.get("Positions", [])
+    if columns.get("PositionsEncoding") == POSITIONS_ENCODING_BASE64:
+        flat = array("i")
+        flat.frombytes(base64.b64decode(positions))
+        if sys.byteorder != "little":
+            flat.byteswap()
+    else:
+        flat = positions
+    lines = columns.get("Lines") or []
+    blocks = columns.get("Blocks") or []
+    details = []
+    for i, (value, confidence) in enumerate(zip(columns.get("Values", []), columns.get("Confidences", []))):
+        base = i * 8
+        quad = [[int(flat[base + j]), int(flat[base + j + 1])] for j in range(0, 8, 2)]
+        details.append(OcrDetail(value=value, confidence=float(confidence), position=quad,
+                                 line=lines[i] if i < len(lines) else None, block=blocks[i] if i < len(blocks) else None))
+    return details
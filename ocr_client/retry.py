@@ -0,0 +1,46 @@
+"""重试策略：指数退避 + 全抖动，优先遵循服务端的 Retry-After"""
+import email.utils
+import random
+import time
+from dataclasses import dataclass, field
+from typing import FrozenSet
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 4
+    backoff_base: float = 0.2
+    backoff_max: float = 10.0
+    # Retry-After 的上限，防止服务端给出过长的等待
+    max_retry_after: float = 60.0
+    # 504 不重试：推理超时时服务端已终止工作进程，重试同一张图只会再次超时并占用工作进程
+    retry_statuses: FrozenSet[int] = field(default_factory=lambda: frozenset({429, 502, 503}))
+
+    def should_retry_status(self, status_code):
+        return status_code in self.retry_statuses
+
+    def delay(self, attempt, retry_after=None):
+        """第 attempt 次（从 1 开始）失败后的等待秒数"""
+        if retry_after is not None:
+            # 在 Retry-After 基础上加少量抖动，避免客户端同时醒来
+            return min(retry_after, self.max_retry_after) + random.uniform(0, self.backoff_base)
+        cap = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+
+def parse_retry_after(value):
+    """解析 Retry-After（秒数或 HTTP 日期），无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed is None:
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
@@ -0,0 +1,137 @@
+"""同步 OCR 客户端：与 AsyncOcrClient 接口一致，批量接口使用线程池并发"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+
+from ._common import DEFAULT_BASE_URL, FILE_ENDPOINT, build_request, iter_image_files, parse_response, read_source
+from .errors import OcrClientError
+from .models import OcrItemResult
+from .retry import RetryPolicy, parse_retry_after
+
+
+class OcrClient:
+    """示例：
+
+        with OcrClient("http://ocr:8008", max_concurrency=8) as client:
+            result = client.ocr_file("page.jpg", lang="en", priority="interactive", tenant="team-a")
+            for item in client.ocr_directory("scans/"):
+                ...
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=60.0, max_concurrency=8, max_connections=None,
+                 retry=None, headers=None, **request_options):
+        self.max_concurrency = max_concurrency
+        self.retry = retry or RetryPolicy()
+        self.request_options = request_options
+        max_connections = max_connections or max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        # httpx.Client 线程安全，可在线程池中共享连接池
+        self._client = httpx.Client(
+            base_url=base_url,
+            timeout=timeout,
+            headers=headers,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._client.close()
+
+    def ocr_bytes(self, data, filename="image", **options):
+        """options 同 AsyncOcrClient.ocr_bytes"""
+        params, headers = build_request(**{**self.request_options, **options})
+        response = self._post_with_retry(filename, data, params, headers)
+        return parse_response(response)
+
+    def ocr_file(self, path, **options):
+        filename, data = read_source(path)
+        return self.ocr_bytes(data, filename=filename, **options)
+
+    def ocr_many(self, sources, ordered=True, concurrency=None, **options):
+        """批量识别，语义同 AsyncOcrClient.ocr_many。
+
+        提前退出（break 或 close()）时取消尚未开始的请求；进行中的请求无法中断，完成当前这次尝试后不再重试，也不等待其结束。
+        """
+        window = concurrency or self.max_concurrency
+        source_iter = enumerate(sources)
+        pending = set()
+        finished = {}
+        next_to_yield = 0
+        exhausted = False
+        stop = threading.Event()
+
+        pool = ThreadPoolExecutor(max_workers=window, thread_name_prefix="ocr-client")
+        try:
+            while True:
+                while not exhausted and len(pending) < window:
+                    try:
+                        index, source = next(source_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(pool.submit(self._ocr_item, index, source, options, stop))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = future.result()
+                    if ordered:
+                        finished[item.index] = item
+                    else:
+                        yield item
+                while next_to_yield in finished:
+                    yield finished.pop(next_to_yield)
+                    next_to_yield += 1
+        finally:
+            stop.set()
+            pool.shutdown(wait=not pending, cancel_futures=True)
+
+    def ocr_directory(self, directory, recursive=True, ordered=True, concurrency=None, **options):
+        return self.ocr_many(iter_image_files(directory, recursive=recursive), ordered=ordered,
+                             concurrency=concurrency, **options)
+
+    def _ocr_item(self, index, source, options, stop=None):
+        try:
+            filename, data = read_source(source)
+            params, headers = build_request(**{**self.request_options, **options})
+            result = parse_response(self._post_with_retry(filename, data, params, headers, stop))
+            return OcrItemResult(index=index, source=source, result=result)
+        except Exception as e:
+            return OcrItemResult(index=index, source=source, error=e)
+
+    def _post_with_retry(self, filename, data, params, headers=None, stop=None):
+        """stop（threading.Event）被设置后不再发起下一次尝试"""
+        attempt = 0
+        while True:
+            attempt += 1
+            if stop is not None and stop.is_set():
+                raise OcrClientError("Cancelled")
+            with self._semaphore:
+                try:
+                    response = self._client.post(FILE_ENDPOINT, params=params, headers=headers, files={"file": (filename, data)})
+                except httpx.TransportError:
+                    if attempt >= self.retry.max_attempts:
+                        raise
+                    response = None
+            if response is None:
+                _sleep(self.retry.delay(attempt), stop)
+                continue
+            if not self.retry.should_retry_status(response.status_code) or attempt >= self.retry.max_attempts:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            _sleep(self.retry.delay(attempt, retry_after), stop)
+
+
+def _sleep(seconds, stop=None):
+    """退避等待；stop 被设置时提前返回"""
+    if stop is None:
+        time.sleep(seconds)
+    else:
+        stop.wait(seconds)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重放慢请求录制（OCR_RECORD_DIR）中保存的请求，对比录制时与重放时的延迟
+
+- HTTP 模式（--url）：按录制时的路径与查询参数向运行中的服务重新发送请求，对比录制时的总耗时
+- 本地模式（--local）：不经过 HTTP，直接调用 process_simple_bytes / process_detection_bytes / process_structure_bytes，
+  对比录制时扣除排队后的耗时
+- --concurrency 控制并发，--rate 控制每秒发起的请求数（0 表示不限速）
+- 输出延迟分位数与差值最大的记录；--output 时逐条写入 JSONL
+
+示例：
+    python replay_traffic.py /data/ocr_records --url http://localhost:8008 --concurrency 4 --rate 10
+    python replay_traffic.py /data/ocr_records --local --concurrency 2
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+META_SUFFIX = ".json"
+
+
+def load_corpus(directory, endpoints=None, limit=None):
+    records = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(META_SUFFIX):
+            continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if endpoints and meta.get("endpoint") not in endpoints:
+            continue
+        image_path = os.path.join(directory, meta["image"])
+        if not os.path.exists(image_path):
+            continue
+        meta["name"] = name[:-len(META_SUFFIX)]
+        meta["image_path"] = image_path
+        records.append(meta)
+        if limit and len(records) >= limit:
+            break
+    return records
+
+
+def _read_image(record):
+    with open(record["image_path"], "rb") as f:
+        return f.read()
+
+
+class HttpReplayer:
+    def __init__(self, url, timeout):
+        import httpx
+        self.url = url.rstrip("/")
+        self.client = httpx.Client(timeout=timeout)
+
+    def recorded_ms(self, record):
+        return record["duration_ms"]
+
+    def __call__(self, record, contents):
+        url = f"{self.url}{record['path']}"
+        if record.get("query"):
+            url = f"{url}?{record['query']}"
+        headers = {"X-Request-Id": f"replay-{record.get('request_id') or record['name']}"}
+        if record["path"].endswith("/base64"):
+            response = self.client.post(url, json={"image_base64": base64.b64encode(contents).decode("ascii")}, headers=headers)
+        else:
+            response = self.client.post(url, files={"file": (record["image"], contents)}, headers=headers)
+        return response.status_code
+
+    def close(self):
+        self.client.close()
+
+
+class LocalReplayer:
+    def __init__(self):
+        # 只在本地模式下导入服务代码（会加载模型）
+        from app.services.detection_service import process_detection_bytes
+        from app.services.ocr_service import process_simple_bytes
+        from app.services.structure_service import process_structure_bytes
+        self.functions = {
+            "ocr_simple": process_simple_bytes,
+            "ocr_detect": process_detection_bytes,
+            "ocr_structure": process_structure_bytes,
+        }
+
+    def recorded_ms(self, record):
+        # 本地调用不经过调度器排队
+        return record["duration_ms"] - (record.get("stages_ms") or {}).get("queue", 0.0)
+
+    def __call__(self, record, contents):
+        self.functions[record["endpoint"]](contents, **record["params"])
+        return 200
+
+    def close(self):
+        pass
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(q / 100.0 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def _format_ms(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+def replay(records, replayer, concurrency=1, rate=0.0, repeat=1, output=None):
+    rows = []
+    lock = threading.Lock()
+    writer = open(output, "w", encoding="utf-8") if output else None
+
+    def run_one(record):
+        contents = _read_image(record)
+        started = time.perf_counter()
+        error = None
+        try:
+            status = replayer(record, contents)
+        except Exception as e:
+            status, error = None, f"{type(e).__name__}: {e}"
+        replay_ms = (time.perf_counter() - started) * 1000
+        recorded_ms = replayer.recorded_ms(record)
+        row = {
+            "name": record["name"],
+            "endpoint": record["endpoint"],
+            "recorded_ms": round(recorded_ms, 1),
+            "replay_ms": round(replay_ms, 1),
+            "delta_ms": round(replay_ms - recorded_ms, 1),
+            "recorded_status": record.get("status"),
+            "status": status,
+        }
+        if error:
+            row["error"] = error
+        with lock:
+            rows.append(row)
+            if writer:
+                writer.write(json.dumps(row, ensure_ascii=False) + "\n")
+            print(f"\r已重放 {len(rows)}", end="", flush=True)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for index, record in enumerate(record for _ in range(repeat) for record in records):
+                if rate > 0:
+                    # 按固定间隔发起，慢于计划时不补发
+                    delay = start + index / rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                executor.submit(run_one, record)
+    finally:
+        if writer:
+            writer.close()
+        replayer.close()
+    print(f"\r已重放 {len(rows)} 个请求，耗时 {time.perf_counter() - start:.1f}s")
+    return rows
+
+
+def report(rows, top=10):
+    ok = [row for row in rows if "error" not in row]
+    errors = len(rows) - len(ok)
+    print(f"成功 {len(ok)}，失败 {errors}" + ("" if not errors else f"（如 {next(row['error'] for row in rows if 'error' in row)}）"))
+    status_changed = sum(1 for row in ok if row["recorded_status"] is not None and row["status"] != row["recorded_status"])
+    if status_changed:
+        print(f"状态码与录制时不同: {status_changed}")
+    print(f"{'':>10} {'p50':>10} {'p90':>10} {'p99':>10} {'max':>10}")
+    for label, key in (("录制 ms", "recorded_ms"), ("重放 ms", "replay_ms"), ("差值 ms", "delta_ms")):
+        values = [row[key] for row in ok]
+        print(f"{label:>10} " + " ".join(f"{_format_ms(percentile(values, q)):>10}" for q in (50, 90, 99, 100)))
+    if ok and top:
+        print(f"差值最大的 {min(top, len(ok))} 条：")
+        for row in sorted(ok, key=lambda row: row["delta_ms"], reverse=True)[:top]:
+            print(f"  {row['name']}  {row['endpoint']}  录制 {row['recorded_ms']:.1f}ms  重放 {row['replay_ms']:.1f}ms  差值 {row['delta_ms']:+.1f}ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="重放录制的请求并对比延迟")
+    parser.add_argument("directory", help="录制目录（OCR_RECORD_DIR）")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="运行中的服务地址，如 http://localhost:8008")
+    target.add_argument("--local", action="store_true", help="在本进程内直接调用 process_* 函数")
+    parser.add_argument("--concurrency", type=int, default=1, help="并发数")
+    parser.add_argument("--rate", type=float, default=0.0, help="每秒发起的请求数，0 表示不限速")
+    parser.add_argument("--repeat", type=int, default=1, help="整个语料重放的轮数")
+    parser.add_argument("--limit", type=int, help="最多重放的记录数")
+    parser.add_argument("--endpoint", action="append", choices=("ocr_simple", "ocr_detect", "ocr_structure"), help="只重放这些接口的记录，可重复")
+    parser.add_argument("--timeout", type=float, default=300.0, help="HTTP 请求超时（秒）")
+    parser.add_argument("--top", type=int, default=10, help="列出差值最大的记录数")
+    parser.add_argument("-o", "--output", help="逐条结果写入 JSONL")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    records = load_corpus(args.directory, endpoints=args.endpoint, limit=args.limit)
+    if not records:
+        print(f"{args.directory} 中没有可重放的记录", file=sys.stderr)
+        raise SystemExit(1)
+    print(f"载入 {len(records)} 条记录")
+    replayer = LocalReplayer() if args.local else HttpReplayer(args.url, args.timeout)
+    rows = replay(records, replayer, concurrency=max(1, args.concurrency), rate=args.rate, repeat=max(1, args.repeat), output=args.output)
+    report(rows, top=args.top)
+
+
+if __name__ == '__main__':
+    main()
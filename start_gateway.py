@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup script for the multi-node OCR gateway
+
+用法：
+    # 转发到已有的后端实例
+    GATEWAY_BACKENDS=http://10.0.0.1:8008,http://10.0.0.2:8008 python start_gateway.py
+
+    # 本地测试：启动 3 个 uvicorn 后端（端口 8101-8103），网关监听 8000
+    python start_gateway.py --spawn 3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import uvicorn
+
+
+def _spawn_backends(count, base_port, host):
+    processes = []
+    for i in range(count):
+        port = base_port + i
+        command = [sys.executable, "-m", "uvicorn", "app:app", "--host", host, "--port", str(port), "--log-level", "warning"]
+        processes.append(subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__))))
+        print(f"已启动后端 http://{host}:{port} (pid {processes[-1].pid})")
+    return processes, [f"http://{host}:{base_port + i}" for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PaddleOCR 多节点网关")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--backends", default=None, help="后端地址，逗号分隔（默认读取 GATEWAY_BACKENDS）")
+    parser.add_argument("--spawn", type=int, default=0, help="在本机启动的后端进程数，用于本地测试")
+    parser.add_argument("--backend-base-port", type=int, default=8101)
+    args = parser.parse_args()
+
+    processes = []
+    if args.spawn > 0:
+        processes, urls = _spawn_backends(args.spawn, args.backend_base_port, "127.0.0.1")
+        os.environ["GATEWAY_BACKENDS"] = ",".join(urls)
+    elif args.backends:
+        os.environ["GATEWAY_BACKENDS"] = args.backends
+
+    print("Starting PaddleOCR Gateway...")
+    print("=" * 50)
+    print(f"Gateway will be available at: http://localhost:{args.port}")
+    print(f"Backends: {os.environ.get('GATEWAY_BACKENDS', '')}")
+    print("=" * 50)
+
+    try:
+        # 后端未就绪前健康检查失败会被暂时摘除，就绪后自动恢复
+        uvicorn.run("gateway:app", host=args.host, port=args.port, log_level="info")
+    except KeyboardInterrupt:
+        print("\nShutting down gracefully...")
+    finally:
+        for process in processes:
+            process.terminate()
+        deadline = time.time() + 10
+        for process in processes:
+            try:
+                process.wait(max(0.1, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+from app.utils.buffer_pool import BufferPool, size_class
+
+
+MB = 1024 * 1024
+
+
+def test_size_classes_round_up_by_at_most_a_quarter():
+    for nbytes in [64 * 1024, 100000, 3 * MB + 1, 5 * MB - 7, 1920 * 1080 * 3, 4000 * 3000 * 3]:
+        cls = size_class(nbytes)
+        assert nbytes <= cls <= nbytes * 1.25
+        assert size_class(cls) == cls
+    # 小于最小级别的请求共用最小级别
+    assert size_class(1) == size_class(64 * 1024)
+
+
+def test_buffers_are_reused_within_a_class():
+    pool = BufferPool(16 * MB)
+    with pool.lease() as lease:
+        first = lease.empty((300, 400, 3))
+        address = first.__array_interface__["data"][0]
+    # 尺寸略有不同但属于同一级别：复用同一块缓冲
+    with pool.lease() as lease:
+        second = lease.empty((301, 399, 3))
+        assert second.__array_interface__["data"][0] == address
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["retained_bytes"] == size_class(300 * 400 * 3)
+
+
+def test_least_recently_used_class_is_evicted():
+    pool = BufferPool(3 * MB)
+    pool.release(pool.acquire(MB))
+    pool.release(pool.acquire(2 * MB))
+    # 再次使用 1MB 级别，2MB 级别变为最久未使用
+    pool.release(pool.acquire(MB))
+    assert pool.stats()["classes"] == {2 * MB: 1, MB: 1}
+    with pool.lease() as lease:
+        lease.empty(MB)
+        lease.empty(MB)
+    stats = pool.stats()
+    assert stats["classes"] == {MB: 2}
+    assert stats["retained_bytes"] == 2 * MB
+
+
+def test_oversized_buffers_are_not_retained():
+    pool = BufferPool(MB)
+    pool.release(pool.acquire(2 * MB))
+    assert pool.stats()["retained_bytes"] == 0
+    # 关闭缓冲池时直接分配
+    disabled = BufferPool(0)
+    with disabled.lease() as lease:
+        assert lease.empty((10, 10)).shape == (10, 10)
+    assert disabled.stats()["misses"] == 0
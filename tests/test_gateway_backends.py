@@ -0,0 +1,59 @@
+import math
+
+from gateway.backends import BackendPool
+from gateway.hashing import content_key
+
+
+URLS = ["http://ocr-a:8008", "http://ocr-b:8008", "http://ocr-c:8008"]
+
+
+def keys(count):
+    return [content_key(f"image-{i}".encode()) for i in range(count)]
+
+
+def test_idle_pool_follows_the_hash_ring():
+    pool = BackendPool(URLS, load_factor=1.25)
+    for key in keys(50):
+        owner = next(pool.ring.walk(key))
+        assert pool.choose(key).url == owner
+    # 各后端都分到一部分内容
+    assert {pool.choose(key).url for key in keys(50)} == set(URLS)
+
+
+def test_busy_owner_spills_to_next_backend_on_the_ring():
+    pool = BackendPool(URLS, load_factor=1.25)
+    key = keys(1)[0]
+    owner, second, _ = pool.ring.walk(key)
+    pool.backends[owner].queue_depth = 10
+    # 上限 ceil(1.25 × (10 + 1) / 3) = 5：原归属后端超限，沿哈希环顺延
+    assert pool.choose(key).url == second
+
+
+def test_bounded_load_caps_every_backend():
+    pool = BackendPool(URLS, load_factor=1.25)
+    for key in keys(300):
+        pool.choose(key).in_flight += 1
+    loads = [backend.load for backend in pool.backends.values()]
+    assert sum(loads) == 300
+    assert max(loads) <= math.ceil(1.25 * 300 / len(URLS))
+
+
+def test_backends_not_accepting_are_skipped():
+    pool = BackendPool(URLS, load_factor=1.25)
+    key = keys(1)[0]
+    owner = next(pool.ring.walk(key))
+    pool.backends[owner].accepting = False
+    assert pool.choose(key).url != owner
+    # 全部后端都不接收时仍按负载选择，不直接拒绝
+    for backend in pool.backends.values():
+        backend.accepting = False
+    assert pool.choose(key) is not None
+
+
+def test_without_key_least_loaded_wins():
+    pool = BackendPool(URLS, load_factor=1.25)
+    pool.backends[URLS[0]].in_flight = 2
+    pool.backends[URLS[1]].queue_depth = 1
+    assert pool.choose().url == URLS[2]
+    pool.backends[URLS[2]].healthy = False
+    assert pool.choose().url == URLS[1]
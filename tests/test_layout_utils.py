@@ -0,0 +1,61 @@
+from app.utils.layout_utils import assemble_text, reading_order
+
+
+def box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def test_key_value_rows_stay_paired():
+    # 5 行标签 / 值：标签 x 0-100，值 x 140-400，字高 20px，行距 10px
+    quads, texts = [], []
+    for row in range(5):
+        top = row * 30
+        quads += [box(0, top, 100, top + 20), box(140, top, 400, top + 20)]
+        texts += [f"key{row}", f"value{row}"]
+    order, lines, blocks = reading_order(quads)
+    assert order.tolist() == list(range(10))
+    assert lines.tolist() == [0, 0, 1, 1, 2, 2, 3, 3, 4, 4]
+    assert len(set(blocks.tolist())) == 1
+    text = assemble_text([texts[i] for i in order], lines)
+    assert text.splitlines() == [f"key{row} value{row}" for row in range(5)]
+
+
+def test_columns_with_offset_rows_are_split():
+    # 两栏文字行互相错开半行：先读完左栏再读右栏
+    quads = [box(0, row * 30, 250, row * 30 + 20) for row in range(5)]
+    quads += [box(320, row * 30 + 15, 570, row * 30 + 35) for row in range(5)]
+    order, lines, blocks = reading_order(quads)
+    assert order.tolist() == list(range(10))
+    assert lines.tolist() == list(range(10))
+    assert blocks[0] != blocks[5]
+
+
+def test_aligned_columns_are_split():
+    # 排版的双栏页面：每栏文字行宽 450px，栏间距 70px，两栏基线对齐
+    quads = [box(0, row * 30, 450, row * 30 + 20) for row in range(5)]
+    quads += [box(520, row * 30, 970, row * 30 + 20) for row in range(5)]
+    texts = [f"L{row}" for row in range(5)] + [f"R{row}" for row in range(5)]
+    order, lines, blocks = reading_order(quads)
+    assert order.tolist() == list(range(10))
+    assert blocks[0] != blocks[5]
+    text = assemble_text([texts[i] for i in order], lines)
+    assert text.splitlines() == texts
+
+
+def test_short_values_beside_wide_labels_stay_paired():
+    # 票据：左侧较长的品名，右侧远处右对齐的短金额
+    quads, texts = [], []
+    for row in range(4):
+        top = row * 30
+        quads += [box(0, top, 420, top + 20), box(700, top, 780, top + 20)]
+        texts += [f"item{row}", f"{row}.00"]
+    order, lines, _ = reading_order(quads)
+    text = assemble_text([texts[i] for i in order], lines)
+    assert text.splitlines() == [f"item{row} {row}.00" for row in range(4)]
+
+
+def test_segments_of_one_line_are_joined():
+    quads = [box(110, 12, 200, 31), box(10, 10, 100, 30), box(10, 40, 150, 60)]
+    order, lines, _ = reading_order(quads)
+    assert order.tolist() == [1, 0, 2]
+    assert lines.tolist() == [0, 0, 1]
@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+from app.services.near_duplicates import NearDuplicateIndex
+
+
+def invoice(amounts, width=1240, height=1754):
+    # 同一模板的发票页：标题、表格边框与逐行金额
+    image = np.full((height, width, 3), 255, np.uint8)
+    cv2.putText(image, "ACME Corp - INVOICE", (80, 120), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (0, 0, 0), 3)
+    cv2.rectangle(image, (80, 300), (1160, 1300), (0, 0, 0), 2)
+    for row, amount in enumerate(amounts):
+        top = 360 + row * 60
+        cv2.putText(image, f"Item {row + 1}", (100, top), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+        cv2.putText(image, amount, (900, top), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+    return image
+
+
+def reencode(image, scale=1.0, quality=75):
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def result(text, width, height):
+    return [{"res": {"rec_texts": [text], "rec_scores": [0.99], "rec_polys": [[[0, 0], [width, 0], [width, height], [0, height]]]}}]
+
+
+def size(image):
+    return image.shape[1], image.shape[0]
+
+
+def indexed(image, text="first", scope="tenant-a"):
+    index = NearDuplicateIndex(max_entries=10, enabled=True)
+    index.add(index.fingerprint(image), size(image), "ch", result(text, *size(image)), scope=scope)
+    return index
+
+
+def test_forms_from_one_template_do_not_match():
+    first = invoice(["12.50", "7.00", "199.99", "1.25"])
+    index = indexed(first)
+    for amounts in (["847.30", "7.00", "199.99", "1.25"], ["812.10", "4.30", "55.00", "9.95"]):
+        other = invoice(amounts)
+        fingerprint = index.fingerprint(other)
+        # 感知哈希本身分不开这两张图，靠缩略图比较拒绝
+        assert (fingerprint.dhash ^ index.fingerprint(first).dhash).bit_count() <= index.max_distance
+        assert index.lookup(fingerprint, size(other), "ch", scope="tenant-a") is None
+
+
+def test_reencoded_and_rescaled_copies_match():
+    first = invoice(["12.50", "7.00", "199.99", "1.25"])
+    index = indexed(first)
+    for copy in (reencode(first, quality=50), reencode(first, scale=0.5), reencode(first, scale=1.3, quality=85)):
+        hit = index.lookup(index.fingerprint(copy), size(copy), "ch", scope="tenant-a")
+        assert hit is not None
+        assert hit[0]["res"]["rec_texts"] == ["first"]
+        # 多边形按新图尺寸缩放
+        assert hit[0]["res"]["rec_polys"][0][2] == [copy.shape[1], copy.shape[0]]
+
+
+def test_results_are_not_shared_across_tenants():
+    first = invoice(["12.50", "7.00", "199.99", "1.25"])
+    index = indexed(first)
+    fingerprint = index.fingerprint(first)
+    assert index.lookup(fingerprint, size(first), "ch", scope="tenant-b") is None
+    assert index.lookup(fingerprint, size(first), "en", scope="tenant-a") is None
+    assert index.lookup(fingerprint, size(first), "ch", scope="tenant-a") is not None
@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.scheduler import (
+    DeadlineExceeded,
+    OcrScheduler,
+    Overloaded,
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NORMAL,
+)
+
+
+class Limiter:
+    limit = 1
+
+
+class Budget:
+    def check(self, cost):
+        pass
+
+    def try_reserve(self, cost):
+        return True
+
+    def release(self, cost):
+        pass
+
+
+def make_scheduler(queue_min=10):
+    # 并发为 1，任务在 gate 打开前不执行：先提交的任务占住唯一的执行位，其余任务都在排队
+    gate = asyncio.Event()
+
+    async def runner(run, func, *args, **kwargs):
+        await gate.wait()
+        return run(func, *args, **kwargs)
+
+    scheduler = OcrScheduler(limiter=Limiter(), name="test", queue_factor=0, queue_min=queue_min, budget=Budget(), runner=runner)
+    return scheduler, gate
+
+
+async def hold_slot(scheduler, done):
+    task = asyncio.create_task(scheduler.submit(done.append, "first", tenant="holder"))
+    await asyncio.sleep(0)
+    assert scheduler.in_flight == 1
+    return task
+
+
+def test_higher_priority_is_served_first():
+    async def main():
+        scheduler, gate = make_scheduler()
+        done = []
+        tasks = [await hold_slot(scheduler, done)]
+        for name, priority in [("bulk", PRIORITY_BULK), ("normal", PRIORITY_NORMAL), ("interactive", PRIORITY_INTERACTIVE)]:
+            tasks.append(asyncio.create_task(scheduler.submit(done.append, name, priority=priority)))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 3
+        gate.set()
+        await asyncio.gather(*tasks)
+        return done
+
+    assert asyncio.run(main()) == ["first", "interactive", "normal", "bulk"]
+
+
+def test_tenants_take_turns_within_a_priority():
+    async def main():
+        scheduler, gate = make_scheduler()
+        done = []
+        tasks = [await hold_slot(scheduler, done)]
+        for name in ["a1", "a2", "a3", "b1", "b2"]:
+            tasks.append(asyncio.create_task(scheduler.submit(done.append, name, tenant=name[0])))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+        return done
+
+    assert asyncio.run(main()) == ["first", "a1", "b1", "a2", "b2", "a3"]
+
+
+def test_expired_jobs_are_dropped_without_running():
+    async def main():
+        scheduler, gate = make_scheduler()
+        done = []
+        holder = await hold_slot(scheduler, done)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.submit(done.append, "late", deadline=time.monotonic() - 1)
+        expiring = asyncio.create_task(scheduler.submit(done.append, "expiring", deadline=time.monotonic() + 0.05))
+        waiting = asyncio.create_task(scheduler.submit(done.append, "waiting"))
+        # 等待方在截止时间到达时立即返回，不必等执行位空出
+        with pytest.raises(DeadlineExceeded):
+            await expiring
+        gate.set()
+        await asyncio.gather(holder, waiting)
+        return done, scheduler.queue_depth
+
+    done, queue_depth = asyncio.run(main())
+    assert done == ["first", "waiting"]
+    assert queue_depth == 0
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def main():
+        scheduler, gate = make_scheduler(queue_min=2)
+        done = []
+        tasks = [await hold_slot(scheduler, done)]
+        tasks.append(asyncio.create_task(scheduler.submit(done.append, "queued")))
+        await asyncio.sleep(0)
+        # 低优先级的排队上限更小（queue_min × 0.5），先被拒绝
+        with pytest.raises(Overloaded):
+            await scheduler.submit(done.append, "bulk", priority=PRIORITY_BULK)
+        tasks.append(asyncio.create_task(scheduler.submit(done.append, "queued")))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as rejected:
+            await scheduler.submit(done.append, "rejected")
+        gate.set()
+        await asyncio.gather(*tasks)
+        return done, rejected.value.retry_after
+
+    done, retry_after = asyncio.run(main())
+    assert done == ["first", "queued", "queued"]
+    # 尚无耗时统计时每个任务按 1 秒估算：2 个排队 + 1 个执行中，并发 1
+    assert retry_after == pytest.approx(3.0)